@@ -0,0 +1,201 @@
+NORMAL = "normal"
+PENDING = "pending"  # out of range, waiting for the entry hold-off
+ALERTING = "alerting"
+CLEARING = "clearing"  # back inside the exit band, waiting for the exit hold-off
+
+LEVELS = ("warning", "critical")
+
+DEFAULT_ALARM_SETTINGS = {
+    "margin": 0.05,  # exit band: the normal range shrunk by this fraction of its width
+    "critical": 0.2,  # escalate to critical this far (fraction of the width) outside the range
+    "entry_delay": 3,  # seconds a value must stay out of range before alerting
+    "exit_delay": 30,  # seconds a value must stay inside the exit band before clearing
+}
+
+
+class _Alarm:
+    __slots__ = ("state", "since", "level")
+
+    def __init__(self):
+        self.state = NORMAL
+        self.since = 0.0
+        self.level = None
+
+
+class AlarmTracker:
+    """
+    Per-patient, per-parameter alert state machine.
+
+    normal -> pending -> alerting -> clearing -> normal
+
+    A parameter alerts only after staying out of its normal range for
+    entry_delay seconds, and clears only after staying inside the narrower
+    exit band for exit_delay seconds, so values flapping around a threshold
+    raise one alert instead of one per crossing. While alerting, a new
+    alert is raised only if the level escalates (warning -> critical).
+    """
+
+    def __init__(self, normal_ranges=None, config=None):
+        """
+        Args:
+            normal_ranges (dict): Parameter to [lower, upper].
+            config (dict): DEFAULT_ALARM_SETTINGS overrides, optionally with a
+                "parameters" dict of per-parameter overrides.
+        """
+        self._alarms = {}  # patient -> parameter -> _Alarm
+        self._risks = {}  # patient -> risk -> last time it was predicted
+        self.configure(normal_ranges or {}, config or {})
+
+    def configure(self, normal_ranges, config):
+        """
+        Updates ranges and hold-offs; existing alarm states are kept.
+        """
+        overrides = config.get("parameters", {})
+        base = {key: config.get(key, value) for key, value in DEFAULT_ALARM_SETTINGS.items()}
+        self.exit_delay = base["exit_delay"]
+        self._policies = {}
+        for parameter, (lower, upper) in normal_ranges.items():
+            policy = dict(base, **overrides.get(parameter, {}))
+            width = upper - lower
+            self._policies[parameter] = (
+                lower,
+                upper,
+                lower + policy["margin"] * width,
+                upper - policy["margin"] * width,
+                lower - policy["critical"] * width,
+                upper + policy["critical"] * width,
+                policy["entry_delay"],
+                policy["exit_delay"],
+            )
+
+    def update(self, patient, data, anomalies, now):
+        """
+        Advances the state machines with a new reading.
+
+        Args:
+            patient (str): Patient id.
+            data (dict): Processed sensor data.
+            anomalies (dict): Raw statuses from detect_anomalies(); only
+                "normal"/"abnormal" parameters are tracked.
+            now (float): Monotonic time of the reading.
+
+        Returns:
+            tuple: (latched anomalies, alerts) where latched anomalies is a copy
+            of `anomalies` reporting "abnormal" exactly while a parameter is
+            alerting or clearing, and alerts lists (parameter, level, value)
+            for new alerts and escalations.
+        """
+        alarms = self._alarms.setdefault(patient, {})
+        latched = dict(anomalies)
+        alerts = []
+        for parameter, status in anomalies.items():
+            policy = self._policies.get(parameter)
+            if policy is None or status not in ("normal", "abnormal"):
+                continue
+            lower, upper, exit_lower, exit_upper, critical_lower, critical_upper, entry_delay, exit_delay = policy
+            value = data[parameter]
+            alarm = alarms.get(parameter)
+            if alarm is None:
+                if status == "normal":
+                    continue  # the common case allocates nothing
+                alarm = alarms[parameter] = _Alarm()
+
+            # A value outside the range can still be "normal" when it is usual
+            # for the patient (see baselines): it raises no alarm, but an active
+            # alarm only clears inside the exit band
+            in_range = status == "normal"
+            level = None
+            if not in_range:
+                level = "warning" if critical_lower <= value <= critical_upper else "critical"
+
+            if alarm.state == NORMAL and not in_range:
+                alarm.state, alarm.since = PENDING, now
+            if alarm.state == PENDING:
+                if in_range:
+                    alarm.state = NORMAL
+                elif now - alarm.since >= entry_delay:
+                    alarm.state, alarm.level = ALERTING, level
+                    alerts.append((parameter, level, value))
+            elif alarm.state in (ALERTING, CLEARING):
+                if level is not None and LEVELS.index(level) > LEVELS.index(alarm.level or "warning"):
+                    alarm.level = level
+                    alerts.append((parameter, level, value))
+                inside_exit = exit_lower <= value <= exit_upper
+                if not inside_exit:
+                    alarm.state = ALERTING
+                elif alarm.state == ALERTING:
+                    alarm.state, alarm.since = CLEARING, now
+                elif now - alarm.since >= exit_delay:
+                    alarm.state, alarm.level = NORMAL, None
+
+            if alarm.state in (ALERTING, CLEARING):
+                latched[parameter] = "abnormal"
+            else:
+                latched[parameter] = "normal"
+                if alarm.state == NORMAL:
+                    del alarms[parameter]
+        return latched, alerts
+
+    def latch_risks(self, patient, health_risks, now):
+        """
+        Applies the exit hold-off to predicted health risks.
+
+        A risk stays current until it has not been predicted for exit_delay
+        seconds, and alerts again only after that.
+
+        Returns:
+            tuple: (current risks, newly raised risks).
+        """
+        risks = self._risks.setdefault(patient, {})
+        new = [risk for risk in health_risks if risk not in risks]
+        for risk in health_risks:
+            risks[risk] = now
+        for risk in [risk for risk, seen in risks.items() if now - seen >= self.exit_delay and risk not in health_risks]:
+            del risks[risk]
+        return set(risks), new
+
+    def critical_limits(self, parameter):
+        """
+        Returns:
+            tuple or None: (lower, upper) outside which a value alerts at
+            critical level, or None for an untracked parameter.
+        """
+        policy = self._policies.get(parameter)
+        return None if policy is None else policy[4:6]
+
+    def critical(self, patient):
+        """
+        Returns:
+            set: The patient's parameters alerting at critical level.
+        """
+        return {
+            parameter
+            for parameter, alarm in self._alarms.get(patient, {}).items()
+            if alarm.state in (ALERTING, CLEARING) and alarm.level == "critical"
+        }
+
+    def state(self, patient, parameter):
+        alarm = self._alarms.get(patient, {}).get(parameter)
+        return NORMAL if alarm is None else alarm.state
+
+    def seed(self, patient, anomalies, health_risks, now, critical=()):
+        """
+        Marks parameters and risks restored from a snapshot as already
+        alerting, so a restart does not raise their alerts again.
+
+        Args:
+            critical (iterable): The anomalies that were alerting at critical
+                level; they would otherwise alert again as an escalation.
+        """
+        alarms = self._alarms.setdefault(patient, {})
+        for parameter in anomalies:
+            alarm = alarms.setdefault(parameter, _Alarm())
+            level = "critical" if parameter in critical else "warning"
+            alarm.state, alarm.since, alarm.level = ALERTING, now, level
+        risks = self._risks.setdefault(patient, {})
+        for risk in health_risks:
+            risks[risk] = now
+
+    def forget(self, patient):
+        self._alarms.pop(patient, None)
+        self._risks.pop(patient, None)
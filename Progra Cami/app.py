@@ -1,4 +1,10 @@
 import PySimpleGUI as sg
+import json
+import math
+import members
+import os
+import random
+import spatial
 
 # Definir el tema de colores
 color_fondo = '#8acaf2'
@@ -6,6 +12,57 @@ sg.theme_background_color(color_fondo)
 sg.theme_element_background_color(color_fondo)
 sg.theme_text_color('white')
 
+# Ubicación del usuario y área que cubre el mapa
+ubicacion_usuario = (9.9281, -84.0907)
+radio_mapa_km = 3.0
+tamano_mapa = (428, 736)
+
+# Índice espacial de cuidadores y miembros de la comunidad
+indice_miembros = spatial.SpatialIndex()
+
+# Registro persistente de los miembros de la comunidad
+registro_miembros = members.MemberRegistry('members.jsonl')
+miembros_por_pagina = 5
+
+def load_member_locations(path='members_locations.json', count=2000):
+    # Carga las ubicaciones guardadas o simula miembros alrededor del usuario
+    for member in registro_miembros:
+        if 'lat' in member:
+            indice_miembros.insert(member['id'], member['lat'], member['lon'], member['kind'])
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for member in json.load(f):
+                # Los miembros del registro tienen prioridad sobre el archivo
+                if member['id'] not in indice_miembros:
+                    indice_miembros.insert(member['id'], member['lat'], member['lon'], member.get('kind', 'community'))
+        return
+    lat, lon = ubicacion_usuario
+    for i in range(count):
+        kind = 'caregiver' if i % 10 == 0 else 'community'
+        # Los puntos simulados llevan otro prefijo para no pisar a los miembros registrados
+        indice_miembros.insert(f'sim-{i}', lat + random.gauss(0, 0.02), lon + random.gauss(0, 0.02), kind)
+
+def map_bounds(center):
+    # Esquinas (lon, lat) del mapa centrado en la ubicación dada
+    lat, lon = center
+    half_height = radio_mapa_km / spatial.KM_PER_DEGREE
+    half_width = half_height * tamano_mapa[0] / tamano_mapa[1] / math.cos(math.radians(lat))
+    return (lon - half_width, lat - half_height), (lon + half_width, lat + half_height)
+
+def draw_markers(graph, center, figures):
+    # Borra los marcadores anteriores y dibuja los resultados de las consultas
+    for figure in figures:
+        graph.delete_figure(figure)
+    figures.clear()
+    lat, lon = center
+    for _, member_id in indice_miembros.within(lat, lon, radio_mapa_km, kind='community'):
+        member_lat, member_lon, _ = indice_miembros.location(member_id)
+        figures.append(graph.draw_point((member_lon, member_lat), size=0.0004, color='white'))
+    for _, member_id in indice_miembros.nearest(lat, lon, k=5, kind='caregiver', max_radius_km=radio_mapa_km):
+        member_lat, member_lon, _ = indice_miembros.location(member_id)
+        figures.append(graph.draw_point((member_lon, member_lat), size=0.001, color='red'))
+    figures.append(graph.draw_point((lon, lat), size=0.0012, color='blue'))
+
 def login_window():
     layout = [
         [sg.Image(filename='login.png', background_color=color_fondo)],
@@ -28,8 +85,9 @@ def login_window():
             return values
 
 def location_window(image_filename):
+    bottom_left, top_right = map_bounds(ubicacion_usuario)
     layout = [
-        [sg.Image(filename=image_filename, pad=(0, 0))],
+        [sg.Graph(canvas_size=tamano_mapa, graph_bottom_left=bottom_left, graph_top_right=top_right, key='-MAP-', enable_events=True, pad=(0, 0))],
         [
             sg.Button(image_filename='locn.png', key='-BTN1-', button_color=(color_fondo, color_fondo), border_width=0, pad=(10, 10)),
             sg.Button(image_filename='usern.png', key='-BTN2-', button_color=(color_fondo, color_fondo), border_width=0, pad=(10, 10)),
@@ -37,13 +95,27 @@ def location_window(image_filename):
         ]
     ]
 
-    window = sg.Window("Location Window", layout, element_justification='center', size=(428, 886))
+    window = sg.Window("Location Window", layout, element_justification='center', size=(428, 886), finalize=True)
+
+    # Mapa de fondo con los marcadores encima; se vuelven a consultar periódicamente
+    graph = window['-MAP-']
+    graph.draw_image(filename=image_filename, location=(bottom_left[0], top_right[1]))
+    center = ubicacion_usuario
+    figures = []
+    draw_markers(graph, center, figures)
 
     while True:
-        event, _ = window.read()
+        event, values = window.read(timeout=2000)
         if event == sg.WIN_CLOSED:
             break
-        if event == '-BTN2-':
+        if event == sg.TIMEOUT_EVENT:
+            draw_markers(graph, center, figures)
+        elif event == '-MAP-':
+            # Buscar alrededor del punto seleccionado en el mapa
+            lon, lat = values['-MAP-']
+            center = (lat, lon)
+            draw_markers(graph, center, figures)
+        elif event == '-BTN2-':
             window.hide()
             user_window(window)
             window.un_hide()
@@ -170,12 +242,27 @@ def community_subwindow(previous_window):
     layout_sub = [
         [sg.Button(image_filename='Back.png', key='-BACK_TO_COMMUNITY-', button_color=(color_fondo, color_fondo), pad=(0, 0))],
         [sg.Image(filename='Add.png', pad=(0, 0))],  # Cambia 'your_image.png' por la imagen deseada
-        [sg.InputText(key='-INPUT-', size=(30, 1), pad=((0, 0), (0, 20)))],
+        [sg.InputText(key='-INPUT-', size=(30, 1), pad=((0, 0), (0, 20)), enable_events=True)],
         [sg.Button("Register", font=('Montserrat', 14), key='-REGISTER-', button_color=('white', color_fondo), border_width=0, pad=((0, 0), (20, 20)))],
-        [sg.Text("", key='-MESSAGE-', size=(40, 1), visible=False, background_color=color_fondo, text_color='white')]  # Ajustamos el color de fondo y texto
+        [sg.Text("", key='-MESSAGE-', size=(40, 1), visible=False, background_color=color_fondo, text_color='white')],  # Ajustamos el color de fondo y texto
+        # Miembros cuyo nombre empieza con el texto escrito, una página a la vez
+        [sg.Listbox([], size=(40, miembros_por_pagina), key='-MEMBERS-', no_scrollbar=True)],
+        [sg.Button('<', key='-PREV-', border_width=0), sg.Text('', key='-PAGE-', size=(12, 1), justification='center', background_color=color_fondo), sg.Button('>', key='-NEXT-', border_width=0)]
     ]
 
-    window_sub = sg.Window("Community Registration", layout_sub, size=(428, 886), element_justification='center', background_color=color_fondo)  # Añadido background_color
+    window_sub = sg.Window("Community Registration", layout_sub, size=(428, 886), element_justification='center', background_color=color_fondo, finalize=True)  # Añadido background_color
+
+    page = 0
+
+    def show_page():
+        # Solo se consulta la página visible, no todo el registro
+        found, total = registro_miembros.search(window_sub['-INPUT-'].get(), page, miembros_por_pagina)
+        window_sub['-MEMBERS-'].update([member['name'] if not member.get('email') else f"{member['name']} <{member['email']}>" for member in found])
+        pages = max(1, -(-total // miembros_por_pagina))
+        window_sub['-PAGE-'].update(f"{page + 1} / {pages}")
+        return pages
+
+    pages = show_page()
 
     while True:
         event_sub, values_sub = window_sub.read()
@@ -184,7 +271,28 @@ def community_subwindow(previous_window):
             previous_window.un_hide()
             break
         if event_sub == '-REGISTER-':
-            window_sub['-MESSAGE-'].update("Registrado correctamente", visible=True)
+            text = values_sub['-INPUT-'].strip()
+            if '@' in text:
+                name, email = text.split('@')[0], text
+            else:
+                name, email = text, None
+            try:
+                registro_miembros.register(name, email)
+                window_sub['-MESSAGE-'].update("Registrado correctamente", visible=True)
+            except members.DuplicateMemberError:
+                window_sub['-MESSAGE-'].update("Ya existe un miembro con ese nombre o correo", visible=True)
+            except ValueError:
+                window_sub['-MESSAGE-'].update("Escribe un nombre o correo", visible=True)
+            pages = show_page()
+        elif event_sub == '-INPUT-':
+            page = 0
+            pages = show_page()
+        elif event_sub == '-PREV-' and page > 0:
+            page -= 1
+            pages = show_page()
+        elif event_sub == '-NEXT-' and page + 1 < pages:
+            page += 1
+            pages = show_page()
 
 def community_details_window(previous_window):
     layout_details = [
@@ -224,4 +332,5 @@ def more_details_window(previous_window):
 if __name__ == "__main__":
     user_data = login_window()
     if user_data:
+        load_member_locations()
         location_window('Maps.png')
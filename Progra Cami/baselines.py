@@ -0,0 +1,201 @@
+import collections
+import json
+import logging
+import os
+import urllib.parse
+
+# Mean absolute deviation of a normal distribution is sigma * sqrt(2 / pi)
+MAD_TO_SIGMA = 1.2533
+CLIP_SIGMAS = 3.0  # observations further out are clipped before fitting
+
+
+class Baseline:
+    """
+    Robust running estimate of one patient's usual value per parameter.
+
+    Location and spread are exponentially weighted means of the values and
+    of their absolute deviations, with every observation clipped to
+    CLIP_SIGMAS standard deviations first, so a few artefacts cannot drag
+    the baseline while a lasting change is still learned.
+    """
+
+    __slots__ = ("location", "spread", "count")
+
+    def __init__(self, size):
+        self.location = [0.0] * size
+        self.spread = [0.0] * size
+        self.count = [0] * size
+
+    def to_dict(self, parameters):
+        return {
+            parameter: [self.location[i], self.spread[i], self.count[i]]
+            for i, parameter in enumerate(parameters)
+            if self.count[i]
+        }
+
+    @classmethod
+    def from_dict(cls, parameters, data):
+        baseline = cls(len(parameters))
+        for i, parameter in enumerate(parameters):
+            if parameter in data:
+                baseline.location[i], baseline.spread[i], baseline.count[i] = data[parameter]
+        return baseline
+
+
+class BaselineStore:
+    """
+    Per-patient baselines with a bounded LRU cache.
+
+    At most max_patients baselines stay in memory (or one batch, if that is
+    larger); the least recently used ones are written to `directory` after
+    each batch, and read back the next time their patient is scored.
+    """
+
+    def __init__(self, normal_ranges, alpha=0.01, min_samples=120, max_patients=2000, directory=None):
+        """
+        Args:
+            normal_ranges (dict): Parameter to [lower, upper]; the fitted parameters.
+            alpha (float): Weight of a new observation once warmed up.
+            min_samples (int): Observations before a z-score is reported.
+            max_patients (int): Baselines kept in memory.
+            directory (str): Where evicted baselines are saved (None = dropped).
+        """
+        self.parameters = tuple(normal_ranges)
+        # Spread never drops below 2% of the range width, so a perfectly
+        # steady signal does not turn every small change into a huge z-score
+        self._min_sigma = [max(1e-6, 0.02 * (upper - lower)) for lower, upper in normal_ranges.values()]
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.max_patients = max(1, int(max_patients))
+        self.directory = directory
+        self._cache = collections.OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _path(self, patient):
+        return os.path.join(self.directory, urllib.parse.quote(patient, safe="") + ".json")
+
+    def get(self, patient):
+        """
+        Returns the patient's baseline, loading or creating it on a miss.
+        """
+        baseline = self._cache.get(patient)
+        if baseline is not None:
+            self._cache.move_to_end(patient)
+            return baseline
+        baseline = self._load(patient) or Baseline(len(self.parameters))
+        self._cache[patient] = baseline
+        return baseline
+
+    def evict(self):
+        """
+        Saves and drops the least recently used baselines above max_patients.
+        """
+        while len(self._cache) > self.max_patients:
+            patient, baseline = self._cache.popitem(last=False)
+            self._save(patient, baseline)
+            self.evictions += 1
+
+    def _load(self, patient):
+        if not self.directory:
+            return None
+        path = self._path(patient)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Ignoring unreadable baseline of '{patient}': {e}")
+            return None
+        self.loads += 1
+        return Baseline.from_dict(self.parameters, data)
+
+    def _save(self, patient, baseline):
+        if not self.directory:
+            return
+        path = self._path(patient)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(baseline.to_dict(self.parameters), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error(f"Could not save baseline of '{patient}': {e}")
+
+    def flush(self):
+        """
+        Saves every baseline still in memory.
+        """
+        for patient, baseline in self._cache.items():
+            self._save(patient, baseline)
+
+    def score_batch(self, patients, columns):
+        """
+        Scores a batch of readings against the patients' baselines, then
+        fits the baselines with them.
+
+        Args:
+            patients (list): Patient ids, one per column entry.
+            columns (dict): Parameter name to a list of values (None = missing
+                or not to be learned, e.g. imputed).
+
+        Returns:
+            dict: Parameter to a list of z-scores (None while a baseline is
+            still warming up or the value is missing).
+        """
+        models = [self.get(patient) for patient in patients]
+        alpha = self.alpha
+        min_samples = self.min_samples
+        scores = {}
+        for i, parameter in enumerate(self.parameters):
+            values = columns.get(parameter)
+            if values is None:
+                continue
+            min_sigma = self._min_sigma[i]
+            column = []
+            for model, value in zip(models, values):
+                if value is None:
+                    column.append(None)
+                    continue
+                count = model.count[i]
+                if not count:
+                    model.location[i] = value
+                    model.count[i] = 1
+                    column.append(None)
+                    continue
+                location = model.location[i]
+                sigma = max(min_sigma, model.spread[i] * MAD_TO_SIGMA)
+                delta = value - location
+                column.append(delta / sigma if count >= min_samples else None)
+
+                # Fit: plain running means while warming up, then EWMA
+                limit = CLIP_SIGMAS * sigma
+                if count >= 2:
+                    delta = max(-limit, min(limit, delta))
+                weight = max(alpha, 1.0 / (count + 1))
+                model.location[i] = location + weight * delta
+                model.spread[i] += weight * (abs(delta) - model.spread[i])
+                model.count[i] = count + 1
+            scores[parameter] = column
+        # Only now, so no baseline of this batch is saved before it is updated
+        self.evict()
+        return scores
+
+    def score(self, patient, reading):
+        """
+        Scores one reading; imputed values are neither scored nor learned.
+
+        Returns:
+            dict: Parameter to z-score (None while warming up).
+        """
+        imputed = getattr(reading, "imputed", ())
+        columns = {
+            parameter: [None if parameter in imputed else reading.get(parameter)] for parameter in self.parameters
+        }
+        return {parameter: column[0] for parameter, column in self.score_batch([patient], columns).items()}
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+
+import records
+
+
+def sample_readings(count):
+    readings = []
+    for _ in range(count):
+        readings.append(
+            {
+                "heart_rate": random.randint(60, 100),
+                "systolic_bp": random.randint(100, 130),
+                "diastolic_bp": random.randint(60, 85),
+                "body_temperature": round(random.uniform(36.1, 37.5), 1),
+                "respiratory_rate": random.randint(12, 20),
+                "spo2": random.randint(94, 100) if random.random() > 0.01 else None,
+            }
+        )
+    return readings
+
+
+def best_ns(function, count, repeat):
+    # Best of `repeat` runs, per reading
+    return min(timeit.repeat(function, number=1, repeat=repeat)) / count * 1e9
+
+
+def run_benchmark(count=20000, repeat=5):
+    """
+    Compares JSON lines with fixed-width records for the same readings.
+
+    Returns:
+        list: (name, bytes per reading or None, nanoseconds per reading) rows.
+    """
+    readings = sample_readings(count)
+    start = 1_700_000_000.0
+    lines = [
+        json.dumps(dict(reading, patient="bed-12", timestamp=start + i)).encode() for i, reading in enumerate(readings)
+    ]
+    blob = b"".join(records.pack_record(0, start + i, reading) for i, reading in enumerate(readings))
+    json_bytes = sum(len(line) + 1 for line in lines) / count
+
+    directory = tempfile.mkdtemp(prefix="ecare-bench-")
+    try:
+        log = records.RecordLog(os.path.join(directory, "history.bin"), flush_every=4096)
+        for i, reading in enumerate(readings):
+            log.append("bed-12", start + i, reading)
+        log.flush()
+        return _measure(lines, blob, log, json_bytes, count, repeat)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _measure(lines, blob, log, json_bytes, count, repeat):
+    return [
+        ("json.loads", json_bytes, best_ns(lambda: [json.loads(line) for line in lines], count, repeat)),
+        ("struct.iter_unpack", records.RECORD_SIZE, best_ns(lambda: list(records.iter_records(blob)), count, repeat)),
+        (
+            "decode to dicts",
+            records.RECORD_SIZE,
+            best_ns(lambda: [records.decode_fields(fields) for fields in records.iter_records(blob)], count, repeat),
+        ),
+        ("RecordLog.read", None, best_ns(log.read, count, repeat)),
+        ("RecordLog.read_columns", None, best_ns(log.read_columns, count, repeat)),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the fixed-width reading records against JSON.")
+    parser.add_argument("--readings", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    rows = run_benchmark(args.readings, args.repeat)
+    baseline = rows[0][2]
+    print(f"{'decoder':<24}{'bytes':>8}{'ns/reading':>12}{'vs json':>9}")
+    for name, size, nanoseconds in rows:
+        size_text = "" if size is None else f"{size:.0f}"
+        print(f"{name:<24}{size_text:>8}{nanoseconds:>12.0f}{baseline / nanoseconds:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+import bisect
+
+# Severity levels, most severe first in the table
+SEVERITY_NAMES = ("normal", "imputed", "warning", "critical")
+SEVERITY_COLORS = {
+    "normal": "white",
+    "imputed": "#f2f2f2",
+    "warning": "#fff2b3",
+    "critical": "#ffb3b3",
+}
+COLUMNS = ("Patient", "Status", "HR", "BP", "Temp", "RR", "SpO₂", "Details")
+COLUMN_WIDTHS = (12, 8, 5, 8, 5, 4, 5, 30)
+
+
+def severity(anomalies, health_risks):
+    """
+    Ranks a patient's latest reading.
+
+    Args:
+        anomalies (dict): Parameter to status, as returned by detect_anomalies().
+        health_risks (list): Predicted health risks.
+
+    Returns:
+        int: Index into SEVERITY_NAMES.
+    """
+    if health_risks:
+        return 3
+    statuses = anomalies.values()
+    if "abnormal" in statuses:
+        return 2
+    if "imputed" in statuses:
+        return 1
+    return 0
+
+
+def _format_row(patient_id, level, reading, anomalies, health_risks):
+    def value(key):
+        text = reading.get(key)
+        return "N/A" if text is None else str(text)
+
+    abnormal = [key for key, status in anomalies.items() if status == "abnormal"]
+    if health_risks:
+        details = "; ".join(health_risks)
+    elif abnormal:
+        details = "Abnormal: " + ", ".join(abnormal)
+    else:
+        details = ""
+    return (
+        str(patient_id),
+        SEVERITY_NAMES[level],
+        value("heart_rate"),
+        f"{value('systolic_bp')}/{value('diastolic_bp')}",
+        value("body_temperature"),
+        value("respiratory_rate"),
+        value("spo2"),
+        details,
+    )
+
+
+class WardDashboard:
+    """
+    Severity-sorted patient list rendered into a fixed-size sg.Table.
+
+    The table only ever holds `visible_rows` rows. Patients are kept in a
+    sorted index that is adjusted with bisect when a patient's severity
+    changes, and refresh() rewrites just the rows whose text changed, in
+    place, so the cost of a refresh depends on the window size and not on
+    the number of patients.
+    """
+
+    def __init__(self, table, slider=None, visible_rows=15):
+        """
+        Args:
+            table: The sg.Table element, created with `visible_rows` blank rows.
+            slider: Optional vertical sg.Slider used as the scroll bar.
+            visible_rows (int): Number of rows shown at a time.
+        """
+        self.table = table
+        self.slider = slider
+        self.visible_rows = visible_rows
+        self.offset = 0
+        self._rows = {}  # patient -> (sort key, row values)
+        self._order = []  # sorted (sort key, patient) pairs
+        self._rendered = [None] * visible_rows
+        self._slider_max = None
+        self._tree = table.Widget
+        self._iids = list(self._tree.get_children())
+        for name, color in SEVERITY_COLORS.items():
+            self._tree.tag_configure(name, background=color)
+        # Scroll our own window instead of the (always full) Treeview
+        table.bind("<MouseWheel>", "_wheel")
+        table.bind("<Button-4>", "_up")
+        table.bind("<Button-5>", "_down")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def update_patient(self, patient_id, reading, anomalies, health_risks):
+        """
+        Records a patient's latest reading; nothing is drawn until refresh().
+
+        Args:
+            patient_id (str): The patient.
+            reading (dict): Processed sensor data.
+            anomalies (dict): Parameter to status for the reading.
+            health_risks (list): Predicted health risks.
+        """
+        level = severity(anomalies, health_risks)
+        abnormal = sum(1 for status in anomalies.values() if status == "abnormal")
+        key = (-level, -abnormal, str(patient_id))
+        row = _format_row(patient_id, level, reading, anomalies, health_risks)
+        previous = self._rows.get(patient_id)
+        if previous is None:
+            bisect.insort(self._order, (key, patient_id))
+        elif previous[0] != key:
+            del self._order[bisect.bisect_left(self._order, (previous[0], patient_id))]
+            bisect.insort(self._order, (key, patient_id))
+        self._rows[patient_id] = (key, row)
+
+    def remove_patient(self, patient_id):
+        previous = self._rows.pop(patient_id, None)
+        if previous is not None:
+            del self._order[bisect.bisect_left(self._order, (previous[0], patient_id))]
+
+    def max_offset(self):
+        return max(0, len(self._order) - self.visible_rows)
+
+    def scroll(self, rows):
+        """
+        Moves the visible window by a number of rows (negative = up).
+        """
+        self.scroll_to(self.offset + rows)
+
+    def scroll_to(self, offset):
+        self.offset = max(0, min(int(offset), self.max_offset()))
+
+    def patient_at(self, row):
+        """
+        Returns:
+            str or None: The patient shown in a visible row (e.g. the table's selection).
+        """
+        index = self.offset + row
+        if 0 <= row < self.visible_rows and index < len(self._order):
+            return self._order[index][1]
+        return None
+
+    def handle_event(self, event, values):
+        """
+        Handles scrolling events for the table and its slider.
+
+        Returns:
+            bool: True if the event belonged to the dashboard.
+        """
+        key = self.table.key
+        if event == f"{key}_wheel":
+            delta = getattr(self.table.user_bind_event, "delta", 0)
+            self.scroll(-3 if delta > 0 else 3)
+        elif event == f"{key}_up":
+            self.scroll(-3)
+        elif event == f"{key}_down":
+            self.scroll(3)
+        elif self.slider is not None and event == self.slider.key:
+            self.scroll_to(values[event])
+        else:
+            return False
+        self.refresh()
+        return True
+
+    def refresh(self):
+        """
+        Redraws the visible rows that changed since the last refresh.
+        """
+        self.scroll_to(self.offset)
+        visible = self._order[self.offset : self.offset + self.visible_rows]
+        blank = ("",) * len(COLUMNS)
+        for i, iid in enumerate(self._iids):
+            if i < len(visible):
+                _, row = self._rows[visible[i][1]]
+            else:
+                row = blank
+            if row != self._rendered[i]:
+                self._tree.item(iid, values=row, tags=(row[1] or "normal",))
+                self._rendered[i] = row
+
+        if self.slider is not None:
+            max_offset = self.max_offset()
+            if max_offset != self._slider_max:
+                self._slider_max = max_offset
+                self.slider.update(range=(0, max_offset), disabled=max_offset == 0)
+            self.slider.update(value=self.offset)
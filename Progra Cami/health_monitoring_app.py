@@ -1,21 +1,69 @@
 import random
 import time
-import threading
+import zlib
 import PySimpleGUI as sg
+import copy
 import datetime
-import json
+import math
 import os
+import alarms
+import baselines
+import clocks
+import dashboard
+import imputation
 import logging
+import metrics
+import monitors
+import notifications
+import profiling
+import records
+import rollups
+import rules
+import sample_queue
+import scheduler
+import settings_store
+import snapshot
+import spill
+import trends
+import waveform
+import workers
 
 # Global variables
-latest_data = {}
+clock = clocks.SystemClock()  # Time source for the whole pipeline, see set_clock()
 application_running = False
 settings = {}
-historical_anomalies = []
-current_anomalies = set()
-current_health_risks = set()
-alerts = []
-stop_event = threading.Event()
+applied_settings = {}  # Copy of the settings sections as last applied, see apply_settings()
+patient_monitors = monitors.MonitorRegistry()  # Per-patient history, anomalies and risks
+alerts = spill.SpillingLog("alerts")  # Ward-wide alert log; oldest alerts spill to disk past settings["memory"]
+sensor_queue = None  # Bounded hand-off between the data updater and the event loop
+sensor_scheduler = scheduler.DeadlineScheduler()  # Drives every sensor stream
+sensor_supervisor = workers.WorkerSupervisor(sensor_scheduler)  # One producer per stream
+samples_dropped_reported = 0
+last_backpressure_alert = 0.0
+metrics_server = None
+settings_writer = None  # Background writer for settings.json
+settings_write_error = None  # Last failed settings write, shown by the event loop
+rule_engine = rules.RuleEngine()  # User-defined alert rules from settings["rules"]
+imputer = imputation.Imputer()  # Missing-value imputation from settings["imputation"]
+alarm_tracker = alarms.AlarmTracker()  # Hysteresis and hold-offs from settings["alarms"]
+baseline_store = None  # Per-patient baselines from settings["baselines"]
+rollup_store = rollups.RollupStore()  # 1 s / 1 min / 1 h aggregates of the vitals
+trend_charts = {}  # Live trend chart per vital, keyed by parameter name
+ward_dashboard = None  # Severity-sorted table of every monitored patient
+alert_dispatcher = None  # Delivers alerts to the sinks in settings["notifications"]
+patient_ids = records.PatientTable()  # Stream names carried by the sensor frames
+displayed_patient = "default"  # Patient shown in the vitals panel, trend charts and rollups
+vitals_history = None  # records.RecordLog of every processed reading, see settings["history"]
+
+# Y axis of the trend chart for each vital
+TREND_Y_RANGES = {
+    "heart_rate": (40, 160),
+    "systolic_bp": (70, 180),
+    "diastolic_bp": (40, 120),
+    "body_temperature": (34.0, 41.0),
+    "respiratory_rate": (5, 35),
+    "spo2": (80, 100),
+}
 
 # --- Logging and Error Handling Functions ---
 
@@ -64,7 +112,124 @@ def load_settings():
         dict: The settings dictionary.
     """
     default_settings = {
+        "schema_version": settings_store.SCHEMA_VERSION,
         "update_interval": 1,  # in seconds
+        "stream_intervals": {},  # optional per-stream/patient periods in seconds
+        "snapshot": {
+            "file": "monitoring_state.snap",  # binary state restored on startup
+            "interval": 30,  # seconds between snapshots
+        },
+        "waveform": {
+            # Derive heart_rate/SpO2 from simulated raw ECG/PPG blocks
+            "enabled": False,
+            "sample_rate": 250,  # Hz
+        },
+        "rollups": {
+            "file": "vitals_rollups.bin",
+            # [resolution, retention] in seconds, finest first
+            "tiers": [[1, 3600], [60, 7 * 86400], [3600, 365 * 86400]],
+        },
+        "dashboard": {
+            "visible_rows": 10,
+        },
+        "history": {
+            # Every processed reading as a 28-byte fixed-width record
+            "file": "vitals_history.bin",
+            "flush_every": 64,  # records buffered before a write
+            "retention": 90 * 86400,  # seconds of readings kept (null = forever)
+        },
+        "notifications": {
+            # Each sink has its own queue, worker threads, retries and timeout
+            "file": {"enabled": True, "path": "alerts.log"},
+            "stdout": {"enabled": False},
+            "webhook": {
+                "enabled": False,
+                "url": "http://127.0.0.1:8089/alerts",
+                "concurrency": 2,
+                "retries": 3,
+                "backoff": 0.5,  # seconds before the first retry, doubled each time
+                "timeout": 5,
+            },
+            "smtp": {
+                "enabled": False,
+                "host": "127.0.0.1",
+                "port": 1025,
+                "sender": "ecare@localhost",
+                "recipients": [],
+                "levels": ["critical"],
+                "timeout": 10,
+            },
+        },
+        "alarms": {
+            # Clear only once back inside the range shrunk by this fraction of its width
+            "margin": 0.05,
+            # Re-alert as critical beyond this fraction of the width outside the range
+            "critical": 0.2,
+            "entry_delay": 3,  # seconds out of range before alerting
+            "exit_delay": 30,  # seconds back in range before clearing
+            "parameters": {},  # per-parameter overrides, e.g. {"spo2": {"entry_delay": 10}}
+        },
+        "baselines": {
+            # Learn each patient's usual vitals so a chronically out-of-range
+            # value that is normal for them stops alerting
+            "enabled": True,
+            "alpha": 0.01,  # weight of a new observation once warmed up
+            "min_samples": 120,  # observations before a baseline is used
+            "z_threshold": 3.5,  # |z| above which a reading is unusual for the patient
+            # Widen the normal range by at most this fraction of its width,
+            # and never into the alarms' critical band
+            "max_shift": 0.2,
+            "max_patients": 2000,  # baselines kept in memory, the rest in "dir"
+            "dir": "baselines",
+        },
+        "patients": {
+            # Monitors of patients without a reading for idle_timeout seconds,
+            # or beyond max_resident, are saved to "dir" and read back on
+            # their next reading
+            "max_resident": 1000,
+            "idle_timeout": 900,
+            "dir": "patients",
+        },
+        "memory": {
+            # Resident alerts above this budget are moved to spill segments
+            "alert_budget_mb": 8,
+            "spill_dir": "spill",
+            "segment_items": 2000,  # alerts per spill segment
+            "spill_retention": 90 * 86400,  # seconds of spilled alerts kept (null = forever)
+            "spill_max_mb": 512,  # disk allowed for spill segments (null = no limit)
+        },
+        "trends": {
+            "window_seconds": 3600,  # time span shown by each trend chart
+            "points": 120,  # points each chart is downsampled to
+        },
+        "backpressure": {
+            # One of: drop_oldest, drop_newest, coalesce_latest, block
+            "policy": "drop_oldest",
+            "max_queue": 16,
+            "max_batch": 16,  # samples processed per event loop tick
+            "alert_interval": 30,  # seconds between "falling behind" alerts
+        },
+        "metrics": {
+            "port": None,  # e.g. 9108 to serve http://127.0.0.1:9108/metrics
+            "file": "metrics.prom",
+            "dump_interval": 15,  # in seconds
+        },
+        "imputation": {
+            # How detection treats imputed values: "flag", "ignore" or "detect"
+            "policy": "flag",
+            # Per parameter: value used when no recent observation exists, and
+            # how long (seconds) the last observation may be carried forward
+            "parameters": imputation.DEFAULT_IMPUTATION_TABLE,
+        },
+        # User-defined alert conditions, e.g. "heart_rate > 120 and spo2 < 92 for 30s".
+        # They are evaluated on processed data, imputed values included.
+        "rules": [
+            {
+                "name": "Tachycardia with low SpO2",
+                "when": "heart_rate > 120 and spo2 < 92 for 30s",
+                "level": "critical",
+            },
+        ],
         "normal_ranges": {
             "heart_rate": [60, 100],
             "systolic_bp": [90, 120],
@@ -77,41 +242,174 @@ def load_settings():
     settings_file = "settings.json"
     if os.path.exists(settings_file):
         try:
-            with open(settings_file, "r") as f:
-                settings = json.load(f)
+            settings = settings_store.read_settings(settings_file, default_settings)
             log_event("Settings loaded from file.")
             return settings
-        except Exception as e:
+        except settings_store.SettingsError as e:
             handle_error(e)
-            log_event("Using default settings due to error.")
+            # Keep the bad file for inspection instead of overwriting it on the next save
+            try:
+                os.replace(settings_file, f"{settings_file}.invalid")
+                log_event(f"Using default settings; invalid file moved to {settings_file}.invalid.")
+            except OSError as move_error:
+                logging.error(f"Could not move the invalid settings file aside: {move_error}")
+                log_event("Using default settings; the invalid file was left in place.")
             return default_settings
     else:
         log_event("Settings file not found. Using default settings.")
         return default_settings
 
 
-def save_settings(settings):
+def save_settings(settings, wait=False):
     """
     Saves the settings to a JSON file.
 
+    The write happens on a background thread, is debounced so a burst of
+    changes results in a single write, and replaces the file atomically.
+
     Args:
         settings (dict): The settings dictionary.
+        wait (bool): Write now instead of after the debounce delay.
+
+    Returns:
+        bool: False if waiting and the write failed; the error is then
+        shown by report_settings_error().
     """
-    settings_file = "settings.json"
-    try:
-        with open(settings_file, "w") as f:
-            json.dump(settings, f, indent=4)
-        log_event("Settings saved to file.")
-    except Exception as e:
-        handle_error(e)
+    global settings_writer
+
+    if settings_writer is None:
+        settings_writer = settings_store.DebouncedSettingsWriter("settings.json", on_error=settings_write_failed)
+    settings_writer.save(settings)
+    return settings_writer.flush() if wait else True
+
+
+def settings_write_failed(error):
+    """
+    Called by the settings writer, possibly on its own thread, when a write
+    fails; the event loop shows the error (see report_settings_error()).
+
+    Args:
+        error (Exception): Why the write failed.
+    """
+    global settings_write_error
+
+    settings_write_error = error
+
+
+def report_settings_error():
+    """
+    Shows the last failed settings write, if any, on the GUI thread.
+    """
+    global settings_write_error
+
+    error, settings_write_error = settings_write_error, None
+    if error is not None:
+        sg.popup_error(f"Settings could not be saved:\n{error}")
+
+
+def settings_changed(*sections):
+    """
+    Tells whether any of the settings sections differs from the last
+    apply_settings() (always True before the first one).
+
+    Args:
+        sections (str): Top-level keys of the settings.
+    """
+    return not applied_settings or any(settings.get(key) != applied_settings.get(key) for key in sections)
 
 
 def apply_settings():
     """
     Applies settings to the application.
+
+    Components are only rebuilt when their own settings changed, so saving
+    an unrelated setting keeps e.g. the carried-forward imputation values,
+    the rule hold times and the alerts waiting in the dispatcher.
+    """
+    global rule_engine, imputer, alert_dispatcher, vitals_history, baseline_store, applied_settings
+
+    if settings_changed("memory"):
+        memory = settings.get("memory", {})
+        spill_max_mb = memory.get("spill_max_mb")
+        alerts.configure(
+            memory.get("spill_dir"),
+            int(memory.get("alert_budget_mb", 8) * 2**20),
+            segment_items=memory.get("segment_items"),
+            retention=memory.get("spill_retention"),
+            max_disk_bytes=None if spill_max_mb is None else int(spill_max_mb * 2**20),
+        )
+
+    if settings_changed("imputation"):
+        imputer = imputation.Imputer(settings.get("imputation", {}).get("parameters"))
+
+    history = settings.get("history", {})
+    history_file = history.get("file")
+    if vitals_history is None or vitals_history.path != history_file:
+        if vitals_history is not None:
+            vitals_history.close()
+        vitals_history = records.RecordLog(history_file, history.get("flush_every", 64)) if history_file else None
+    if vitals_history is not None:
+        vitals_history.retention = history.get("retention")
+
+    if settings_changed("baselines", "normal_ranges"):
+        if baseline_store is not None:
+            baseline_store.flush()
+        baseline_settings = settings.get("baselines", {})
+        if baseline_settings.get("enabled", True):
+            baseline_store = baselines.BaselineStore(
+                settings.get("normal_ranges", {}),
+                alpha=baseline_settings.get("alpha", 0.01),
+                min_samples=baseline_settings.get("min_samples", 120),
+                max_patients=baseline_settings.get("max_patients", 2000),
+                directory=baseline_settings.get("dir"),
+            )
+        else:
+            baseline_store = None
+
+    # Keeps the state of active alarms, only ranges and hold-offs change
+    alarm_tracker.configure(settings.get("normal_ranges", {}), settings.get("alarms", {}))
+
+    patient_settings = settings.get("patients", {})
+    patient_monitors.configure(
+        max_resident=patient_settings.get("max_resident"),
+        idle_timeout=patient_settings.get("idle_timeout"),
+        directory=patient_settings.get("dir"),
+        on_load=monitor_loaded,
+        on_evict=monitor_evicted,
+    )
+
+    # Rules are parsed and compiled once here, not on every tick
+    if settings_changed("rules"):
+        rule_engine = rules.load_rules(settings.get("rules", []))
+        log_event(f"{len(rule_engine.rules)} alert rules compiled.")
+
+    if alert_dispatcher is None or settings_changed("notifications"):
+        if alert_dispatcher is not None:
+            alert_dispatcher.close(timeout=2)
+        alert_dispatcher = notifications.AlertDispatcher(
+            notifications.build_sinks(settings.get("notifications", {}))
+        )
+        log_event(f"Alert sinks: {', '.join(sink.name for sink in alert_dispatcher.sinks) or 'none'}.")
+
+    # The Settings window edits the sections in place, so keep a copy
+    applied_settings = copy.deepcopy(settings)
+
+
+def set_clock(new_clock):
     """
-    # Additional application-specific setup can be done here
-    pass
+    Switches the time source of the pipeline.
+
+    With a clocks.VirtualClock the sensor scheduler stops using its thread
+    and only fires when the clock is advanced (see run_simulation()).
+
+    Args:
+        new_clock: clocks.SystemClock or clocks.VirtualClock.
+    """
+    global clock
+
+    clock = new_clock
+    sensor_scheduler.clock = new_clock.monotonic
+    sensor_scheduler.manual = new_clock.virtual
 
 
 # --- Data Simulation Functions ---
@@ -143,69 +441,148 @@ def simulate_sensor_data():
     return data
 
 
-def update_sensor_data(data_container):
+def create_sensor_queue():
+    """
+    Builds the sample queue using the configured overload policy.
+
+    Returns:
+        sample_queue.SampleQueue: The queue shared by producer and consumer.
+    """
+    backpressure = settings.get("backpressure", {})
+    policy = backpressure.get("policy", sample_queue.DROP_OLDEST)
+    if policy not in sample_queue.POLICIES:
+        log_event(f"Unknown overload policy '{policy}', using drop_oldest.")
+        policy = sample_queue.DROP_OLDEST
+    block_timeout = backpressure.get("block_timeout")
+    if policy == sample_queue.BLOCK and clock.virtual:
+        # Under a virtual clock the producers run on the consumer's thread,
+        # so a blocked put() would wait for itself; it drops at once instead
+        log_event("Overload policy 'block' drops immediately under a virtual clock.")
+        block_timeout = 0
+    return sample_queue.SampleQueue(
+        maxsize=backpressure.get("max_queue", 16),
+        policy=policy,
+        block_timeout=block_timeout,
+        clock=clock.monotonic,
+    )
+
+
+def update_sensor_data(data_queue, stream="default", interval=None):
     """
     Updates the simulated data at regular intervals.
 
+    The stream is driven by the shared deadline scheduler, so its period does
+    not drift with processing time and many streams can share one thread.
+    The supervisor replaces any producer already running for the stream.
+
     Args:
-        data_container (dict): The container to store the latest data.
+        data_queue (sample_queue.SampleQueue): The queue the new samples are offered to.
+        stream (str): Name of the sensor stream (e.g. a patient id).
+        interval (float): Sampling period in seconds; defaults to the
+            per-stream or global setting.
     """
+    if interval is None:
+        interval = stream_interval(stream)
+
+    waveform_settings = settings.get("waveform", {})
+    if waveform_settings.get("enabled"):
+        sample_rate = waveform_settings.get("sample_rate", 250)
+        simulator = waveform.WaveformSimulator(sample_rate)
+        ingestor = waveform.WaveformIngestor(sample_rate)
+    else:
+        simulator = ingestor = None
 
-    def data_updater():
-        try:
-            while not stop_event.is_set():
-                new_data = simulate_sensor_data()
-                data_container.clear()
-                data_container.update(new_data)
-                time.sleep(settings.get("update_interval", 1))
-        except Exception as e:
-            handle_error(e)
-            stop_event.set()
+    patient = patient_ids.add(stream)
 
-    updater_thread = threading.Thread(target=data_updater, daemon=True)
-    updater_thread.start()
+    def data_updater(stop_token):
+        new_data = simulate_sensor_data()
+        if ingestor is not None:
+            # Replace the scalar vitals with the ones derived from raw waveforms
+            simulator.heart_rate = new_data["heart_rate"]
+            simulator.spo2 = new_data["spo2"]
+            with metrics.time_stage("waveform_ingestion"):
+                new_data.update(ingestor.process_block(*simulator.block(interval)))
+        # Hand the reading over as a device frame in the fixed-width record format
+        data_queue.put(records.pack_record(patient, clock.monotonic(), new_data), stop_event=stop_token)
 
+    sensor_supervisor.start(stream, interval, data_updater)
+    metrics.LIVE_PRODUCERS.set(sensor_supervisor.live_count())
 
-# --- Data Processing and AI Analysis Functions ---
+
+def stop_sensor_data(stream="default"):
+    """
+    Stops a sensor stream, waits for its producer to finish and logs its
+    timing statistics.
+
+    Args:
+        stream (str): Name of the sensor stream.
+    """
+    stats = sensor_scheduler.stats().get(stream)
+    if not sensor_supervisor.stop(stream):
+        logging.warning(f"Sensor stream '{stream}' is still finishing a sample.")
+    metrics.LIVE_PRODUCERS.set(sensor_supervisor.live_count())
+    if stats:
+        log_event(
+            f"Sensor stream '{stream}' stopped: fired={stats['fired']} skipped={stats['skipped']} "
+            f"p99 jitter={stats['p99_jitter'] * 1000:.2f} ms max jitter={stats['max_jitter'] * 1000:.2f} ms"
+        )
 
 
-def process_sensor_data(data):
+def stream_interval(stream):
     """
-    Cleans and preprocesses the raw sensor data.
+    Looks up the sampling period of a stream.
 
     Args:
-        data (dict): Raw sensor data.
+        stream (str): Name of the sensor stream.
 
     Returns:
-        dict: Processed sensor data.
+        float: Period in seconds.
     """
-    processed_data = data.copy()
+    intervals = settings.get("stream_intervals", {})
+    return float(intervals.get(stream, settings.get("update_interval", 1)))
+
+
+# --- Data Processing and AI Analysis Functions ---
 
-    # Handle missing values
-    for key, value in processed_data.items():
-        if value is None:
-            if key == "heart_rate":
-                processed_data[key] = 80
-            elif key == "systolic_bp":
-                processed_data[key] = 120
-            elif key == "diastolic_bp":
-                processed_data[key] = 80
-            elif key == "body_temperature":
-                processed_data[key] = 37.0
-            elif key == "respiratory_rate":
-                processed_data[key] = 16
-            elif key == "spo2":
-                processed_data[key] = 98
 
-    return processed_data
+def process_sensor_data(patients, readings, now=None):
+    """
+    Cleans and preprocesses a batch of raw sensor readings.
+
+    Missing values are carried forward from the patient's last observation
+    or replaced with the defaults from the imputation table, one parameter
+    column at a time for the whole batch.
 
+    Args:
+        patients (list): The patient of each reading.
+        readings (list): Raw sensor data dicts, oldest first.
+        now (float): clock.monotonic() value of the batch.
 
-def detect_anomalies(data):
+    Returns:
+        list: imputation.Reading per reading; its `imputed` attribute lists
+        the parameters that were filled in.
+    """
+    parameters = dict.fromkeys(key for data in readings for key in data)
+    columns = {key: [data.get(key) for data in readings] for key in parameters}
+    filled, masks = imputer.impute_batch(patients, columns, now)
+    return [
+        imputation.Reading({key: filled[key][i] for key in data}, [key for key in data if masks[key][i]])
+        for i, data in enumerate(readings)
+    ]
+
+
+def detect_anomalies(data, z_scores=None):
     """
     Identifies abnormal readings in the sensor data.
 
+    With z-scores from the patient's baseline, a value just outside the
+    normal range counts as normal if it is usual for the patient (see
+    settings["baselines"]), unless it is in the alarms' critical band.
+
     Args:
         data (dict): Processed sensor data.
+        z_scores (dict): Parameter to the value's z-score against the
+            patient's baseline (None while it warms up).
 
     Returns:
         dict: Anomalies detected.
@@ -213,8 +590,17 @@ def detect_anomalies(data):
     anomalies = {}
 
     normal_ranges = settings.get("normal_ranges", {})
+    imputed = getattr(data, "imputed", ())
+    imputed_policy = settings.get("imputation", {}).get("policy", "flag")
+    baseline_settings = settings.get("baselines", {})
+    z_threshold = baseline_settings.get("z_threshold", 3.5)
+    max_shift = baseline_settings.get("max_shift", 0.2)
 
     for key, value in data.items():
+        if key in imputed and imputed_policy != "detect":
+            if imputed_policy == "flag":
+                anomalies[key] = "imputed"
+            continue
         range_values = normal_ranges.get(key)
         if range_values:
             lower, upper = range_values
@@ -222,20 +608,28 @@ def detect_anomalies(data):
                 anomalies[key] = "normal"
             else:
                 anomalies[key] = "abnormal"
+                z = z_scores.get(key) if z_scores else None
+                if z is not None and abs(z) <= z_threshold:
+                    margin = max_shift * (upper - lower)
+                    # A slowly drifting baseline must not hide a critical value
+                    critical_lower, critical_upper = alarm_tracker.critical_limits(key) or (-math.inf, math.inf)
+                    if lower - margin <= value <= upper + margin and critical_lower < value < critical_upper:
+                        anomalies[key] = "normal"
         else:
             anomalies[key] = "unknown"
 
     return anomalies
 
 
-def predict_health_risks(data, anomalies, history=historical_anomalies):
+def predict_health_risks(data, anomalies, history):
     """
     Predicts potential health risks based on sensor data and detected anomalies.
 
     Args:
         data (dict): Processed sensor data.
         anomalies (dict): Detected anomalies.
-        history (list): Historical anomalies.
+        history (list): The patient's historical anomalies (PatientMonitor.history);
+            updated in place.
 
     Returns:
         list: Predicted health risks.
@@ -266,19 +660,22 @@ def predict_health_risks(data, anomalies, history=historical_anomalies):
 # --- Alerts and Notifications Functions ---
 
 
-def generate_alert(message, level):
+def generate_alert(message, level, patient_id="default"):
     """
     Creates an alert with a specified severity level.
 
     Args:
         message (str): The alert message.
         level (str): The severity level ('info', 'warning', 'critical').
+        patient_id (str): The patient the alert is about.
     """
     if level not in ["info", "warning", "critical"]:
         level = "info"  # Default to 'info' if invalid level provided
-    alert = {"message": message, "level": level, "timestamp": datetime.datetime.now()}
+    alert = {"message": message, "level": level, "timestamp": clock.now(), "patient": patient_id}
     alerts.append(alert)
-    log_alert(alert)
+    metrics.ALERTS_TOTAL.inc(level=level)
+    with metrics.time_stage("log_alert"):
+        log_alert(alert)
 
 
 def display_alerts(window):
@@ -302,9 +699,17 @@ def log_alert(alert):
     """
     Records alerts for future reference.
 
+    The alert is handed to the dispatcher, which writes alerts.log and
+    notifies the other configured sinks on its own threads, so a slow
+    sink never holds up the monitoring loop.
+
     Args:
         alert (dict): The alert to log.
     """
+    if alert_dispatcher is not None:
+        alert_dispatcher.dispatch(alert)
+        return
+    # Settings not applied yet: write the log file directly
     with open("alerts.log", "a") as f:
         timestamp = alert["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
         log_message = f"{timestamp} - {alert['level'].upper()}: {alert['message']}\n"
@@ -324,6 +729,19 @@ def create_main_window():
     """
     sg.theme("LightBlue")
 
+    trend_points = settings.get("trends", {}).get("points", 120)
+    visible_rows = settings.get("dashboard", {}).get("visible_rows", 10)
+
+    def trend_graph(key):
+        low, high = TREND_Y_RANGES[key]
+        return sg.Graph(
+            canvas_size=(200, 30),
+            graph_bottom_left=(0, low),
+            graph_top_right=(trend_points, high),
+            background_color="white",
+            key=f"{key}_trend",
+        )
+
     # Define the GUI layout
     layout = [
         [
@@ -335,18 +753,60 @@ def create_main_window():
             )
         ],
         [sg.HorizontalSeparator()],
-        [sg.Text("Heart Rate:", size=(20, 1)), sg.Text("", key="heart_rate")],
-        [sg.Text("Systolic BP:", size=(20, 1)), sg.Text("", key="systolic_bp")],
-        [sg.Text("Diastolic BP:", size=(20, 1)), sg.Text("", key="diastolic_bp")],
+        [sg.Text("Ward Overview:", font=("Helvetica", 12))],
+        [
+            # Only the visible rows exist; WardDashboard scrolls through the patients
+            sg.Table(
+                values=[[""] * len(dashboard.COLUMNS)] * visible_rows,
+                headings=list(dashboard.COLUMNS),
+                col_widths=list(dashboard.COLUMN_WIDTHS),
+                auto_size_columns=False,
+                num_rows=visible_rows,
+                justification="left",
+                hide_vertical_scroll=True,
+                enable_events=True,
+                key="ward",
+            ),
+            sg.Slider(
+                range=(0, 0),
+                orientation="v",
+                size=(8, 15),
+                disable_number_display=True,
+                enable_events=True,
+                key="ward_scroll",
+            ),
+        ],
+        [sg.HorizontalSeparator()],
+        [
+            sg.Text("Heart Rate:", size=(20, 1)),
+            sg.Text("", size=(14, 1), key="heart_rate"),
+            trend_graph("heart_rate"),
+        ],
+        [
+            sg.Text("Systolic BP:", size=(20, 1)),
+            sg.Text("", size=(14, 1), key="systolic_bp"),
+            trend_graph("systolic_bp"),
+        ],
+        [
+            sg.Text("Diastolic BP:", size=(20, 1)),
+            sg.Text("", size=(14, 1), key="diastolic_bp"),
+            trend_graph("diastolic_bp"),
+        ],
         [
             sg.Text("Body Temperature:", size=(20, 1)),
-            sg.Text("", key="body_temperature"),
+            sg.Text("", size=(14, 1), key="body_temperature"),
+            trend_graph("body_temperature"),
         ],
         [
             sg.Text("Respiratory Rate:", size=(20, 1)),
-            sg.Text("", key="respiratory_rate"),
+            sg.Text("", size=(14, 1), key="respiratory_rate"),
+            trend_graph("respiratory_rate"),
+        ],
+        [
+            sg.Text("Oxygen Saturation (SpO₂):", size=(20, 1)),
+            sg.Text("", size=(14, 1), key="spo2"),
+            trend_graph("spo2"),
         ],
-        [sg.Text("Oxygen Saturation (SpO₂):", size=(20, 1)), sg.Text("", key="spo2")],
         [sg.HorizontalSeparator()],
         [sg.Text("Anomalies Detected:", font=("Helvetica", 12))],
         [sg.Multiline("", size=(50, 4), key="anomalies", disabled=True)],
@@ -436,6 +896,64 @@ def create_settings_window(current_settings):
     return window
 
 
+def create_trend_charts(window):
+    """
+    Attaches a live trend chart to each vital's graph in the main window.
+
+    Args:
+        window: The PySimpleGUI window object.
+    """
+    trend_settings = settings.get("trends", {})
+    window_seconds = trend_settings.get("window_seconds", 3600)
+    points = trend_settings.get("points", 120)
+    normal_ranges = settings.get("normal_ranges", {})
+    now = clock.time()
+    trend_charts.clear()
+    for key, y_range in TREND_Y_RANGES.items():
+        chart = trends.TrendChart(
+            window[f"{key}_trend"],
+            window_seconds=window_seconds,
+            points=points,
+            y_range=y_range,
+            normal_range=normal_ranges.get(key),
+        )
+        # Seed the chart from the finest rollup tier that covers its window in
+        # at most points * 2 buckets (see RollupStore.choose_tier())
+        _, history = rollup_store.query(key, now - window_seconds, now, max_points=points * 2)
+        chart.load_history([(start, mean) for start, _, _, mean, _ in history])
+        trend_charts[key] = chart
+
+
+def create_ward_dashboard(window):
+    """
+    Attaches the ward dashboard to the main window's patient table.
+
+    Args:
+        window: The PySimpleGUI window object.
+    """
+    global ward_dashboard
+
+    ward_dashboard = dashboard.WardDashboard(
+        window["ward"],
+        slider=window["ward_scroll"],
+        visible_rows=settings.get("dashboard", {}).get("visible_rows", 10),
+    )
+
+
+def record_trends(timestamp, processed_data):
+    """
+    Feeds a reading of the displayed patient into the trend charts.
+
+    Args:
+        timestamp (float): clock.time() value when the reading was taken.
+        processed_data (dict): Processed sensor data.
+    """
+    for key, chart in trend_charts.items():
+        value = processed_data.get(key)
+        if isinstance(value, (int, float)):
+            chart.add(timestamp, value)
+
+
 # --- Event Handling Functions ---
 
 
@@ -451,21 +969,23 @@ def handle_events(event, values, window):
     Returns:
         bool: True to continue the event loop, False to exit.
     """
-    global application_running, settings, stop_event
+    global application_running, settings, sensor_queue, samples_dropped_reported
 
     try:
         if event == sg.WIN_CLOSED or event == "Exit":
-            # Stop the data updater thread
-            stop_event.set()
+            # Stop the data updater and the scheduler thread
+            stop_sensor_data()
+            sensor_supervisor.shutdown(join_timeout=2)
             log_event("Application exit requested.")
             return False  # Signal to exit the event loop
 
         elif event == "Start":
             if not application_running:
                 application_running = True
-                stop_event.clear()
                 # Start updating sensor data
-                update_sensor_data(latest_data)
+                sensor_queue = create_sensor_queue()
+                samples_dropped_reported = 0
+                update_sensor_data(sensor_queue)
                 window["Start"].update(disabled=True)
                 window["Stop"].update(disabled=False)
                 log_event("Data simulation started.")
@@ -473,12 +993,22 @@ def handle_events(event, values, window):
         elif event == "Stop":
             if application_running:
                 application_running = False
-                # Signal the data updater thread to stop
-                stop_event.set()
+                # Stop the data updater and wait for it to finish
+                stop_sensor_data()
                 window["Start"].update(disabled=False)
                 window["Stop"].update(disabled=True)
                 log_event("Data simulation stopped.")
 
+        elif ward_dashboard is not None and ward_dashboard.handle_event(event, values):
+            pass  # The dashboard scrolled
+
+        elif event == "ward":
+            # A row of the ward dashboard was selected
+            for row in values["ward"]:
+                patient_id = ward_dashboard.patient_at(row)
+                if patient_id is not None:
+                    log_event(f"Patient '{patient_id}' selected on the ward dashboard.")
+
         elif event == "Settings":
             # Open the settings window
             settings_window = create_settings_window(settings)
@@ -497,11 +1027,16 @@ def handle_events(event, values, window):
                             lower = float(s_values[f"{param}_lower"])
                             upper = float(s_values[f"{param}_upper"])
                             settings["normal_ranges"][param] = [lower, upper]
-                        save_settings(settings)
+                        saved = save_settings(settings, wait=True)
                         apply_settings()
-                        sg.popup("Settings saved successfully.")
+                        for stream in sensor_supervisor.live_streams():
+                            sensor_supervisor.set_interval(stream, stream_interval(stream))
+                        if saved:
+                            sg.popup("Settings saved successfully.")
+                        else:
+                            report_settings_error()
                         settings_window.close()
-                        log_event("Settings updated and saved.")
+                        log_event("Settings updated and saved." if saved else "Settings updated but not saved.")
                         break
                     except ValueError as ve:
                         sg.popup("Please enter valid numeric values.")
@@ -537,6 +1072,12 @@ def update_ui(window, processed_data, anomalies, health_risks):
     )
     window["spo2"].update(f"{processed_data.get('spo2', 'N/A')} %")
 
+    # Redraw only what changed on the trend charts and the ward dashboard
+    for chart in trend_charts.values():
+        chart.draw()
+    if ward_dashboard is not None:
+        ward_dashboard.refresh()
+
     # Display anomalies
     abnormal_parameters = [
         key for key, status in anomalies.items() if status == "abnormal"
@@ -545,6 +1086,9 @@ def update_ui(window, processed_data, anomalies, health_risks):
         anomalies_text = ", ".join(abnormal_parameters)
     else:
         anomalies_text = "None"
+    imputed_parameters = [key for key, status in anomalies.items() if status == "imputed"]
+    if imputed_parameters:
+        anomalies_text += f"\n(imputed: {', '.join(imputed_parameters)})"
     window["anomalies"].update(anomalies_text)
 
     # Display health risks
@@ -558,14 +1102,284 @@ def update_ui(window, processed_data, anomalies, health_risks):
     display_alerts(window)
 
 
-def run_event_loop(window):
+def monitor_loaded(monitor):
+    """
+    Called when an evicted patient monitor is read back from disk.
+
+    Args:
+        monitor (monitors.PatientMonitor): The rehydrated monitor.
+    """
+    # Like after a restart, anomalies and risks that were alerting stay
+    # latched instead of alerting again
+    alarm_tracker.seed(
+        monitor.patient_id,
+        monitor.current_anomalies,
+        monitor.current_health_risks,
+        clock.monotonic(),
+        critical=monitor.critical_anomalies,
+    )
+
+
+def monitor_evicted(monitor):
+    """
+    Called when an idle patient monitor is moved out of memory; drops the
+    patient's state held outside the monitor.
+
+    Args:
+        monitor (monitors.PatientMonitor): The evicted monitor.
+    """
+    alarm_tracker.forget(monitor.patient_id)
+    imputer.forget(monitor.patient_id)
+    rule_engine.forget(monitor.patient_id)
+    if ward_dashboard is not None:
+        ward_dashboard.remove_patient(monitor.patient_id)
+
+
+def discharge_patient(patient_id):
+    """
+    Forgets a discharged patient: their monitor, its saved state file, and
+    the state held outside the monitor.
+
+    Args:
+        patient_id (str): The discharged patient.
+    """
+    monitor = patient_monitors.remove(patient_id) or monitors.PatientMonitor(patient_id)
+    monitor_evicted(monitor)
+    log_event(f"Discharged patient {patient_id}")
+
+
+def process_reading(processed_data, patient_id="default", z_scores=None):
+    """
+    Runs anomaly detection, risk prediction and alerting for one reading.
+
+    Args:
+        processed_data (dict): Processed sensor data.
+        patient_id (str): The patient the reading belongs to.
+        z_scores (dict): The reading's z-scores against the patient's
+            baseline, see ingest_batch().
+
+    Returns:
+        tuple: (anomalies, health_risks) for the reading; anomalies are the
+        reading's own classification, not the latched alarm states.
+    """
+    now = clock.monotonic()
+    monitor = patient_monitors.get(patient_id, now)
+    # Alerts of other patients than the default one say whom they are about
+    prefix = "" if patient_id == "default" else f"{patient_id}: "
+
+    # Detect anomalies
+    with metrics.time_stage("detect_anomalies"):
+        anomalies = detect_anomalies(processed_data, z_scores)
+
+    # Hysteresis and hold-offs decide when to notify: a parameter keeps
+    # alerting until it has been back inside its exit band for a while, and
+    # re-alerts only on escalation. Everything else (history, risks, display)
+    # sees this reading's own classification.
+    latched, raised = alarm_tracker.update(patient_id, processed_data, anomalies, now)
+    for parameter, level, value in raised:
+        if level == "warning":
+            message = f"{prefix}{parameter} reading is abnormal: {value}"
+        else:
+            message = f"{prefix}{parameter} reading is critically abnormal: {value}"
+        with metrics.time_stage("generate_alert"):
+            generate_alert(message, level=level, patient_id=patient_id)
+        log_event(f"Alert generated: {message}")
+    monitor.current_anomalies = {key for key, status in latched.items() if status == "abnormal"}
+    monitor.critical_anomalies = alarm_tracker.critical(patient_id) if monitor.current_anomalies else set()
+
+    # Predict health risks
+    with metrics.time_stage("predict_health_risks"):
+        health_risks = predict_health_risks(processed_data, anomalies, monitor.history)
+
+    # Generate alerts for new health risks
+    monitor.current_health_risks, new_health_risks = alarm_tracker.latch_risks(patient_id, health_risks, now)
+    for risk in new_health_risks:
+        with metrics.time_stage("generate_alert"):
+            generate_alert(f"{prefix}{risk}", level="critical", patient_id=patient_id)
+        log_event(f"Critical alert generated: {prefix}{risk}")
+
+    return anomalies, health_risks
+
+
+def evaluate_rules(readings, now):
+    """
+    Evaluates the user-defined rules once for a whole batch of patients.
+
+    Rules see the processed data, imputed values included, so a short
+    sensor dropout does not restart a rule's hold time.
+
+    Args:
+        readings (dict): Patient id to the patient's latest processed data.
+        now (float): clock.monotonic() value of the batch.
+    """
+    if not rule_engine.rules or not readings:
+        return
+    with metrics.time_stage("evaluate_rules"):
+        parameters = dict.fromkeys(key for data in readings.values() for key in data)
+        columns = {key: [data.get(key) for data in readings.values()] for key in parameters}
+        fired = rule_engine.evaluate(list(readings), columns, now)
+    # Attribute each alert to the patient the engine reports it for
+    for patient, rule in fired:
+        message = rule.message if patient == "default" else f"{patient}: {rule.message}"
+        with metrics.time_stage("generate_alert"):
+            generate_alert(message, level=rule.level, patient_id=patient)
+        log_event(f"Rule alert generated: {message}")
+
+
+def check_backpressure():
+    """
+    Raises a warning alert when the producer is outrunning the pipeline.
+    """
+    global last_backpressure_alert
+
+    overload_events = sensor_queue.take_overload_events()
+    if not overload_events:
+        return
+    metrics.BACKPRESSURE_EVENTS.inc(overload_events, policy=sensor_queue.policy)
+
+    alert_interval = settings.get("backpressure", {}).get("alert_interval", 30)
+    now = clock.monotonic()
+    if now - last_backpressure_alert >= alert_interval:
+        last_backpressure_alert = now
+        message = (
+            f"Monitoring pipeline is falling behind: {overload_events} samples hit a full "
+            f"queue (policy {sensor_queue.policy}, {sensor_queue.dropped} dropped, "
+            f"{sensor_queue.coalesced} coalesced so far)."
+        )
+        generate_alert(message, level="warning")
+        log_event(f"Backpressure alert generated: {message}")
+
+
+def ingest_batch(readings):
+    """
+    Runs a batch of raw readings through the whole pipeline: processing,
+    detection and alerting, history, the ward dashboard and, for the
+    displayed patient, the trend charts and rollups. The rules are evaluated
+    once for the batch, on each patient's latest reading.
+
+    Args:
+        readings (list): (patient_id, raw_data, taken_at) tuples, oldest
+            first, where taken_at is the clock.time() value when the reading
+            was produced. Imputation and rule hold times use the time the
+            batch is processed.
+
+    Returns:
+        list: (processed_data, anomalies, health_risks), one per reading.
+    """
+    now = clock.monotonic()
+    # Process the sensor data of the whole batch at once
+    with metrics.time_stage("process_sensor_data"):
+        patients = [patient_id for patient_id, _, _ in readings]
+        processed = process_sensor_data(patients, [raw_data for _, raw_data, _ in readings], now)
+    metrics.READINGS_PROCESSED.inc(len(readings))
+
+    # Score the batch against the patients' baselines, which also learn from
+    # it; imputed values are neither scored nor learned
+    z_columns = {}
+    if baseline_store is not None:
+        with metrics.time_stage("score_baselines"):
+            columns = {
+                parameter: [None if parameter in data.imputed else data.get(parameter) for data in processed]
+                for parameter in baseline_store.parameters
+            }
+            z_columns = baseline_store.score_batch(patients, columns)
+
+    results = []
+    latest = {}
+    for i, ((patient_id, raw_data, taken_at), processed_data) in enumerate(zip(readings, processed)):
+        patient_monitors.get(patient_id, now).latest_data = raw_data
+
+        z_scores = {parameter: column[i] for parameter, column in z_columns.items()} if z_columns else None
+        anomalies, health_risks = process_reading(processed_data, patient_id, z_scores)
+        if vitals_history is not None:
+            abnormal = [key for key, status in anomalies.items() if status == "abnormal"]
+            vitals_history.append(patient_id, taken_at, processed_data, abnormal)
+        if ward_dashboard is not None:
+            ward_dashboard.update_patient(patient_id, processed_data, anomalies, health_risks)
+
+        # The trend charts and rollups cover the displayed patient only
+        if patient_id == displayed_patient:
+            record_trends(taken_at, processed_data)
+            # Aggregate measured (not imputed) values into the long-term history
+            with metrics.time_stage("rollups"):
+                rollup_store.add(
+                    taken_at,
+                    {key: value for key, value in processed_data.items() if key not in processed_data.imputed},
+                )
+        latest[patient_id] = processed_data
+        results.append((processed_data, anomalies, health_risks))
+
+    evaluate_rules(latest, now)
+    return results
+
+
+def process_tick(window):
+    """
+    Runs the pending sensor readings through the monitoring pipeline.
+
+    Args:
+        window: The PySimpleGUI window object (None when running headless).
+    """
+    global samples_dropped_reported
+
+    tick_start = time.perf_counter()
+
+    max_batch = settings.get("backpressure", {}).get("max_batch", 16)
+    batch = sensor_queue.get_batch(max_batch)
+    check_backpressure()
+    samples_dropped = sensor_queue.dropped + sensor_queue.coalesced
+    metrics.DROPPED_SAMPLES.inc(samples_dropped - samples_dropped_reported)
+    samples_dropped_reported = samples_dropped
+    if not batch:
+        # An idle ward is exactly when idle monitors should go and the
+        # gauges should show the queues draining
+        patient_monitors.evict(clock.monotonic())
+        update_queue_gauges()
+        return
+
+    now = clock.monotonic()
+    wall_now = clock.time()
+    readings = []
+    for produced_at, frame in batch:
+        metrics.SAMPLE_AGE.observe(now - produced_at)
+        patient, _, raw_data, _ = records.unpack_record(frame)
+        readings.append((patient_ids.name(patient), raw_data, wall_now - (now - produced_at)))
+    results = ingest_batch(readings)
+    displayed = None
+    for (patient_id, _, _), result in zip(readings, results):
+        if patient_id == displayed_patient:
+            displayed = result
+
+    # Move the monitors of idle patients out of memory
+    patient_monitors.evict(now)
+
+    # Update the UI once per tick with the displayed patient's latest reading
+    if window is not None:
+        with metrics.time_stage("update_ui"):
+            if displayed is not None:
+                update_ui(window, *displayed)
+            else:
+                # The rest of the ward and the alerts still changed
+                if ward_dashboard is not None:
+                    ward_dashboard.refresh()
+                display_alerts(window)
+
+    metrics.TICK_LATENCY.observe(time.perf_counter() - tick_start)
+    update_queue_gauges()
+
+
+def run_event_loop(window, profiler=None):
     """
     Main loop that keeps the application running and responsive.
 
     Args:
         window: The PySimpleGUI window object.
+        profiler (profiling.LoopProfiler): Optional profiler wrapping each tick.
     """
-    global application_running, current_anomalies, current_health_risks
+    global application_running
+
+    last_metrics_dump = clock.monotonic()
+    last_snapshot = clock.monotonic()
 
     try:
         while True:
@@ -575,45 +1389,235 @@ def run_event_loop(window):
             continue_loop = handle_events(event, values, window)
             if not continue_loop:
                 break
-
-            if application_running:
-                # Get the latest data
-                raw_data = latest_data.copy()
-
-                # Process the sensor data
-                processed_data = process_sensor_data(raw_data)
-
-                # Detect anomalies
-                anomalies = detect_anomalies(processed_data)
-
-                # Generate alerts for new anomalies
-                new_anomalies = set()
-                for parameter, status in anomalies.items():
-                    if status == "abnormal":
-                        new_anomalies.add(parameter)
-                        if parameter not in current_anomalies:
-                            message = f"{parameter} reading is abnormal: {processed_data.get(parameter)}"
-                            generate_alert(message, level="warning")
-                            log_event(f"Alert generated: {message}")
-                # Update current anomalies
-                current_anomalies = new_anomalies
-
-                # Predict health risks
-                health_risks = predict_health_risks(processed_data, anomalies)
-
-                # Generate alerts for new health risks
-                new_health_risks = set(health_risks)
-                for risk in new_health_risks:
-                    if risk not in current_health_risks:
-                        generate_alert(risk, level="critical")
-                        log_event(f"Critical alert generated: {risk}")
-                # Update current health risks
-                current_health_risks = new_health_risks
-
-                # Update the UI
-                update_ui(window, processed_data, anomalies, health_risks)
+            report_settings_error()
+
+            if application_running and sensor_queue is not None:
+                if profiler is not None:
+                    with profiler.tick():
+                        process_tick(window)
+                else:
+                    process_tick(window)
+
+            # Periodically dump the metrics file if one is configured
+            metrics_settings = settings.get("metrics", {})
+            dump_interval = metrics_settings.get("dump_interval", 15)
+            if metrics_settings.get("file") and clock.monotonic() - last_metrics_dump >= dump_interval:
+                dump_metrics_file()
+                last_metrics_dump = clock.monotonic()
+
+            # Periodically snapshot the monitoring state
+            snapshot_interval = settings.get("snapshot", {}).get("interval", 30)
+            if clock.monotonic() - last_snapshot >= snapshot_interval:
+                save_state()
+                last_snapshot = clock.monotonic()
     except Exception as e:
         handle_error(e)
+    finally:
+        save_state()
+        dump_metrics_file()
+        if profiler is not None:
+            profiler.close()
+
+
+def run_simulation(duration, tick_interval=0.5, stream="default"):
+    """
+    Runs the monitoring pipeline without a window for a period of clock time.
+
+    With a VirtualClock installed through set_clock() the clock jumps from
+    one sensor deadline to the next, so an hour of monitoring runs in a
+    fraction of a second; with the system clock it runs in real time.
+
+    Args:
+        duration (float): Seconds of clock time to simulate.
+        tick_interval (float): Clock time between two pipeline ticks (the
+            event loop's read timeout in the GUI).
+        stream (str): Sensor stream to simulate.
+    """
+    global sensor_queue, samples_dropped_reported
+
+    sensor_queue = create_sensor_queue()
+    samples_dropped_reported = 0
+    update_sensor_data(sensor_queue, stream=stream)
+    end = clock.monotonic() + duration
+    try:
+        while clock.monotonic() < end:
+            if clock.virtual:
+                clock.run(sensor_scheduler, min(tick_interval, end - clock.monotonic()))
+            else:
+                clock.sleep(tick_interval)
+            process_tick(None)
+    finally:
+        stop_sensor_data(stream)
+
+
+# --- State Persistence Functions ---
+
+
+def collect_state():
+    """
+    Gathers the monitoring state that survives restarts.
+
+    Returns:
+        dict: Patient id to state dict, as expected by snapshot.save_snapshot().
+    """
+    # Only the resident alerts; spilled alerts are already on disk
+    patient_alerts = {}
+    for alert in alerts.resident:
+        patient_alerts.setdefault(alert.get("patient", "default"), []).append(alert)
+    state = {
+        monitor.patient_id: monitor.state(patient_alerts.pop(monitor.patient_id, []))
+        for monitor in patient_monitors
+    }
+    # Patients whose monitor is evicted only contribute their alerts; the
+    # monitor itself is in settings["patients"]["dir"]
+    for patient_id, remaining in patient_alerts.items():
+        state[patient_id] = monitors.PatientMonitor(patient_id).state(remaining)
+    return state
+
+
+def save_state():
+    """
+    Writes a binary snapshot of the monitoring state, if configured.
+    """
+    snapshot_file = settings.get("snapshot", {}).get("file")
+    if not snapshot_file:
+        return
+    # The snapshot only holds resident alerts, so the spilled ones must be
+    # on disk before it is written
+    alerts.flush()
+    try:
+        with metrics.time_stage("save_snapshot"):
+            size = snapshot.save_snapshot(snapshot_file, collect_state())
+        logging.debug(f"Monitoring state snapshot written ({size} bytes).")
+    except (OSError, snapshot.SnapshotError) as e:
+        logging.error(f"Could not write state snapshot: {e}")
+
+    rollups_file = settings.get("rollups", {}).get("file")
+    if rollups_file:
+        try:
+            rollups.save_rollups(rollups_file, rollup_store)
+        except OSError as e:
+            logging.error(f"Could not write vitals rollups: {e}")
+
+    if vitals_history is not None:
+        try:
+            vitals_history.flush()
+        except OSError as e:
+            logging.error(f"Could not write vitals history: {e}")
+
+    if baseline_store is not None:
+        baseline_store.flush()
+
+
+def restore_state():
+    """
+    Restores the monitoring state from the last snapshot, if there is one.
+
+    Restoring the current anomaly/risk sets keeps alerts that were already
+    raised from firing again, and the history keeps persistence windows intact.
+    """
+    global rollup_store
+
+    rollup_settings = settings.get("rollups", {})
+    rollup_store = rollups.RollupStore(rollup_settings.get("tiers", rollups.DEFAULT_TIERS))
+    rollups_file = rollup_settings.get("file")
+    if rollups_file and os.path.exists(rollups_file):
+        try:
+            rollup_store = rollups.load_rollups(rollups_file)
+        except (OSError, ValueError, zlib.error) as e:
+            logging.error(f"Ignoring unreadable vitals rollups: {e}")
+
+    snapshot_file = settings.get("snapshot", {}).get("file")
+    if not snapshot_file or not os.path.exists(snapshot_file):
+        return
+    try:
+        start = time.perf_counter()
+        saved_at, patients = snapshot.load_snapshot(snapshot_file)
+    except snapshot.SnapshotError as e:
+        logging.error(f"Ignoring unreadable state snapshot: {e}")
+        return
+
+    now = clock.monotonic()
+    restored_alerts = []
+    for patient_id, state in patients.items():
+        # A state with alerts only belongs to an evicted monitor, which is
+        # read back from disk on the patient's next reading
+        if state["historical_anomalies"] or state["current_anomalies"] or state["current_health_risks"]:
+            monitor = patient_monitors.get(patient_id, now)
+            monitor.restore(state)
+            alarm_tracker.seed(
+                patient_id,
+                monitor.current_anomalies,
+                monitor.current_health_risks,
+                now,
+                critical=monitor.critical_anomalies,
+            )
+        for alert in state["alerts"]:
+            alert["patient"] = patient_id
+        restored_alerts.extend(state["alerts"])
+    restored_alerts.sort(key=lambda alert: alert["timestamp"])
+    alerts.restore_resident(restored_alerts)
+    log_event(
+        f"Monitoring state of {len(patients)} patients restored from snapshot taken "
+        f"{saved_at:%Y-%m-%d %H:%M:%S} in {(time.perf_counter() - start) * 1000:.1f} ms."
+    )
+
+
+# --- Metrics Functions ---
+
+
+def update_queue_gauges():
+    """
+    Publishes the current size of the in-memory monitoring queues.
+    """
+    metrics.QUEUE_DEPTH.set(len(alerts.resident), queue="alerts")
+    metrics.STATE_RESIDENT_BYTES.set(alerts.resident_bytes, state="alerts")
+    metrics.SPILLED_ITEMS.set(alerts.spilled, state="alerts")
+    if alert_dispatcher is not None:
+        for sink, pending in alert_dispatcher.pending().items():
+            metrics.QUEUE_DEPTH.set(pending, queue=f"alert_sink_{sink}")
+    if sensor_queue is not None:
+        metrics.QUEUE_DEPTH.set(len(sensor_queue), queue="sensor_samples")
+    metrics.LIVE_PRODUCERS.set(sensor_supervisor.live_count())
+    for stream, stats in sensor_scheduler.stats().items():
+        for stat in ("p50_jitter", "p99_jitter", "max_jitter"):
+            metrics.SCHEDULER_JITTER.set(stats[stat], stream=stream, stat=stat)
+    history = anomalies = risks = 0
+    for monitor in patient_monitors:
+        history += len(monitor.history)
+        anomalies += len(monitor.current_anomalies)
+        risks += len(monitor.current_health_risks)
+    metrics.QUEUE_DEPTH.set(len(patient_monitors), queue="patient_monitors")
+    metrics.QUEUE_DEPTH.set(history, queue="historical_anomalies")
+    metrics.QUEUE_DEPTH.set(anomalies, queue="current_anomalies")
+    metrics.QUEUE_DEPTH.set(risks, queue="current_health_risks")
+
+
+def start_metrics():
+    """
+    Starts the local Prometheus endpoint if a port is configured.
+    """
+    global metrics_server
+
+    port = settings.get("metrics", {}).get("port")
+    if port and metrics_server is None:
+        try:
+            metrics_server = metrics.start_metrics_server(int(port))
+            log_event(f"Metrics endpoint started on port {port}.")
+        except OSError as e:
+            logging.error(f"Could not start metrics endpoint: {e}")
+
+
+def dump_metrics_file():
+    """
+    Writes the metrics to the configured file, if any.
+    """
+    metrics_file = settings.get("metrics", {}).get("file")
+    if metrics_file:
+        try:
+            metrics.dump_metrics(metrics_file)
+        except OSError as e:
+            logging.error(f"Could not write metrics file: {e}")
 
 
 # --- Main Application ---
@@ -631,6 +1635,8 @@ def main():
         settings = load_settings()
         apply_settings()
         log_event("Settings loaded successfully.")
+        start_metrics()
+        restore_state()
 
         # Create the login window (optional)
         login_window = create_login_window()
@@ -657,13 +1663,23 @@ def main():
 
         # Create the main window
         window = create_main_window()
+        create_trend_charts(window)
+        create_ward_dashboard(window)
         log_event("Main window created.")
 
-        # Run the event loop
-        run_event_loop(window)
+        # Run the event loop (profiling is enabled via --profile-ticks,
+        # --tracemalloc-every or the ECARE_PROFILE_* environment variables)
+        run_event_loop(window, profiler=profiling.create_loop_profiler())
 
         # Close the window
         window.close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if settings_writer is not None:
+            settings_writer.close()
+        if alert_dispatcher is not None:
+            alert_dispatcher.close()
+        alerts.flush()
         log_event("Application closed.")
 
     except Exception as e:
@@ -0,0 +1,119 @@
+import time
+
+# Fallback values used when no recent observation can be carried forward
+DEFAULT_IMPUTATION_TABLE = {
+    "heart_rate": {"default": 80, "max_staleness": 10},
+    "systolic_bp": {"default": 120, "max_staleness": 60},
+    "diastolic_bp": {"default": 80, "max_staleness": 60},
+    "body_temperature": {"default": 37.0, "max_staleness": 300},
+    "respiratory_rate": {"default": 16, "max_staleness": 10},
+    "spo2": {"default": 98, "max_staleness": 10},
+}
+
+
+class Reading(dict):
+    """
+    Processed sensor data that also records which values were imputed.
+
+    It behaves exactly like the plain dict the pipeline used before; the
+    extra `imputed` attribute is the imputed-mask for the reading.
+    """
+
+    __slots__ = ("imputed",)
+
+    def __init__(self, data=(), imputed=frozenset()):
+        super().__init__(data)
+        self.imputed = frozenset(imputed)
+
+
+class Imputer:
+    """
+    Table-driven missing-value imputation with last-observation-carried-forward.
+
+    A missing value is replaced by the patient's last observed value for the
+    parameter if it is no older than the parameter's max_staleness (seconds);
+    otherwise by the parameter's default from the table.
+    """
+
+    def __init__(self, table=None):
+        """
+        Args:
+            table (dict): Parameter name to {"default": value, "max_staleness": seconds}.
+                Parameters that are not listed are left as None.
+        """
+        self.table = dict(DEFAULT_IMPUTATION_TABLE if table is None else table)
+        self._last = {parameter: {} for parameter in self.table}  # patient -> (value, time)
+
+    def impute_batch(self, patients, columns, now=None):
+        """
+        Fills missing values for a batch of patients, one column at a time.
+
+        Args:
+            patients (list): Patient ids, one per column entry.
+            columns (dict): Parameter name to a list of values (None = missing).
+            now (float): Time of the readings in seconds (defaults to time.monotonic()).
+
+        Returns:
+            tuple: (filled columns, masks) where masks maps each parameter to a
+            list of booleans that are True where the value was imputed.
+        """
+        now = time.monotonic() if now is None else now
+        filled = {}
+        masks = {}
+        for parameter, values in columns.items():
+            entry = self.table.get(parameter)
+            if entry is None:
+                filled[parameter] = list(values)
+                masks[parameter] = [False] * len(values)
+                continue
+
+            last = self._last[parameter]
+            mask = [value is None for value in values]
+            if not any(mask):
+                # Common case: nothing missing, just remember the observations
+                last.update(zip(patients, [(value, now) for value in values]))
+                filled[parameter] = list(values)
+                masks[parameter] = mask
+                continue
+
+            default = entry.get("default")
+            max_staleness = entry.get("max_staleness", 0)
+            column = list(values)
+            for i, (patient, missing) in enumerate(zip(patients, mask)):
+                if missing:
+                    observed = last.get(patient)
+                    if observed is not None and now - observed[1] <= max_staleness:
+                        column[i] = observed[0]
+                    else:
+                        column[i] = default
+                else:
+                    last[patient] = (column[i], now)
+            filled[parameter] = column
+            masks[parameter] = mask
+        return filled, masks
+
+    def impute(self, patient, data, now=None):
+        """
+        Fills missing values of a single reading.
+
+        Args:
+            patient (str): Patient id.
+            data (dict): Raw sensor data.
+            now (float): Time of the reading in seconds.
+
+        Returns:
+            Reading: The processed data with its imputed-mask.
+        """
+        columns = {parameter: [value] for parameter, value in data.items()}
+        filled, masks = self.impute_batch([patient], columns, now)
+        return Reading(
+            {parameter: column[0] for parameter, column in filled.items()},
+            imputed=[parameter for parameter, mask in masks.items() if mask[0]],
+        )
+
+    def forget(self, patient):
+        """
+        Drops the carried-forward observations of a patient.
+        """
+        for last in self._last.values():
+            last.pop(patient, None)
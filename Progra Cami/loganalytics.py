@@ -0,0 +1,345 @@
+import argparse
+import concurrent.futures
+import collections
+import datetime
+import json
+import mmap
+import operator
+import os
+import re
+import sys
+
+# alerts.log: "2024-10-11 07:26:37 - WARNING: systolic_bp reading is abnormal: 126",
+# the parameter optionally after a "patient-7: " prefix
+ALERT_LINE = re.compile(
+    rb"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d) - ([A-Z]+): "
+    rb"(?:(?:[^:\n]*: )?(?:Persistent abnormal (\w+) over|(\w+) reading is))?",
+    re.M,
+)
+# application.log: "2024-10-11 07:13:17,302 - INFO - Application started."
+SESSION_EVENTS = (b"Application started.", b"Application closed.", b"Data simulation started.", b"Data simulation stopped.")
+LINE_TIMESTAMP = re.compile(rb"(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)")
+
+ALL_ALERTS = "*"
+OTHER = "other"  # rule, backpressure and other alerts without a parameter
+MIN_PARALLEL_BYTES = 8 * 2**20  # smaller files are scanned in-process
+CHUNK_BYTES = 64 * 2**20  # largest range one worker call scans
+
+
+def _open_map(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def split_chunks(data, parts):
+    """
+    Splits a buffer into about `parts` ranges that start and end on line boundaries.
+
+    Args:
+        data: The mapped file.
+        parts (int): Number of ranges wanted.
+
+    Returns:
+        list: (start, end) byte offsets.
+    """
+    size = len(data)
+    chunks = []
+    start = 0
+    for i in range(1, parts + 1):
+        end = size if i == parts else max(start, size * i // parts)
+        if end < size:
+            newline = data.find(b"\n", end)
+            end = size if newline == -1 else newline + 1
+        if end > start:
+            chunks.append((start, end))
+            start = end
+        if start >= size:
+            break
+    return chunks
+
+
+def _seconds_table(raw_timestamps):
+    """
+    Maps each distinct "YYYY-mm-dd HH:MM:SS" to seconds since the epoch.
+
+    The logs hold naive local times; they are counted as UTC so every day
+    has 86400 seconds and a day is parsed only once.
+    """
+    days = {}
+    table = {}
+    for raw in set(raw_timestamps):
+        day = days.get(raw[:10])
+        if day is None:
+            day = days[raw[:10]] = int(
+                datetime.datetime.fromisoformat(raw[:10].decode("ascii"))
+                .replace(tzinfo=datetime.timezone.utc)
+                .timestamp()
+            )
+        table[raw] = day + int(raw[11:13]) * 3600 + int(raw[14:16]) * 60 + int(raw[17:19])
+    return table
+
+
+def _format_seconds(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _line_timestamp(data, position):
+    # Timestamp of the line containing `position`
+    found = LINE_TIMESTAMP.match(data, data.rfind(b"\n", 0, position) + 1)
+    return None if found is None else _seconds_table([found.group(1)])[found.group(1)]
+
+
+# --- Workers ---
+
+
+def scan_alerts(path, start, end):
+    """
+    Collects alert statistics for one range of alerts.log.
+
+    Returns:
+        dict: Parameter (plus ALL_ALERTS) to [count, first, last, gap sum,
+        min gap, max gap, {level: count}], timestamps in seconds (see _seconds_table()).
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        rows = ALERT_LINE.findall(data, start, end)
+    # Group the timestamps by (level, parameter) in one pass, then do the
+    # arithmetic on whole lists
+    groups = collections.defaultdict(list)
+    for raw_timestamp, level, persistent, reading in rows:
+        groups[level, persistent or reading].append(raw_timestamp)
+    per_parameter = collections.defaultdict(list)
+    levels = collections.defaultdict(dict)
+    for (level, parameter), raw_timestamps in groups.items():
+        parameter = parameter.decode("ascii") if parameter else OTHER
+        level = level.decode("ascii").lower()
+        per_parameter[parameter].extend(raw_timestamps)
+        levels[parameter][level] = len(raw_timestamps)
+        levels[ALL_ALERTS][level] = levels[ALL_ALERTS].get(level, 0) + len(raw_timestamps)
+    if rows:
+        per_parameter[ALL_ALERTS] = [row[0] for row in rows]
+    table = _seconds_table(per_parameter[ALL_ALERTS]) if rows else {}
+
+    stats = {}
+    for parameter, raw_timestamps in per_parameter.items():
+        # Fixed-format timestamps sort like the times they stand for
+        if parameter != ALL_ALERTS:
+            raw_timestamps.sort()
+        timestamps = list(map(table.__getitem__, raw_timestamps))
+        gaps = list(map(operator.sub, timestamps[1:], timestamps[:-1]))
+        stats[parameter] = [
+            len(timestamps),
+            timestamps[0],
+            timestamps[-1],
+            timestamps[-1] - timestamps[0],
+            min(gaps) if gaps else None,
+            max(gaps) if gaps else None,
+            levels[parameter],
+        ]
+    return stats
+
+
+def scan_sessions(path, start, end):
+    """
+    Finds the session boundary events in one range of application.log.
+
+    Returns:
+        list: (timestamp, event, timestamp of the line before) tuples in file order.
+    """
+    found = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # mmap.find() is a plain substring search, far faster than a regex per line
+        for marker in SESSION_EVENTS:
+            position = data.find(marker, start, end)
+            while position != -1:
+                found.append((position, marker))
+                position = data.find(marker, position + len(marker), end)
+        found.sort()
+        events = []
+        for position, marker in found:
+            line_start = data.rfind(b"\n", 0, position) + 1
+            timestamp = _line_timestamp(data, position)
+            # "YYYY-mm-dd HH:MM:SS,mmm" is 23 bytes, then the level
+            if timestamp is None or data[line_start + 23 : position] not in (b" - INFO - ", b" - DEBUG - "):
+                continue  # the text appears inside some other message
+            before = None
+            if marker == b"Application started." and line_start > 0:
+                # The last line of the previous session, maybe in another chunk
+                before = _line_timestamp(data, line_start - 1)
+            events.append((timestamp, marker.decode("ascii").rstrip("."), before))
+        # The end of an unfinished last session
+        if end == len(data) and end > 0:
+            timestamp = _line_timestamp(data, end - 1)
+            if timestamp is not None:
+                events.append((timestamp, "End of log", None))
+    return events
+
+
+# --- Aggregation ---
+
+
+def merge_alert_stats(partials):
+    """
+    Combines the per-chunk results of scan_alerts(), given in file order.
+    """
+    merged = {}
+    for partial in partials:
+        for key, (count, first, last, gap_sum, gap_min, gap_max, levels) in partial.items():
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [count, first, last, gap_sum, gap_min, gap_max, dict(levels)]
+                continue
+            # The gap across the chunk boundary
+            gap = first - entry[2]
+            gaps = [g for g in (entry[4], entry[5], gap_min, gap_max, gap) if g is not None]
+            entry[0] += count
+            entry[2] = last
+            entry[3] += gap_sum + gap
+            entry[4] = min(gaps)
+            entry[5] = max(gaps)
+            for level, level_count in levels.items():
+                entry[6][level] = entry[6].get(level, 0) + level_count
+    return merged
+
+
+def alert_summary(merged):
+    """
+    Returns:
+        dict: Parameter to count, levels, first/last alert and the mean,
+        min and max seconds between two of its alerts.
+    """
+    summary = {}
+    for key, (count, first, last, gap_sum, gap_min, gap_max, levels) in sorted(merged.items()):
+        summary[key] = {
+            "count": count,
+            "levels": levels,
+            "first": _format_seconds(first),
+            "last": _format_seconds(last),
+            "mean_gap_s": round(gap_sum / (count - 1), 2) if count > 1 else None,
+            "min_gap_s": gap_min,
+            "max_gap_s": gap_max,
+        }
+    return summary
+
+
+def build_sessions(events):
+    """
+    Turns the boundary events into sessions.
+
+    A session runs from "Application started" to "Application closed"; a
+    session cut short by a crash ends at the last line before the next start.
+
+    Returns:
+        list: Session dicts with start, end, duration, clean exit flag and
+        the number of simulation runs.
+    """
+    sessions = []
+    current = None
+
+    def finish(end, clean):
+        current["end"] = end
+        current["clean_exit"] = clean
+        sessions.append(current)
+
+    for timestamp, event, before in events:
+        if event == "Application started":
+            if current is not None:
+                finish(before if before is not None else timestamp, False)
+            current = {"start": timestamp, "simulation_runs": 0}
+        elif current is None:
+            continue  # the log starts in the middle of a session
+        elif event == "Application closed":
+            finish(timestamp, True)
+            current = None
+        elif event == "Data simulation started":
+            current["simulation_runs"] += 1
+        elif event == "End of log":
+            finish(timestamp, False)
+            current = None
+
+    for session in sessions:
+        session["duration_s"] = round(session["end"] - session["start"], 3)
+        for key in ("start", "end"):
+            session[key] = _format_seconds(session[key])
+    return sessions
+
+
+def _scan(path, scanner, workers, executor):
+    data = _open_map(path)
+    if data is None:
+        return []
+    with data:
+        size = len(data)
+        parts = 1 if size < MIN_PARALLEL_BYTES or workers <= 1 else workers * 4
+        parts = max(parts, -(-size // CHUNK_BYTES))
+        chunks = split_chunks(data, parts)
+    if executor is None or len(chunks) == 1:
+        return [scanner(path, start, end) for start, end in chunks]
+    return list(executor.map(scanner, [path] * len(chunks), *zip(*chunks)))
+
+
+def analyze(app_log="application.log", alerts_log="alerts.log", workers=None):
+    """
+    Computes the post-mortem statistics of the log files.
+
+    Large files are memory-mapped, split on line boundaries and scanned by
+    a process pool; the partial results are merged in file order.
+
+    Args:
+        app_log (str): Path of application.log (None to skip it).
+        alerts_log (str): Path of alerts.log (None to skip it).
+        workers (int): Worker processes (default: one per CPU).
+
+    Returns:
+        dict: "alerts" (see alert_summary()) and "sessions" (see build_sessions()).
+    """
+    workers = workers or os.cpu_count() or 1
+    report = {"alerts": {}, "sessions": []}
+    executor = concurrent.futures.ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        if alerts_log and os.path.exists(alerts_log):
+            report["alerts"] = alert_summary(merge_alert_stats(_scan(alerts_log, scan_alerts, workers, executor)))
+        if app_log and os.path.exists(app_log):
+            events = [event for part in _scan(app_log, scan_sessions, workers, executor) for event in part]
+            report["sessions"] = build_sessions(events)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return report
+
+
+def format_report(report):
+    lines = ["Alerts per parameter:"]
+    for key, entry in report["alerts"].items():
+        name = "all alerts" if key == ALL_ALERTS else key
+        levels = ", ".join(f"{level} {count}" for level, count in sorted(entry["levels"].items()))
+        gaps = "n/a"
+        if entry["mean_gap_s"] is not None:
+            gaps = f"mean {entry['mean_gap_s']:g} s, min {entry['min_gap_s']:g} s, max {entry['max_gap_s']:g} s"
+        lines.append(f"  {name}: {entry['count']} ({levels}); between alerts: {gaps}")
+    lines.append(f"Sessions: {len(report['sessions'])}")
+    for session in report["sessions"]:
+        exit_text = "closed" if session["clean_exit"] else "not closed"
+        lines.append(
+            f"  {session['start']} -> {session['end']} ({session['duration_s']:g} s, {exit_text}, "
+            f"{session['simulation_runs']} simulation runs)"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Alert and session statistics from the application logs.")
+    parser.add_argument("--app-log", default="application.log")
+    parser.add_argument("--alerts-log", default="alerts.log")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--json", action="store_true", help="print the statistics as JSON")
+    args = parser.parse_args(argv)
+
+    report = analyze(args.app_log, args.alerts_log, workers=args.workers)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
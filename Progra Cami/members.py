@@ -0,0 +1,234 @@
+import bisect
+import json
+import os
+import time
+import unicodedata
+
+
+class DuplicateMemberError(ValueError):
+    """
+    Raised when registering a member whose email (or, without an email,
+    name) is already taken.
+    """
+
+
+def normalize_key(text):
+    """
+    Canonical form used by the indexes: accents removed, case-folded and
+    with whitespace collapsed, so "José  Pérez" and "jose perez" collide.
+    """
+    text = text or ""
+    if not text.isascii():
+        decomposed = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(text.casefold().split())
+
+
+class MemberRegistry:
+    """
+    Persistent community member registry.
+
+    Members are appended to a JSON-lines file and indexed in memory:
+
+    - a hash index (dict) from every normalized name and email to the member
+      id for lookups, and one from each member's identity (its email, or its
+      name if it has none) for O(1) duplicate checks on register; names
+      alone need not be unique once an email is given;
+    - a sorted prefix index of normalized names, so prefix searches and their
+      pages are a bisect plus a slice instead of a scan.
+    """
+
+    def __init__(self, path="members.jsonl"):
+        """
+        Args:
+            path (str): JSON-lines file the registry is stored in (None keeps
+                it in memory only).
+        """
+        self.path = path
+        self._members = []  # registration order
+        self._by_id = {}
+        self._by_key = {}  # normalized name/email -> member id (the first one registered)
+        self._identities = set()  # normalized email, or name for members without one
+        self._last_number = 0  # largest N of the "member-N" ids handed out
+        self._prefix = []  # sorted (normalized name, member id)
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self):
+        return len(self._members)
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def __contains__(self, key):
+        return self.find(key) is not None
+
+    def _load(self):
+        with open(self.path, "r+b") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                # A write interrupted half-way leaves a partial last line; cut
+                # it off so the next append starts on a line of its own
+                f.truncate(end)
+        for line in data[:end].decode("utf-8", errors="replace").splitlines():
+            try:
+                member = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self._index(member)
+        self._prefix.sort()
+
+    def _keys(self, member):
+        keys = [normalize_key(member["name"])]
+        if member.get("email"):
+            keys.append(normalize_key(member["email"]))
+        return keys
+
+    def _index(self, member, keys=None):
+        if keys is None:
+            keys = self._keys(member)
+        self._members.append(member)
+        self._by_id[member["id"]] = member
+        for key in keys:
+            self._by_key.setdefault(key, member["id"])
+        # The first key is always the normalized name, the last the identity
+        self._identities.add(keys[-1])
+        self._prefix.append((keys[0], member["id"]))
+        prefix, _, number = member["id"].rpartition("-")
+        if prefix == "member" and number.isdigit():
+            self._last_number = max(self._last_number, int(number))
+
+    def _next_id(self, offset=0):
+        return f"member-{self._last_number + offset + 1}"
+
+    def _append(self, members):
+        if not self.path or not members:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(member, ensure_ascii=False) + "\n" for member in members))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _new_member(self, name, email=None, lat=None, lon=None, kind="community"):
+        name = " ".join((name or "").split())
+        if not name:
+            raise ValueError("A member needs a name.")
+        member = {
+            "id": self._next_id(),
+            "name": name,
+            "email": email.strip() if email else None,
+            "kind": kind,
+            "registered_at": time.time(),
+        }
+        if lat is not None and lon is not None:
+            member["lat"], member["lon"] = float(lat), float(lon)
+        return member
+
+    def find(self, key):
+        """
+        Looks a member up by name or email.
+
+        Returns:
+            dict or None: The member.
+        """
+        member_id = self._by_key.get(normalize_key(key))
+        return None if member_id is None else self._by_id[member_id]
+
+    def get(self, member_id):
+        return self._by_id.get(member_id)
+
+    def register(self, name, email=None, lat=None, lon=None, kind="community"):
+        """
+        Adds one member and stores it on disk.
+
+        Args:
+            name (str): Display name.
+            email (str): Optional email.
+            lat (float): Optional latitude.
+            lon (float): Optional longitude.
+            kind (str): "community" or "caregiver".
+
+        Returns:
+            dict: The new member.
+
+        Raises:
+            DuplicateMemberError: If the email (or, without an email, the
+                name) is already registered.
+        """
+        member = self._new_member(name, email, lat, lon, kind)
+        keys = self._keys(member)
+        if keys[-1] in self._identities:
+            raise DuplicateMemberError(f"'{keys[-1]}' is already registered.")
+        self._append([member])
+        self._index(member, keys)
+        # The prefix index stays sorted with a single insertion
+        entry = self._prefix.pop()
+        bisect.insort(self._prefix, entry)
+        return member
+
+    def bulk_import(self, rows):
+        """
+        Registers many members at once, skipping duplicates.
+
+        The file is written once and the prefix index sorted once at the end,
+        instead of once per member.
+
+        Args:
+            rows (iterable): Dicts with "name" and optional "email", "lat",
+                "lon" and "kind".
+
+        Returns:
+            tuple: (added members, skipped rows).
+        """
+        added, skipped = [], []
+        seen = set()
+        for row in rows:
+            try:
+                member = self._new_member(
+                    row.get("name"), row.get("email"), row.get("lat"), row.get("lon"), row.get("kind", "community")
+                )
+            except (TypeError, ValueError):
+                skipped.append(row)
+                continue
+            keys = self._keys(member)
+            if keys[-1] in self._identities or keys[-1] in seen:
+                skipped.append(row)
+                continue
+            seen.add(keys[-1])
+            member["id"] = self._next_id(len(added))
+            added.append((member, keys))
+        self._append([member for member, _ in added])
+        for member, keys in added:
+            self._index(member, keys)
+        self._prefix.sort()
+        return [member for member, _ in added], skipped
+
+    def page(self, page=0, page_size=20):
+        """
+        Returns one page of members in registration order.
+
+        Returns:
+            tuple: (members on the page, total number of members).
+        """
+        start = page * page_size
+        return self._members[start : start + page_size], len(self._members)
+
+    def search(self, prefix, page=0, page_size=20):
+        """
+        Returns one page of the members whose name starts with a prefix.
+
+        Args:
+            prefix (str): Name prefix (accents and case are ignored).
+            page (int): Zero-based page number.
+            page_size (int): Members per page.
+
+        Returns:
+            tuple: (members on the page sorted by name, total number of matches).
+        """
+        key = normalize_key(prefix)
+        low = bisect.bisect_left(self._prefix, (key,))
+        high = bisect.bisect_left(self._prefix, (key + "\U0010ffff",))
+        start = low + page * page_size
+        end = min(start + page_size, high)
+        return [self._by_id[member_id] for _, member_id in self._prefix[start:end]], high - low
@@ -0,0 +1,357 @@
+import bisect
+import http.server
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (in seconds) used for the per-stage latency histograms
+DEFAULT_LATENCY_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+# --- Metric Types ---
+
+
+def _escape(text, quotes=True):
+    # Backslash first, so the escapes added below are not escaped again
+    text = text.replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quotes else text
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.extend(extra)
+    if not pairs:
+        return ""
+    # Label values may contain any text (e.g. a stream named after a patient)
+    body = ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonically increasing value, optionally split by labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        # Unlabelled series are exported as 0 before the first increment
+        self._values = {} if self.label_names else {(): 0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increments the counter.
+
+        Args:
+            amount (float): How much to add.
+            **labels: Label values, one per label name.
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.label_names, key), value
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down (e.g. queue depth).
+    """
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        """
+        Sets the gauge to an absolute value.
+
+        Args:
+            value (float): The new value.
+            **labels: Label values, one per label name.
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """
+    Distribution of observed values over fixed buckets.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Records one observation.
+
+        Args:
+            value (float): The observed value.
+            **labels: Label values, one per label name.
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[key] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted(
+                (key, (list(series[0]), series[1], series[2]))
+                for key, series in self._series.items()
+            )
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            bounds = self.buckets + (float("inf"),)
+            for bound, bucket_count in zip(bounds, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.label_names, key, [("le", _format_value(float(bound)))]
+                )
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class MetricsRegistry:
+    """
+    Holds every metric and renders them in Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, **kwargs)
+                self._metrics[name] = metric
+            elif type(metric) is not cls:
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._get_or_create(Counter, name, documentation, labels=labels)
+
+    def gauge(self, name, documentation, labels=()):
+        return self._get_or_create(Gauge, name, documentation, labels=labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        return self._get_or_create(
+            Histogram, name, documentation, labels=labels, buckets=buckets
+        )
+
+    def render(self):
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation, quotes=False)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# --- Application Metrics ---
+
+REGISTRY = MetricsRegistry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "ecare_stage_latency_seconds",
+    "Time spent in each monitoring pipeline stage.",
+    labels=("stage",),
+)
+TICK_LATENCY = REGISTRY.histogram(
+    "ecare_tick_latency_seconds",
+    "Time spent processing one event loop tick.",
+)
+READINGS_PROCESSED = REGISTRY.counter(
+    "ecare_readings_processed_total",
+    "Sensor readings that went through the pipeline.",
+)
+ALERTS_TOTAL = REGISTRY.counter(
+    "ecare_alerts_total",
+    "Alerts generated, by severity level.",
+    labels=("level",),
+)
+DROPPED_SAMPLES = REGISTRY.counter(
+    "ecare_dropped_samples_total",
+    "Sensor samples dropped or coalesced before the pipeline consumed them.",
+)
+BACKPRESSURE_EVENTS = REGISTRY.counter(
+    "ecare_backpressure_events_total",
+    "Samples offered while the sample queue was full, by overload policy.",
+    labels=("policy",),
+)
+SAMPLE_AGE = REGISTRY.histogram(
+    "ecare_sample_age_seconds",
+    "Time between a sample being produced and the pipeline picking it up.",
+)
+SCHEDULER_JITTER = REGISTRY.gauge(
+    "ecare_scheduler_jitter_seconds",
+    "Lateness of sensor stream firings relative to their deadlines.",
+    labels=("stream", "stat"),
+)
+LIVE_PRODUCERS = REGISTRY.gauge(
+    "ecare_live_producers",
+    "Sensor producers currently scheduled or finishing a sample.",
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "ecare_queue_depth",
+    "Number of items currently held in each in-memory queue.",
+    labels=("queue",),
+)
+ALERT_DELIVERIES = REGISTRY.counter(
+    "ecare_alert_deliveries_total",
+    "Alert notifications per sink and outcome (delivered, retried, failed, dropped).",
+    labels=("sink", "outcome"),
+)
+STATE_RESIDENT_BYTES = REGISTRY.gauge(
+    "ecare_state_resident_bytes",
+    "Approximate memory held by monitoring state that can spill to disk.",
+    labels=("state",),
+)
+SPILLED_ITEMS = REGISTRY.gauge(
+    "ecare_spilled_items",
+    "Items of monitoring state currently stored in spill segments on disk.",
+    labels=("state",),
+)
+
+
+@contextmanager
+def time_stage(stage):
+    """
+    Measures the wall time of a pipeline stage.
+
+    Args:
+        stage (str): Name of the stage (usually the function name).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage=stage)
+
+
+# --- Exposition Functions ---
+
+
+def dump_metrics(path, registry=REGISTRY):
+    """
+    Writes the current metrics to a file in Prometheus text format.
+
+    The file is replaced atomically so scrapers never see a partial write.
+
+    Args:
+        path (str): Destination file (e.g. for the node_exporter textfile collector).
+        registry (MetricsRegistry): The registry to render.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+def start_metrics_server(port, host="127.0.0.1", registry=REGISTRY):
+    """
+    Serves the metrics over HTTP on a background thread.
+
+    Args:
+        port (int): TCP port to listen on.
+        host (str): Interface to bind; local only by default.
+        registry (MetricsRegistry): The registry to render.
+
+    Returns:
+        http.server.ThreadingHTTPServer: The running server (call shutdown() to stop).
+    """
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug("Metrics request: " + format % args)
+
+    server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logging.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,213 @@
+import collections
+import logging
+import os
+import urllib.parse
+
+import snapshot
+
+
+class PatientMonitor:
+    """
+    Monitoring state of one patient.
+
+    Everything the pipeline remembers between two readings of a patient
+    lives here, so any number of patients can share one process without
+    seeing each other's history or alerts.
+    """
+
+    __slots__ = (
+        "patient_id",
+        "latest_data",
+        "history",
+        "current_anomalies",
+        "critical_anomalies",
+        "current_health_risks",
+        "last_seen",
+    )
+
+    def __init__(self, patient_id):
+        self.patient_id = patient_id
+        self.last_seen = 0.0  # monotonic time the monitor was last used
+        self.latest_data = {}  # most recent raw reading
+        self.history = []  # anomaly dicts of the last readings, see predict_health_risks()
+        self.current_anomalies = set()  # parameters currently alerting
+        self.critical_anomalies = set()  # the ones of them alerting at critical level
+        self.current_health_risks = set()  # risks currently alerting
+
+    def state(self, alerts=()):
+        """
+        Returns the state in the form snapshot.encode_snapshot() expects.
+
+        Args:
+            alerts (list): The patient's alerts to store with it.
+        """
+        return {
+            "historical_anomalies": self.history,
+            "current_anomalies": self.current_anomalies,
+            "critical_anomalies": self.critical_anomalies,
+            "current_health_risks": self.current_health_risks,
+            "alerts": alerts,
+        }
+
+    def restore(self, state):
+        """
+        Loads a state decoded by snapshot.decode_snapshot().
+        """
+        self.history = list(state["historical_anomalies"])
+        self.current_anomalies = set(state["current_anomalies"])
+        self.critical_anomalies = set(state.get("critical_anomalies", ()))
+        self.current_health_risks = set(state["current_health_risks"])
+
+
+class MonitorRegistry:
+    """
+    The PatientMonitor of every patient, created on first use.
+
+    Only recently used monitors stay in memory: a monitor without a reading
+    for idle_timeout seconds, and the least recently used ones beyond
+    max_resident, are saved to `directory` in the snapshot format and read
+    back the next time their patient has a reading. find(), iteration,
+    len() and `in` only cover the monitors in memory.
+    """
+
+    def __init__(self):
+        self._monitors = collections.OrderedDict()  # least recently used first
+        self.loads = 0
+        self.evictions = 0
+        self.configure()
+
+    def configure(self, max_resident=None, idle_timeout=None, directory=None, on_load=None, on_evict=None):
+        """
+        Args:
+            max_resident (int): Monitors kept in memory (None = no limit).
+            idle_timeout (float): Seconds without a reading before a monitor
+                is evicted (None = never).
+            directory (str): Where evicted monitors are saved (None = dropped).
+            on_load (callable): Called with each monitor read back from disk.
+            on_evict (callable): Called with each monitor moved out of memory,
+                e.g. to drop the patient's state kept elsewhere.
+        """
+        self.max_resident = None if max_resident is None else max(1, int(max_resident))
+        self.idle_timeout = idle_timeout
+        self.directory = directory
+        self.on_load = on_load
+        self.on_evict = on_evict
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, patient_id):
+        return os.path.join(self.directory, urllib.parse.quote(patient_id, safe="") + ".snap")
+
+    def get(self, patient_id, now=None):
+        """
+        Returns the patient's monitor, reading it back from disk or creating
+        it if needed.
+
+        Args:
+            patient_id (str): Patient id.
+            now (float): Monotonic time of the reading, which marks the monitor
+                as active (None = leave its idle time alone).
+        """
+        monitor = self._monitors.get(patient_id)
+        if monitor is not None:
+            self._monitors.move_to_end(patient_id)
+        else:
+            monitor = self._monitors[patient_id] = self._load(patient_id) or PatientMonitor(patient_id)
+        if now is not None:
+            monitor.last_seen = now
+        return monitor
+
+    def find(self, patient_id):
+        """
+        Returns the patient's monitor, or None if it is not in memory.
+        """
+        return self._monitors.get(patient_id)
+
+    def remove(self, patient_id):
+        """
+        Forgets a patient (e.g. after discharge), including a saved monitor.
+
+        Returns:
+            PatientMonitor: The removed monitor, or None if it was not in memory.
+        """
+        if self.directory:
+            try:
+                os.remove(self._path(patient_id))
+            except FileNotFoundError:
+                pass
+        return self._monitors.pop(patient_id, None)
+
+    def evict(self, now):
+        """
+        Saves and drops the idle monitors and the least recently used ones
+        above max_resident.
+
+        Args:
+            now (float): Current monotonic time.
+
+        Returns:
+            int: Number of monitors evicted.
+        """
+        evicted = 0
+        # Least recently used first, so the idle ones are at the front
+        while self._monitors:
+            patient_id, monitor = next(iter(self._monitors.items()))
+            idle = self.idle_timeout is not None and now - monitor.last_seen >= self.idle_timeout
+            if not idle and (self.max_resident is None or len(self._monitors) <= self.max_resident):
+                break
+            del self._monitors[patient_id]
+            self._save(monitor)
+            if self.on_evict is not None:
+                self.on_evict(monitor)
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def _load(self, patient_id):
+        if not self.directory:
+            return None
+        path = self._path(patient_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            _, patients = snapshot.load_snapshot(path)
+            state = patients[patient_id]
+        except (snapshot.SnapshotError, KeyError) as e:
+            logging.error(f"Ignoring unreadable saved state of '{patient_id}': {e}")
+            return None
+        # The file is kept: it is overwritten on the next eviction, and until
+        # then it is what a restart without a newer snapshot falls back to
+        monitor = PatientMonitor(patient_id)
+        monitor.restore(state)
+        self.loads += 1
+        if self.on_load is not None:
+            self.on_load(monitor)
+        return monitor
+
+    def _save(self, monitor):
+        if not self.directory:
+            return
+        path = self._path(monitor.patient_id)
+        tmp_path = f"{path}.tmp"
+        try:
+            # Alerts stay in the ward-wide alert log. Unlike save_snapshot()
+            # there is no fsync per patient; a lost file only loses that
+            # patient's anomaly history.
+            data = snapshot.encode_snapshot({monitor.patient_id: monitor.state()}, compress=False)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except (OSError, snapshot.SnapshotError) as e:
+            logging.error(f"Could not save the state of '{monitor.patient_id}': {e}")
+
+    def clear(self):
+        self._monitors.clear()
+
+    def __contains__(self, patient_id):
+        return patient_id in self._monitors
+
+    def __iter__(self):
+        return iter(list(self._monitors.values()))
+
+    def __len__(self):
+        return len(self._monitors)
@@ -0,0 +1,248 @@
+import json
+import logging
+import queue
+import random
+import smtplib
+import sys
+import threading
+import time
+import urllib.request
+from email.message import EmailMessage
+
+import metrics
+
+
+def format_alert(alert):
+    timestamp = alert["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
+    return f"{timestamp} - {alert['level'].upper()}: {alert['message']}"
+
+
+# --- Sinks ---
+
+
+class Sink:
+    """
+    Destination for alert notifications.
+
+    Subclasses implement send(alert); it runs on the sink's own worker
+    threads and must give up after `timeout` seconds.
+    """
+
+    def __init__(self, name, concurrency=1, retries=3, backoff=0.5, timeout=5.0, max_pending=1000, levels=None):
+        """
+        Args:
+            name (str): Sink name used in logs and metrics.
+            concurrency (int): Worker threads sending in parallel.
+            retries (int): Extra attempts after a failed send.
+            backoff (float): Delay before the first retry, doubled on each retry.
+            timeout (float): Longest a single send may take, in seconds.
+            max_pending (int): Alerts queued for the sink before new ones are dropped.
+            levels (list): Alert levels the sink receives (None = all).
+        """
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.levels = None if levels is None else set(levels)
+
+    def accepts(self, alert):
+        return self.levels is None or alert["level"] in self.levels
+
+    def send(self, alert):
+        raise NotImplementedError
+
+
+class FileSink(Sink):
+    """
+    Appends alerts to a log file (the original alerts.log).
+    """
+
+    def __init__(self, path="alerts.log", **options):
+        options.setdefault("concurrency", 1)  # keep lines in order
+        super().__init__("file", **options)
+        self.path = path
+
+    def send(self, alert):
+        with open(self.path, "a") as f:
+            f.write(format_alert(alert) + "\n")
+        logging.info(f"Alert logged: {alert['message']}")
+
+
+class StdoutSink(Sink):
+    def __init__(self, **options):
+        super().__init__("stdout", **options)
+
+    def send(self, alert):
+        sys.stdout.write(format_alert(alert) + "\n")
+        sys.stdout.flush()
+
+
+class WebhookSink(Sink):
+    """
+    POSTs alerts as JSON, e.g. to a local webhook receiver or paging bridge.
+    """
+
+    def __init__(self, url="http://127.0.0.1:8089/alerts", **options):
+        super().__init__("webhook", **options)
+        self.url = url
+
+    def send(self, alert):
+        body = json.dumps(
+            {
+                "message": alert["message"],
+                "level": alert["level"],
+                "timestamp": alert["timestamp"].isoformat(),
+            }
+        ).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SmtpSink(Sink):
+    """
+    Emails alerts, e.g. through a local debugging SMTP server.
+    """
+
+    def __init__(self, host="127.0.0.1", port=1025, sender="ecare@localhost", recipients=(), **options):
+        super().__init__("smtp", **options)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+
+    def send(self, alert):
+        message = EmailMessage()
+        message["Subject"] = f"[{alert['level'].upper()}] {alert['message'][:80]}"
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message.set_content(format_alert(alert))
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+
+
+SINK_TYPES = {
+    "file": FileSink,
+    "stdout": StdoutSink,
+    "webhook": WebhookSink,
+    "smtp": SmtpSink,
+}
+
+
+def build_sinks(config):
+    """
+    Creates the enabled sinks from settings["notifications"].
+
+    Args:
+        config (dict): Sink type to its options, each with an "enabled" flag.
+
+    Returns:
+        list: The sinks.
+    """
+    sinks = []
+    for sink_type, options in config.items():
+        options = dict(options)
+        if not options.pop("enabled", True):
+            continue
+        sink_class = SINK_TYPES.get(sink_type)
+        if sink_class is None:
+            logging.error(f"Unknown notification sink '{sink_type}'.")
+            continue
+        try:
+            sinks.append(sink_class(**options))
+        except TypeError as e:
+            logging.error(f"Invalid options for notification sink '{sink_type}': {e}")
+    return sinks
+
+
+# --- Dispatcher ---
+
+
+class AlertDispatcher:
+    """
+    Fans alerts out to sinks without ever blocking the caller.
+
+    Every sink has its own bounded queue and worker threads, so a slow or
+    failing sink only delays (or drops) its own notifications. Failed sends
+    are retried with exponential backoff; alerts arriving while a sink's
+    queue is full are dropped and counted.
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+        self._queues = {}
+        self._threads = []
+        self._stop = threading.Event()
+        for sink in self.sinks:
+            pending = queue.Queue(maxsize=sink.max_pending)
+            self._queues[sink.name] = pending
+            for i in range(sink.concurrency):
+                thread = threading.Thread(
+                    target=self._work, args=(sink, pending), name=f"alert-sink-{sink.name}-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def dispatch(self, alert):
+        """
+        Queues an alert for every sink that accepts its level.
+        """
+        for sink in self.sinks:
+            if not sink.accepts(alert):
+                continue
+            try:
+                self._queues[sink.name].put_nowait(alert)
+            except queue.Full:
+                metrics.ALERT_DELIVERIES.inc(sink=sink.name, outcome="dropped")
+
+    def pending(self):
+        """
+        Returns:
+            dict: Sink name to the number of alerts waiting for it.
+        """
+        return {name: pending.qsize() for name, pending in self._queues.items()}
+
+    def _work(self, sink, pending):
+        while True:
+            alert = pending.get()
+            if alert is None:
+                pending.task_done()
+                return
+            try:
+                self._deliver(sink, alert)
+            finally:
+                pending.task_done()
+
+    def _deliver(self, sink, alert):
+        for attempt in range(sink.retries + 1):
+            try:
+                sink.send(alert)
+                metrics.ALERT_DELIVERIES.inc(sink=sink.name, outcome="delivered")
+                return
+            except Exception as e:
+                if attempt == sink.retries or self._stop.is_set():
+                    metrics.ALERT_DELIVERIES.inc(sink=sink.name, outcome="failed")
+                    logging.error(f"Alert sink '{sink.name}' gave up on '{alert['message']}': {e}")
+                    return
+                metrics.ALERT_DELIVERIES.inc(sink=sink.name, outcome="retried")
+                # Exponential backoff with jitter; returns early on close()
+                delay = sink.backoff * 2**attempt
+                self._stop.wait(delay * random.uniform(0.5, 1.5))
+
+    def close(self, timeout=5.0):
+        """
+        Delivers what is already queued (within `timeout`) and stops the workers.
+        """
+        deadline = time.monotonic() + timeout
+        for sink in self.sinks:
+            for _ in range(sink.concurrency):
+                try:
+                    self._queues[sink.name].put(None, timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Full:
+                    pass
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        # Anything still retrying gives up instead of waiting out its backoff
+        self._stop.set()
@@ -0,0 +1,205 @@
+import argparse
+import cProfile
+import datetime
+import io
+import logging
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+
+# Environment variables that enable profiling without touching the code
+ENV_PROFILE_TICKS = "ECARE_PROFILE_TICKS"
+ENV_TRACEMALLOC_EVERY = "ECARE_TRACEMALLOC_EVERY"
+ENV_PROFILE_DIR = "ECARE_PROFILE_DIR"
+
+
+class LoopProfiler:
+    """
+    Wraps event loop ticks in cProfile and/or periodic tracemalloc snapshots.
+
+    Only the time spent inside ticks is profiled, so the idle wait in
+    window.read() does not drown out the pipeline in the reports.
+    """
+
+    def __init__(
+        self,
+        profile_ticks=0,
+        tracemalloc_every=0,
+        output_dir="profiles",
+        tracemalloc_frames=10,
+        top=40,
+    ):
+        """
+        Args:
+            profile_ticks (int): Number of ticks to run under cProfile (0 disables).
+            tracemalloc_every (int): Take a memory snapshot every N ticks (0 disables).
+            output_dir (str): Directory where reports are written.
+            tracemalloc_frames (int): Stack depth stored per allocation.
+            top (int): Number of entries written per report.
+        """
+        self.profile_ticks = profile_ticks
+        self.tracemalloc_every = tracemalloc_every
+        self.output_dir = output_dir
+        self.top = top
+        self.ticks = 0
+        self._profiler = cProfile.Profile() if profile_ticks > 0 else None
+        self._profiled_ticks = 0
+        self._first_snapshot = None
+        self._previous_snapshot = None
+
+        if self.enabled:
+            os.makedirs(output_dir, exist_ok=True)
+        if tracemalloc_every > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(tracemalloc_frames)
+
+    @property
+    def enabled(self):
+        return self._profiler is not None or self.tracemalloc_every > 0
+
+    @contextmanager
+    def tick(self):
+        """
+        Context manager wrapping one event loop tick.
+        """
+        profiling = self._profiler is not None
+        if profiling:
+            self._profiler.enable()
+        try:
+            yield
+        finally:
+            self.ticks += 1
+            if profiling:
+                self._profiler.disable()
+                self._profiled_ticks += 1
+                if self._profiled_ticks >= self.profile_ticks:
+                    self._write_profile()
+            if self.tracemalloc_every > 0 and self.ticks % self.tracemalloc_every == 0:
+                self._take_snapshot()
+
+    def close(self):
+        """
+        Flushes any partial profile and stops memory tracing.
+        """
+        if self._profiler is not None and self._profiled_ticks > 0:
+            self._write_profile()
+        if self.tracemalloc_every > 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _report_path(self, prefix, extension):
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        return os.path.join(self.output_dir, f"{prefix}-{stamp}-tick{self.ticks}.{extension}")
+
+    def _write_profile(self):
+        profiler, self._profiler = self._profiler, None
+        raw_path = self._report_path("cprofile", "prof")
+        profiler.dump_stats(raw_path)
+
+        stream = io.StringIO()
+        stream.write(f"cProfile over {self._profiled_ticks} ticks\n\n")
+        for sort_key in ("cumulative", "tottime"):
+            stream.write(f"=== Sorted by {sort_key} ===\n")
+            pstats.Stats(profiler, stream=stream).sort_stats(sort_key).print_stats(self.top)
+        report_path = self._report_path("cprofile", "txt")
+        with open(report_path, "w") as f:
+            f.write(stream.getvalue())
+        logging.info(f"cProfile report written to {report_path}")
+
+    def _take_snapshot(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f"tracemalloc snapshot at tick {self.ticks}",
+            f"current={current} bytes peak={peak} bytes",
+            "",
+            "=== Top allocations ===",
+        ]
+        lines.extend(str(stat) for stat in snapshot.statistics("lineno")[: self.top])
+        if self._previous_snapshot is not None:
+            lines.extend(["", "=== Growth since previous snapshot ==="])
+            diff = snapshot.compare_to(self._previous_snapshot, "lineno")
+            lines.extend(str(stat) for stat in diff[: self.top])
+        if self._first_snapshot is not None:
+            lines.extend(["", "=== Growth since first snapshot ==="])
+            diff = snapshot.compare_to(self._first_snapshot, "lineno")
+            lines.extend(str(stat) for stat in diff[: self.top])
+        else:
+            self._first_snapshot = snapshot
+        self._previous_snapshot = snapshot
+
+        report_path = self._report_path("tracemalloc", "txt")
+        with open(report_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        logging.info(f"tracemalloc report written to {report_path}")
+
+
+def _env_int(environ, name, default):
+    value = environ.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logging.warning(f"Ignoring {name}={value!r}: not an integer, using {default}")
+        return default
+
+
+def parse_profiling_options(argv=None, environ=None):
+    """
+    Reads profiling options from command line flags, falling back to env vars.
+
+    Args:
+        argv (list): Command line arguments (defaults to sys.argv[1:]).
+        environ (dict): Environment (defaults to os.environ).
+
+    Returns:
+        argparse.Namespace: profile_ticks, tracemalloc_every and profile_dir.
+    """
+    environ = os.environ if environ is None else environ
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument(
+        "--profile-ticks",
+        type=int,
+        default=_env_int(environ, ENV_PROFILE_TICKS, 0),
+        help="Run the first N event loop ticks under cProfile.",
+    )
+    parser.add_argument(
+        "--tracemalloc-every",
+        type=int,
+        default=_env_int(environ, ENV_TRACEMALLOC_EVERY, 0),
+        help="Take a tracemalloc snapshot every N ticks.",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=environ.get(ENV_PROFILE_DIR, "profiles"),
+        help="Directory for profiling reports.",
+    )
+    options, _ = parser.parse_known_args(argv)
+    return options
+
+
+def create_loop_profiler(argv=None, environ=None):
+    """
+    Builds a LoopProfiler from the command line / environment.
+
+    Returns:
+        LoopProfiler or None: None when profiling is not requested.
+    """
+    options = parse_profiling_options(argv, environ)
+    profiler = LoopProfiler(
+        profile_ticks=options.profile_ticks,
+        tracemalloc_every=options.tracemalloc_every,
+        output_dir=options.profile_dir,
+    )
+    if not profiler.enabled:
+        return None
+    logging.info(
+        f"Profiling enabled: profile_ticks={options.profile_ticks} "
+        f"tracemalloc_every={options.tracemalloc_every} dir={options.profile_dir}"
+    )
+    return profiler
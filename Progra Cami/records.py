@@ -0,0 +1,403 @@
+import bisect
+import mmap
+import os
+import struct
+
+from imputation import Reading
+
+# One reading as a fixed-width little-endian record (28 bytes):
+#   patient     uint32   index into a PatientTable
+#   timestamp   float64  seconds (monotonic for device frames, wall clock on disk)
+#   vitals      int16    one per PARAMETERS entry in tenths (37.1 -> 371)
+#   status      uint32   missing, imputed and abnormal bits, one per parameter
+PARAMETERS = (
+    "heart_rate",
+    "systolic_bp",
+    "diastolic_bp",
+    "body_temperature",
+    "respiratory_rate",
+    "spo2",
+)
+RECORD = struct.Struct("<Id6hI")
+RECORD_SIZE = RECORD.size
+MISSING_SHIFT = 0
+IMPUTED_SHIFT = 8
+ABNORMAL_SHIFT = 16
+_TIMESTAMP = struct.Struct("<d")
+_TIMESTAMP_OFFSET = 4
+SCALE = 10  # vitals are stored to one decimal place
+_MISSING = -0x8000
+_LIMIT = 0x7FFF
+_BITS = {parameter: 1 << i for i, parameter in enumerate(PARAMETERS)}
+
+
+def _build_decode_table():
+    # Decoded value of every int16 (None for _MISSING). Negative values sit at
+    # the end, so the table is indexed with the raw value directly.
+    table = [value // SCALE if not value % SCALE else value / SCALE for value in range(0x8000)]
+    table += [value // SCALE if not value % SCALE else value / SCALE for value in range(-0x8000, 0)]
+    table[_MISSING] = None
+    return tuple(table)
+
+
+# Whole numbers come back as ints, like the readings that were packed
+_DECODE = _build_decode_table().__getitem__
+_NOTHING = frozenset()
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; as_array() needs it
+    np = None
+
+
+class PatientTable:
+    """
+    Maps patient ids to the small integers stored in records.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self._index = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        """
+        Returns the index of a patient id, assigning the next one if it is new.
+        """
+        index = self._index.get(name)
+        if index is None:
+            index = self._index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def name(self, index):
+        return self.names[index]
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _pack_args(patient, timestamp, reading, abnormal, clamp=False):
+    values = [reading.get(parameter) for parameter in PARAMETERS]
+    imputed = getattr(reading, "imputed", ())
+    status = 0
+    if imputed or abnormal or None in values:
+        for parameter, value in zip(PARAMETERS, values):
+            bit = _BITS[parameter]
+            if value is None:
+                status |= bit << MISSING_SHIFT
+            if parameter in imputed:
+                status |= bit << IMPUTED_SHIFT
+            if parameter in abnormal:
+                status |= bit << ABNORMAL_SHIFT
+    if clamp:
+        values = [_MISSING if value is None else max(-_LIMIT, min(_LIMIT, round(value * SCALE))) for value in values]
+    else:
+        values = [_MISSING if value is None else round(value * SCALE) for value in values]
+    return (patient, timestamp, *values, status)
+
+
+def pack_record(patient, timestamp, reading, abnormal=()):
+    """
+    Encodes one reading as a fixed-width record.
+
+    Args:
+        patient (int): Patient index (see PatientTable).
+        timestamp (float): Time of the reading in seconds.
+        reading (dict): Parameter to value (None = missing); an
+            imputation.Reading also records its imputed parameters.
+        abnormal (iterable): Parameters flagged as abnormal.
+
+    Returns:
+        bytes: RECORD_SIZE bytes.
+    """
+    try:
+        return RECORD.pack(*_pack_args(patient, timestamp, reading, abnormal))
+    except struct.error:
+        # A value beyond the int16 range, e.g. from a faulty sensor
+        return RECORD.pack(*_pack_args(patient, timestamp, reading, abnormal, clamp=True))
+
+
+def pack_record_into(buffer, offset, patient, timestamp, reading, abnormal=()):
+    """
+    Same as pack_record() but writes into a preallocated writable buffer.
+    """
+    try:
+        RECORD.pack_into(buffer, offset, *_pack_args(patient, timestamp, reading, abnormal))
+    except struct.error:
+        RECORD.pack_into(buffer, offset, *_pack_args(patient, timestamp, reading, abnormal, clamp=True))
+
+
+def decode_fields(fields):
+    """
+    Turns one unpacked record tuple into Python values.
+
+    Returns:
+        tuple: (patient, timestamp, imputation.Reading, abnormal frozenset).
+    """
+    patient, timestamp, *values, status = fields
+    if not status:
+        return patient, timestamp, Reading(zip(PARAMETERS, map(_DECODE, values))), _NOTHING
+    reading = {}
+    imputed = []
+    abnormal = []
+    for parameter, value in zip(PARAMETERS, values):
+        bit = _BITS[parameter]
+        reading[parameter] = None if status & (bit << MISSING_SHIFT) else _DECODE(value)
+        if status & (bit << IMPUTED_SHIFT):
+            imputed.append(parameter)
+        if status & (bit << ABNORMAL_SHIFT):
+            abnormal.append(parameter)
+    return patient, timestamp, Reading(reading, imputed), frozenset(abnormal)
+
+
+def unpack_record(buffer, offset=0):
+    """
+    Decodes the record at `offset` of a bytes-like object without copying it.
+
+    Returns:
+        tuple: (patient, timestamp, imputation.Reading, abnormal frozenset).
+    """
+    return decode_fields(RECORD.unpack_from(buffer, offset))
+
+
+def iter_records(buffer):
+    """
+    Yields the raw field tuples of every whole record in a buffer.
+
+    The buffer is read in place through a memoryview; a trailing partial
+    record (e.g. from an interrupted write) is ignored.
+    """
+    view = memoryview(buffer)
+    yield from RECORD.iter_unpack(view[: len(view) - len(view) % RECORD_SIZE])
+
+
+def record_dtype():
+    """
+    Returns the NumPy structured dtype matching RECORD.
+    """
+    if np is None:
+        raise ImportError("NumPy is required for record_dtype()/as_array().")
+    return np.dtype(
+        [
+            ("patient", "<u4"),
+            ("timestamp", "<f8"),
+            ("vitals", "<i2", (len(PARAMETERS),)),
+            ("status", "<u4"),
+        ]
+    )
+
+
+def as_array(buffer):
+    """
+    Views a buffer of records as a NumPy structured array (no copy), e.g.
+    as_array(data)["vitals"][:, PARAMETERS.index("spo2")] / SCALE.
+    """
+    dtype = record_dtype()
+    return np.frombuffer(buffer, dtype=dtype, count=len(buffer) // RECORD_SIZE)
+
+
+# --- On-disk History ---
+
+
+class _Timestamps:
+    # Sequence view of the record timestamps for bisect
+    def __init__(self, buffer, count):
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return _TIMESTAMP.unpack_from(self.buffer, index * RECORD_SIZE + _TIMESTAMP_OFFSET)[0]
+
+
+class RecordLog:
+    """
+    Append-only file of fixed-width reading records.
+
+    Records are buffered and written in batches; patient ids go to a small
+    sidecar file (one per line, in index order). Because records are fixed
+    width and appended in time order, a time range is found by binary search
+    on the memory-mapped file and only the records inside it are decoded.
+    Timestamps never go backwards in the file: a reading stamped before the
+    newest record (e.g. after the wall clock was set back) is stored with
+    the newest record's timestamp.
+
+    With a retention period, records older than that (relative to the newest
+    one) are dropped by rewriting the file once the expired ones span a
+    quarter of the retention period, so each record is copied only a few
+    times over its life.
+    """
+
+    def __init__(self, path, flush_every=64, retention=None):
+        """
+        Args:
+            path (str): History file.
+            flush_every (int): Records buffered before they are written.
+            retention (float): Seconds of readings kept (None = forever).
+        """
+        self.path = path
+        self.patients_path = f"{path}.patients"
+        self.flush_every = max(1, int(flush_every))
+        self.retention = retention
+        self._pending = bytearray()
+        self._pending_count = 0
+        self.patients = PatientTable()
+        if os.path.exists(self.patients_path):
+            with open(self.patients_path, "r", encoding="utf-8") as f:
+                self.patients = PatientTable(line.rstrip("\n") for line in f)
+        self._saved_patients = len(self.patients)
+        self._count = 0
+        self._oldest = self._newest = None  # timestamps of the first and last record
+        if os.path.exists(path):
+            size = os.path.getsize(path)
+            self._count = size // RECORD_SIZE
+            with open(path, "r+b") as f:
+                if size % RECORD_SIZE:
+                    # Drop a record torn by a crash so the file stays aligned
+                    f.truncate(self._count * RECORD_SIZE)
+                if self._count:
+                    f.seek(_TIMESTAMP_OFFSET)
+                    self._oldest = _TIMESTAMP.unpack(f.read(_TIMESTAMP.size))[0]
+                    f.seek((self._count - 1) * RECORD_SIZE + _TIMESTAMP_OFFSET)
+                    self._newest = _TIMESTAMP.unpack(f.read(_TIMESTAMP.size))[0]
+
+    def __len__(self):
+        return self._count + self._pending_count
+
+    def append(self, patient, timestamp, reading, abnormal=()):
+        """
+        Adds a reading to the history.
+
+        Args:
+            patient (str): Patient id.
+            timestamp (float): Wall-clock time of the reading (clock.time()).
+            reading (dict): Processed sensor data.
+            abnormal (iterable): Parameters flagged as abnormal.
+        """
+        if self._newest is not None and timestamp < self._newest:
+            # Binary search needs timestamps in order
+            timestamp = self._newest
+        offset = len(self._pending)
+        self._pending.extend(bytes(RECORD_SIZE))
+        pack_record_into(self._pending, offset, self.patients.add(patient), timestamp, reading, abnormal)
+        self._pending_count += 1
+        if self._oldest is None:
+            self._oldest = timestamp
+        self._newest = timestamp
+        if self._pending_count >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered records and any new patient ids.
+        """
+        if len(self.patients) > self._saved_patients:
+            with open(self.patients_path, "a", encoding="utf-8") as f:
+                for name in self.patients.names[self._saved_patients :]:
+                    f.write(f"{name}\n")
+            self._saved_patients = len(self.patients)
+        if self._pending:
+            with open(self.path, "ab") as f:
+                f.write(self._pending)
+            self._count += self._pending_count
+            self._pending = bytearray()
+            self._pending_count = 0
+            # Rewrite once the expired records span a quarter of the retention
+            if self.retention is not None and self._newest - self._oldest > self.retention * 1.25:
+                self._expire()
+
+    def _expire(self):
+        # Rewrites the file without the records older than the retention
+        # period; only called right after a flush, so nothing is pending
+        cutoff = self._newest - self.retention
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            first = bisect.bisect_left(_Timestamps(data, self._count), cutoff)
+            if not first:
+                return
+            tmp_path = f"{self.path}.tmp"
+            view = memoryview(data)
+            try:
+                with open(tmp_path, "wb") as out:
+                    out.write(view[first * RECORD_SIZE : self._count * RECORD_SIZE])
+            finally:
+                view.release()
+            self._oldest = _Timestamps(data, self._count)[first]
+        os.replace(tmp_path, self.path)
+        self._count -= first
+
+    def _scan(self, start, end, patient):
+        # Raw field tuples of the records in [start, end), unpacked straight
+        # from the memory-mapped file
+        self.flush()
+        if not self._count:
+            return []
+        wanted = None
+        if patient is not None:
+            wanted = self.patients._index.get(patient)
+            if wanted is None:
+                return []
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            timestamps = _Timestamps(data, self._count)
+            first = 0 if start is None else bisect.bisect_left(timestamps, start)
+            last = self._count if end is None else bisect.bisect_left(timestamps, end, first)
+            view = memoryview(data)
+            try:
+                rows = RECORD.iter_unpack(view[first * RECORD_SIZE : last * RECORD_SIZE])
+                if wanted is None:
+                    return list(rows)
+                return [fields for fields in rows if fields[0] == wanted]
+            finally:
+                view.release()
+
+    def read(self, start=None, end=None, patient=None):
+        """
+        Returns the stored readings in [start, end), oldest first.
+
+        Args:
+            start (float): Earliest timestamp (None = from the beginning).
+            end (float): Timestamp after the last reading (None = to the end).
+            patient (str): Only this patient's readings (None = everyone).
+
+        Returns:
+            list: (patient, timestamp, imputation.Reading, abnormal) tuples.
+        """
+        result = []
+        for fields in self._scan(start, end, patient):
+            index, timestamp, reading, abnormal = decode_fields(fields)
+            result.append((self.patients.name(index), timestamp, reading, abnormal))
+        return result
+
+    def read_columns(self, start=None, end=None, patient=None):
+        """
+        Returns the stored readings in [start, end) column by column.
+
+        No dict is built per reading, which makes this several times faster
+        than read() for charts and statistics over long ranges.
+
+        Args:
+            start (float): Earliest timestamp (None = from the beginning).
+            end (float): Timestamp after the last reading (None = to the end).
+            patient (str): Only this patient's readings (None = everyone).
+
+        Returns:
+            tuple: (patients, timestamps, columns) where columns maps each
+            PARAMETERS entry to its values (None = missing), oldest first.
+        """
+        rows = self._scan(start, end, patient)
+        if not rows:
+            return [], [], {parameter: [] for parameter in PARAMETERS}
+        indexes, timestamps, *vitals, _ = zip(*rows)
+        names = self.patients.names
+        return (
+            [names[index] for index in indexes],
+            list(timestamps),
+            {parameter: list(map(_DECODE, values)) for parameter, values in zip(PARAMETERS, vitals)},
+        )
+
+    def close(self):
+        self.flush()
+
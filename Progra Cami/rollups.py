@@ -0,0 +1,293 @@
+import array
+import bisect
+import collections
+import json
+import os
+import sys
+import zlib
+
+# (resolution, retention) in seconds: 1 s for an hour, 1 min for a week, 1 h for a year
+DEFAULT_TIERS = ((1, 3600), (60, 7 * 86400), (3600, 365 * 86400))
+
+
+class Bucket:
+    """
+    min/max/sum/count of every parameter over one time slot.
+    """
+
+    __slots__ = ("start", "stats")
+
+    def __init__(self, start):
+        self.start = start
+        self.stats = {}  # parameter -> [min, max, sum, count]
+
+    def add(self, parameter, value):
+        stat = self.stats.get(parameter)
+        if stat is None:
+            self.stats[parameter] = [value, value, value, 1]
+        else:
+            if value < stat[0]:
+                stat[0] = value
+            if value > stat[1]:
+                stat[1] = value
+            stat[2] += value
+            stat[3] += 1
+
+    def merge(self, other):
+        for parameter, (low, high, total, count) in other.stats.items():
+            stat = self.stats.get(parameter)
+            if stat is None:
+                self.stats[parameter] = [low, high, total, count]
+            else:
+                stat[0] = min(stat[0], low)
+                stat[1] = max(stat[1], high)
+                stat[2] += total
+                stat[3] += count
+
+
+class RollupTier:
+    """
+    Fixed-resolution aggregates kept for a retention period.
+    """
+
+    def __init__(self, resolution, retention):
+        self.resolution = resolution
+        self.retention = retention
+        self.buckets = collections.deque()  # closed buckets, oldest first
+        self._starts = collections.deque()  # bucket start times, for bisect
+        self.current = None
+
+    def slot(self, t):
+        return t - t % self.resolution
+
+    def add_bucket(self, bucket):
+        """
+        Folds a finer bucket (or a raw reading wrapped in a bucket) into this tier.
+
+        Returns:
+            Bucket or None: The bucket this tier closed as a result, if any.
+        """
+        closed = None
+        start = self.slot(bucket.start)
+        if self.current is None or start > self.current.start:
+            closed = self.close()
+            self.current = Bucket(start)
+        self.current.merge(bucket)
+        return closed
+
+    def close(self):
+        closed = self.current
+        if closed is not None:
+            self.buckets.append(closed)
+            self._starts.append(closed.start)
+            self.current = None
+            self.expire(closed.start)
+        return closed
+
+    def expire(self, now):
+        cutoff = now - self.retention
+        while self.buckets and self.buckets[0].start < cutoff:
+            self.buckets.popleft()
+            self._starts.popleft()
+
+    @property
+    def oldest(self):
+        if self.buckets:
+            return self.buckets[0].start
+        return self.current.start if self.current is not None else None
+
+    def range(self, start, end):
+        """
+        Returns:
+            list: Buckets overlapping [start, end), including the open one.
+        """
+        first = bisect.bisect_left(self._starts, self.slot(start))
+        result = [self.buckets[i] for i in range(first, len(self.buckets)) if self.buckets[i].start < end]
+        if self.current is not None and start <= self.current.start + self.resolution and self.current.start < end:
+            result.append(self.current)
+        return result
+
+
+class RollupStore:
+    """
+    Incrementally maintained multi-resolution history for one patient.
+
+    Readings only update the finest tier; when one of its buckets closes it
+    is folded into the next coarser tier, and so on, so the cost per reading
+    stays constant however many tiers there are.
+    """
+
+    def __init__(self, tiers=DEFAULT_TIERS):
+        """
+        Args:
+            tiers: (resolution, retention) pairs in seconds, finest first.
+        """
+        self.tiers = [RollupTier(resolution, retention) for resolution, retention in tiers]
+
+    def add(self, t, reading):
+        """
+        Adds one reading.
+
+        Args:
+            t (float): Timestamp in seconds (e.g. time.time()).
+            reading (dict): Parameter name to value; non-numeric values are skipped.
+        """
+        bucket = Bucket(t)
+        for parameter, value in reading.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                bucket.add(parameter, value)
+        for tier in self.tiers:
+            bucket = tier.add_bucket(bucket)
+            if bucket is None:
+                break
+
+    def choose_tier(self, start, end, max_points):
+        """
+        Picks the tier to answer a query from.
+
+        Returns the finest tier that still holds data back to `start` and
+        needs at most `max_points` buckets for the range; if none does, the
+        coarsest tier.
+        """
+        # Nothing is older than the coarsest tier's data, so never ask for more
+        known = [tier.oldest for tier in self.tiers if tier.oldest is not None]
+        if known:
+            start = max(start, min(known))
+        for tier in self.tiers:
+            oldest = tier.oldest
+            covers = oldest is not None and oldest <= tier.slot(start)
+            if covers and (end - start) / tier.resolution <= max_points:
+                return tier
+        return self.tiers[-1]
+
+    def query(self, parameter, start, end, max_points=500):
+        """
+        Returns aggregated history for a parameter.
+
+        Args:
+            parameter (str): e.g. "heart_rate".
+            start (float): Start of the range (inclusive).
+            end (float): End of the range (exclusive).
+            max_points (int): Upper bound on the number of points wanted.
+
+        Returns:
+            tuple: (resolution, points) where each point is
+            (bucket start, min, max, mean, count).
+        """
+        tier = self.choose_tier(start, end, max_points)
+        points = []
+        for bucket in tier.range(start, end):
+            stat = bucket.stats.get(parameter)
+            if stat is not None:
+                low, high, total, count = stat
+                points.append((bucket.start, low, high, total / count, count))
+        return tier.resolution, points
+
+
+# --- Persistence ---
+
+
+def encode_rollups(store):
+    """
+    Serializes a RollupStore into a compact blob.
+
+    A small JSON header describes the tiers and parameters; the buckets
+    follow column by column as float64 arrays (start, then min, max, sum and
+    count per parameter, NaN where a parameter has no data).
+
+    Returns:
+        bytes: zlib-compressed blob.
+    """
+    parameters = sorted(
+        {
+            parameter
+            for tier in store.tiers
+            for bucket in list(tier.buckets) + ([tier.current] if tier.current else [])
+            for parameter in bucket.stats
+        }
+    )
+    header = {"parameters": parameters, "tiers": []}
+    columns = []
+    nan = float("nan")
+    for tier in store.tiers:
+        buckets = list(tier.buckets) + ([tier.current] if tier.current else [])
+        header["tiers"].append(
+            {
+                "resolution": tier.resolution,
+                "retention": tier.retention,
+                "buckets": len(buckets),
+                "open": tier.current is not None,
+            }
+        )
+        columns.append(array.array("d", [bucket.start for bucket in buckets]))
+        for parameter in parameters:
+            for field in range(4):
+                columns.append(
+                    array.array(
+                        "d",
+                        [
+                            bucket.stats[parameter][field] if parameter in bucket.stats else nan
+                            for bucket in buckets
+                        ],
+                    )
+                )
+    if sys.byteorder != "little":
+        for column in columns:
+            column.byteswap()
+    header_bytes = json.dumps(header).encode("utf-8")
+    body = len(header_bytes).to_bytes(4, "little") + header_bytes
+    body += b"".join(column.tobytes() for column in columns)
+    return zlib.compress(body, 1)
+
+
+def decode_rollups(data):
+    """
+    Rebuilds a RollupStore from encode_rollups() output.
+    """
+    body = memoryview(zlib.decompress(data))
+    header_size = int.from_bytes(body[:4], "little")
+    header = json.loads(bytes(body[4 : 4 + header_size]))
+    offset = 4 + header_size
+    parameters = header["parameters"]
+
+    def column(count):
+        nonlocal offset
+        values = array.array("d")
+        values.frombytes(body[offset : offset + 8 * count])
+        if sys.byteorder != "little":
+            values.byteswap()
+        offset += 8 * count
+        return values
+
+    store = RollupStore([(tier["resolution"], tier["retention"]) for tier in header["tiers"]])
+    for tier, description in zip(store.tiers, header["tiers"]):
+        count = description["buckets"]
+        buckets = [Bucket(start) for start in column(count)]
+        for parameter in parameters:
+            fields = [column(count) for _ in range(4)]
+            for i, bucket in enumerate(buckets):
+                if fields[3][i] == fields[3][i]:  # not NaN
+                    bucket.stats[parameter] = [fields[0][i], fields[1][i], fields[2][i], int(fields[3][i])]
+        if description["open"] and buckets:
+            tier.current = buckets.pop()
+        tier.buckets.extend(buckets)
+        tier._starts.extend(bucket.start for bucket in buckets)
+    return store
+
+
+def save_rollups(path, store):
+    """
+    Atomically writes a RollupStore to disk.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode_rollups(store))
+    os.replace(tmp_path, path)
+
+
+def load_rollups(path):
+    """
+    Reads a RollupStore written by save_rollups().
+    """
+    with open(path, "rb") as f:
+        return decode_rollups(f.read())
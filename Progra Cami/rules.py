@@ -0,0 +1,384 @@
+import itertools
+import logging
+import operator
+import re
+
+# Rule language, e.g. "heart_rate > 120 and spo2 < 92 for 30s":
+#   rule       := expression ["for" duration]
+#   expression := term ("or" term)*
+#   term       := factor ("and" factor)*
+#   factor     := "not" factor | "(" expression ")" | comparison
+#   comparison := operand (">" | ">=" | "<" | "<=" | "==" | "!=") operand
+#   operand    := parameter name | number
+#   duration   := number ["ms" | "s" | "m" | "h"]
+_TOKEN = re.compile(
+    r"\s*(?:(?P<number>\d+(?:\.\d*)?|\.\d+)(?P<unit>ms|s|m|h)?\b"
+    r"|(?P<name>[A-Za-z_][A-Za-z0-9_]*)"
+    r"|(?P<op>>=|<=|==|!=|>|<)"
+    r"|(?P<paren>[()]))"
+)
+_COMPARATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0, None: 1.0}
+_KEYWORDS = {"and", "or", "not", "for"}
+
+
+class RuleSyntaxError(ValueError):
+    """
+    Raised when a rule cannot be parsed.
+    """
+
+
+# --- Parsing ---
+
+
+def _tokenize(source):
+    tokens = []
+    position = 0
+    source = source.strip()
+    while position < len(source):
+        match = _TOKEN.match(source, position)
+        if match is None or match.end() == position:
+            raise RuleSyntaxError(f"Unexpected input at {position}: {source[position:]!r}")
+        position = match.end()
+        if match.group("number") is not None:
+            tokens.append(("number", float(match.group("number")), match.group("unit")))
+        elif match.group("name") is not None:
+            name = match.group("name")
+            kind = "keyword" if name in _KEYWORDS else "name"
+            tokens.append((kind, name, None))
+        elif match.group("op") is not None:
+            tokens.append(("op", match.group("op"), None))
+        else:
+            tokens.append(("paren", match.group("paren"), None))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, source):
+        self.source = source
+        self.tokens = _tokenize(source)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None, None)
+
+    def next(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def expect(self, kind, value=None):
+        token = self.next()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise RuleSyntaxError(f"Expected {value or kind} in {self.source!r}, got {token[1]!r}")
+        return token
+
+    def parse_rule(self):
+        expression = self.parse_expression()
+        duration = 0.0
+        if self.peek()[:2] == ("keyword", "for"):
+            self.next()
+            _, value, unit = self.expect("number")
+            duration = value * _UNITS[unit]
+        if self.peek()[0] is not None:
+            raise RuleSyntaxError(f"Unexpected {self.peek()[1]!r} in {self.source!r}")
+        return expression, duration
+
+    def parse_expression(self):
+        node = self.parse_term()
+        while self.peek()[:2] == ("keyword", "or"):
+            self.next()
+            node = ("or", node, self.parse_term())
+        return node
+
+    def parse_term(self):
+        node = self.parse_factor()
+        while self.peek()[:2] == ("keyword", "and"):
+            self.next()
+            node = ("and", node, self.parse_factor())
+        return node
+
+    def parse_factor(self):
+        token = self.peek()
+        if token[:2] == ("keyword", "not"):
+            self.next()
+            return ("not", self.parse_factor())
+        if token[:2] == ("paren", "("):
+            self.next()
+            node = self.parse_expression()
+            self.expect("paren", ")")
+            return node
+        left = self.parse_operand()
+        _, op, _ = self.expect("op")
+        right = self.parse_operand()
+        return ("compare", op, left, right)
+
+    def parse_operand(self):
+        kind, value, unit = self.next()
+        if kind == "number" and unit is None:
+            return ("const", value)
+        if kind == "name":
+            return ("var", value)
+        raise RuleSyntaxError(f"Expected a parameter or number in {self.source!r}, got {value!r}")
+
+
+def parse_rule(source):
+    """
+    Parses a rule into a syntax tree.
+
+    Args:
+        source (str): The rule text.
+
+    Returns:
+        tuple: (tree, duration_seconds).
+    """
+    return _Parser(source).parse_rule()
+
+
+# --- Compilation ---
+
+
+class _Compiler:
+    """
+    Turns syntax trees into column-wise predicates.
+
+    Identical sub-expressions (e.g. the same "spo2 < 92" in many rules) are
+    compiled to the same node, so each is computed once per evaluation.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+
+    def compile(self, tree):
+        key = repr(tree)
+        node = self.nodes.get(key)
+        if node is None:
+            node = self._build(tree)
+            self.nodes[key] = node
+        return node
+
+    def _build(self, tree):
+        kind = tree[0]
+        if kind == "compare":
+            _, op, left, right = tree
+            compare = _COMPARATORS[op]
+            variables = {operand[1] for operand in (left, right) if operand[0] == "var"}
+
+            def value_column(operand, columns, count):
+                if operand[0] == "const":
+                    return [operand[1]] * count
+                return columns.get(operand[1]) or [None] * count
+
+            def evaluate(columns, count, cache):
+                lefts = value_column(left, columns, count)
+                rights = value_column(right, columns, count)
+                # Missing values never satisfy a comparison
+                return [
+                    a is not None and b is not None and compare(a, b)
+                    for a, b in zip(lefts, rights)
+                ]
+
+            return _Node(evaluate, variables)
+
+        if kind == "not":
+            child = self.compile(tree[1])
+            return _Node(
+                lambda columns, count, cache: [not value for value in child(columns, count, cache)],
+                child.variables,
+            )
+
+        left = self.compile(tree[1])
+        right = self.compile(tree[2])
+        if kind == "and":
+
+            def evaluate(columns, count, cache):
+                return [a and b for a, b in zip(left(columns, count, cache), right(columns, count, cache))]
+
+        else:
+
+            def evaluate(columns, count, cache):
+                return [a or b for a, b in zip(left(columns, count, cache), right(columns, count, cache))]
+
+        return _Node(evaluate, left.variables | right.variables)
+
+
+class _Node:
+    __slots__ = ("evaluate", "variables")
+
+    def __init__(self, evaluate, variables):
+        self.evaluate = evaluate
+        self.variables = frozenset(variables)
+
+    def __call__(self, columns, count, cache):
+        # Shared nodes are evaluated once per batch
+        result = cache.get(id(self))
+        if result is None:
+            result = cache[id(self)] = self.evaluate(columns, count, cache)
+        return result
+
+
+class Rule:
+    """
+    A user-defined alert condition.
+    """
+
+    def __init__(self, name, source, level="critical", message=None):
+        """
+        Args:
+            name (str): Short rule name shown in alerts.
+            source (str): Rule text, e.g. "heart_rate > 120 and spo2 < 92 for 30s".
+            level (str): Alert level raised when the rule fires.
+            message (str): Optional alert message (defaults to the rule text).
+        """
+        self.name = name
+        self.source = source
+        self.level = level
+        self.message = message or f"Rule '{name}' triggered: {source}"
+        self.tree, self.duration = parse_rule(source)
+        self.predicate = None
+        self.true_since = {}  # patient -> time the condition became true
+        self.firing = set()  # patients that already alerted for this episode
+
+
+class RuleEngine:
+    """
+    Evaluates many compiled rules across a batch of patients per tick.
+
+    Readings are passed column-wise (one list per parameter, one entry per
+    patient). Sub-expressions shared by several rules are computed once per
+    batch, and each rule only updates the hold-time state of the patients
+    in the batch, so evaluating one patient's reading costs the same however
+    many patients are monitored.
+
+    The engine remembers the last values each patient was evaluated with.
+    A rule none of whose parameters changed for any patient of the batch is
+    not re-evaluated: its previous results still hold, so only its hold
+    times are checked.
+    """
+
+    def __init__(self, rules=()):
+        self._compiler = _Compiler()
+        self.rules = []
+        self._variables = ()  # parameters referenced by any rule
+        self._inputs = {}  # patient -> values of _variables at the last evaluation
+        for rule in rules:
+            self.add_rule(rule)
+
+    def add_rule(self, rule):
+        rule.predicate = self._compiler.compile(rule.tree)
+        self.rules.append(rule)
+        self._variables = tuple(sorted(set(self._variables) | rule.predicate.variables))
+        # The new rule has no results yet, so everything counts as changed
+        self._inputs.clear()
+
+    def _changed(self, patients, columns):
+        # Parameters whose value differs from the last evaluation for at
+        # least one patient of the batch
+        variables = self._variables
+        missing = [None] * len(patients)
+        rows = zip(*(columns.get(name) or missing for name in variables))
+        changed = set()
+        for patient, current in zip(patients, rows):
+            previous = self._inputs.get(patient)
+            if previous != current and len(changed) < len(variables):
+                if previous is None:
+                    changed.update(variables)
+                else:
+                    changed.update(name for name, a, b in zip(variables, previous, current) if a != b)
+            self._inputs[patient] = current
+        return changed
+
+    def evaluate(self, patients, columns, now):
+        """
+        Evaluates every rule for a batch of patients.
+
+        Args:
+            patients (list): Patient ids, one per column entry; each patient
+                appears at most once per batch.
+            columns (dict): Parameter name to a list of values (None for missing).
+            now (float): Current monotonic time in seconds.
+
+        Returns:
+            list: (patient, rule) pairs whose condition has just been met for
+            the rule's full duration; only patients of the batch appear.
+        """
+        count = len(patients)
+        changed = self._changed(patients, columns)
+        cache = {}
+        fired = []
+        for rule in self.rules:
+            true_since = rule.true_since
+            if rule.predicate.variables and not rule.predicate.variables & changed:
+                # Same inputs, same results: only the hold times move on
+                for patient in patients:
+                    since = true_since.get(patient)
+                    if since is not None and now - since >= rule.duration and patient not in rule.firing:
+                        rule.firing.add(patient)
+                        fired.append((patient, rule))
+                continue
+            results = rule.predicate(columns, count, cache)
+            if true_since:
+                # Conditions that cleared end the episode
+                for patient, result in zip(patients, results):
+                    if not result and patient in true_since:
+                        del true_since[patient]
+                        rule.firing.discard(patient)
+            for patient in itertools.compress(patients, results):
+                since = true_since.setdefault(patient, now)
+                if now - since >= rule.duration and patient not in rule.firing:
+                    rule.firing.add(patient)
+                    fired.append((patient, rule))
+        return fired
+
+    def forget(self, patient):
+        """
+        Drops the rule states of a patient.
+        """
+        self._inputs.pop(patient, None)
+        for rule in self.rules:
+            rule.true_since.pop(patient, None)
+            rule.firing.discard(patient)
+
+    def active(self, patient):
+        """
+        Returns:
+            list: Rules currently firing for the patient.
+        """
+        return [rule for rule in self.rules if patient in rule.firing]
+
+
+def load_rules(definitions):
+    """
+    Builds a RuleEngine from rule definitions (e.g. settings["rules"]).
+
+    Invalid rules are logged and skipped so one typo does not disable the rest.
+
+    Args:
+        definitions (list): Dicts with "name", "when" and optional "level"/"message".
+
+    Returns:
+        RuleEngine: The engine with every valid rule compiled.
+    """
+    engine = RuleEngine()
+    for definition in definitions:
+        try:
+            engine.add_rule(
+                Rule(
+                    definition.get("name", definition["when"]),
+                    definition["when"],
+                    level=definition.get("level", "critical"),
+                    message=definition.get("message"),
+                )
+            )
+        except (KeyError, RuleSyntaxError) as e:
+            logging.error(f"Skipping invalid alert rule {definition!r}: {e}")
+    return engine
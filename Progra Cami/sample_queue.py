@@ -0,0 +1,140 @@
+import collections
+import threading
+import time
+
+# Supported overload policies for the producer/consumer boundary
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+COALESCE_LATEST = "coalesce_latest"
+BLOCK = "block"
+POLICIES = (DROP_OLDEST, DROP_NEWEST, COALESCE_LATEST, BLOCK)
+
+
+class SampleQueue:
+    """
+    Bounded hand-off between the sensor producer and the monitoring loop.
+
+    When the producer outruns the consumer the configured policy decides what
+    happens to the extra samples, and every decision is counted so the
+    pipeline can tell that it is falling behind:
+
+    - drop_oldest: discard the oldest pending sample to make room.
+    - drop_newest: discard the incoming sample.
+    - coalesce_latest: keep only the most recent sample (older ones are merged away).
+    - block: make the producer wait until the consumer frees a slot.
+    """
+
+    def __init__(self, maxsize=16, policy=DROP_OLDEST, block_timeout=None, clock=time.monotonic):
+        """
+        Args:
+            maxsize (int): Maximum number of pending samples.
+            policy (str): One of POLICIES.
+            block_timeout (float): Longest a blocked producer waits before
+                dropping its sample (None waits until space or stop).
+            clock (callable): Time source for the produced_at stamps.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overload policy: {policy}")
+        self.policy = policy
+        self.maxsize = 1 if policy == COALESCE_LATEST else max(1, int(maxsize))
+        self.block_timeout = block_timeout
+        self.clock = clock
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.blocked_seconds = 0.0
+        self._overload_events = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def put(self, data, stop_event=None):
+        """
+        Offers a new sample to the consumer.
+
+        Args:
+            data: The sensor reading (e.g. a records frame).
+            stop_event (threading.Event): Wakes a blocked producer on shutdown.
+
+        Returns:
+            bool: True if the sample was queued.
+        """
+        item = (self.clock(), data)
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                self._overload_events += 1
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                elif self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                elif self.policy == COALESCE_LATEST:
+                    self._items.clear()
+                    self.coalesced += 1
+                elif self.policy == BLOCK:
+                    if not self._wait_for_space(stop_event):
+                        self.dropped += 1
+                        return False
+            self._items.append(item)
+            self.enqueued += 1
+            return True
+
+    def _wait_for_space(self, stop_event):
+        # Called with the lock held; polls so a stop request is noticed promptly
+        start = time.monotonic()
+        deadline = None if self.block_timeout is None else start + self.block_timeout
+        try:
+            while len(self._items) >= self.maxsize:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                wait = 0.1
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        return False
+                self._not_full.wait(wait)
+            return True
+        finally:
+            self.blocked_seconds += time.monotonic() - start
+
+    def get_batch(self, max_items=None):
+        """
+        Takes pending samples, oldest first.
+
+        Args:
+            max_items (int): Upper bound on the number of samples returned.
+
+        Returns:
+            list: (produced_at, data) tuples; produced_at is a value of the queue's clock.
+        """
+        with self._lock:
+            count = len(self._items)
+            if max_items is not None:
+                count = min(count, max_items)
+            batch = [self._items.popleft() for _ in range(count)]
+            self.dequeued += count
+            if count:
+                self._not_full.notify_all()
+            return batch
+
+    def take_overload_events(self):
+        """
+        Returns and resets the number of puts that hit a full queue.
+
+        Returns:
+            int: Overload events since the previous call.
+        """
+        with self._lock:
+            events, self._overload_events = self._overload_events, 0
+            return events
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._not_full.notify_all()
@@ -0,0 +1,271 @@
+import collections
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+# How close to a deadline the scheduler stops sleeping and yields instead,
+# since Condition.wait() can overshoot by around a millisecond
+SPIN_THRESHOLD = 0.0005
+
+
+class StreamStats:
+    """
+    Lateness statistics (actual firing time minus deadline) for one stream.
+    """
+
+    def __init__(self, window=512):
+        self.fired = 0
+        self.skipped = 0
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+        self.recent = collections.deque(maxlen=window)
+
+    def record(self, lateness):
+        self.fired += 1
+        self.total_lateness += lateness
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+        self.recent.append(lateness)
+
+    def as_dict(self):
+        recent = sorted(self.recent)
+
+        def percentile(fraction):
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(fraction * len(recent)))]
+
+        return {
+            "fired": self.fired,
+            "skipped": self.skipped,
+            "mean_jitter": self.total_lateness / self.fired if self.fired else 0.0,
+            "p50_jitter": percentile(0.50),
+            "p99_jitter": percentile(0.99),
+            "max_jitter": self.max_lateness,
+        }
+
+
+class _Stream:
+    __slots__ = ("name", "interval", "callback", "deadline", "stats", "active")
+
+    def __init__(self, name, interval, callback, deadline):
+        self.name = name
+        self.interval = interval
+        self.callback = callback
+        self.deadline = deadline
+        self.stats = StreamStats()
+        self.active = True
+
+
+class DeadlineScheduler:
+    """
+    Runs many periodic streams from a single thread using a deadline heap.
+
+    Every stream's next deadline is computed from its previous deadline
+    rather than from when the callback finished, so the period never
+    drifts. If a stream falls more than one period behind, the missed
+    firings are skipped (and counted) instead of being replayed in a burst.
+    """
+
+    def __init__(self, name="sensor-scheduler", clock=time.monotonic, manual=False):
+        """
+        Args:
+            name (str): Name of the scheduler thread.
+            clock (callable): Monotonic time source in seconds.
+            manual (bool): Never start a thread; streams only fire from
+                run_until() (used with a virtual clock).
+        """
+        self.name = name
+        self.clock = clock
+        self.manual = manual
+        self._heap = []
+        self._streams = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    # --- Stream management ---
+
+    def add_stream(self, name, interval, callback, start_delay=0.0):
+        """
+        Registers (or replaces) a periodic stream.
+
+        Args:
+            name (str): Unique stream name (e.g. a patient id).
+            interval (float): Period in seconds (millisecond periods are fine).
+            callback (callable): Called with no arguments at every deadline.
+            start_delay (float): Delay before the first firing.
+        """
+        if interval <= 0:
+            raise ValueError("Stream interval must be positive.")
+        with self._condition:
+            old = self._streams.get(name)
+            if old is not None:
+                old.active = False
+            stream = _Stream(name, float(interval), callback, self.clock() + start_delay)
+            self._streams[name] = stream
+            heapq.heappush(self._heap, (stream.deadline, next(self._sequence), stream))
+            self._condition.notify()
+
+    def remove_stream(self, name):
+        """
+        Unregisters a stream; it will not fire again.
+
+        Returns:
+            bool: True if the stream existed.
+        """
+        with self._condition:
+            stream = self._streams.pop(name, None)
+            if stream is None:
+                return False
+            stream.active = False
+            self._condition.notify()
+            return True
+
+    def set_interval(self, name, interval):
+        """
+        Changes the period of a stream, effective after its next firing.
+        """
+        if interval <= 0:
+            raise ValueError("Stream interval must be positive.")
+        with self._condition:
+            self._streams[name].interval = float(interval)
+
+    def has_stream(self, name):
+        with self._condition:
+            return name in self._streams
+
+    def stream_names(self):
+        with self._condition:
+            return list(self._streams)
+
+    def stats(self):
+        """
+        Reports jitter statistics per stream.
+
+        Returns:
+            dict: Stream name to statistics (seconds).
+        """
+        with self._condition:
+            return {name: stream.stats.as_dict() for name, stream in self._streams.items()}
+
+    # --- Thread lifecycle ---
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Starts the scheduler thread (no-op if it is already running).
+        """
+        with self._condition:
+            if self.running or self.manual:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stops the scheduler thread and waits for it to exit.
+
+        Args:
+            timeout (float): Longest time to wait for the thread.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def run_until(self, until, advance_to=None):
+        """
+        Fires every stream due up to `until` on the calling thread.
+
+        Args:
+            until (float): Clock value to stop at.
+            advance_to (callable): Called with each deadline before its stream
+                fires, so a virtual clock can jump straight to it.
+        """
+        while True:
+            with self._condition:
+                stream = self._pop_due(until)
+            if stream is None:
+                return
+            if advance_to is not None:
+                advance_to(stream.deadline)
+            self._fire(stream)
+
+    def _pop_due(self, until):
+        # Called with the condition held
+        while self._heap:
+            deadline, _, stream = self._heap[0]
+            if not stream.active or stream.deadline != deadline:
+                heapq.heappop(self._heap)
+                continue
+            if deadline > until:
+                return None
+            heapq.heappop(self._heap)
+            return stream
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                stream = self._next_due()
+                if stream is None:
+                    return
+            self._fire(stream)
+
+    def _next_due(self):
+        # Called with the condition held; returns None once stopped
+        while self._running:
+            if not self._heap:
+                self._condition.wait()
+                continue
+            deadline, _, stream = self._heap[0]
+            if not stream.active or stream.deadline != deadline:
+                heapq.heappop(self._heap)
+                continue
+            remaining = deadline - self.clock()
+            if remaining > SPIN_THRESHOLD:
+                self._condition.wait(remaining - SPIN_THRESHOLD)
+                continue
+            if remaining > 0:
+                self._condition.release()
+                try:
+                    while self.clock() < deadline:
+                        time.sleep(0)
+                finally:
+                    self._condition.acquire()
+                continue
+            heapq.heappop(self._heap)
+            return stream
+        return None
+
+    def _fire(self, stream):
+        now = self.clock()
+        stream.stats.record(now - stream.deadline)
+        try:
+            stream.callback()
+        except Exception as e:
+            logging.error(f"Scheduled stream '{stream.name}' failed: {e}", exc_info=True)
+            self.remove_stream(stream.name)
+            return
+
+        with self._condition:
+            if not stream.active:
+                return
+            next_deadline = stream.deadline + stream.interval
+            now = self.clock()
+            if next_deadline <= now:
+                # Skip whole missed periods but stay on the original grid
+                missed = int((now - next_deadline) // stream.interval) + 1
+                stream.stats.skipped += missed
+                next_deadline += missed * stream.interval
+            stream.deadline = next_deadline
+            heapq.heappush(self._heap, (next_deadline, next(self._sequence), stream))
@@ -0,0 +1,278 @@
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+
+# Bump when the layout of settings.json changes, and add a migration below
+SCHEMA_VERSION = 2
+
+
+class SettingsError(Exception):
+    """
+    Raised when a settings file cannot be read or does not match the schema.
+    """
+
+
+# --- Validation and Migration ---
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_settings(data):
+    """
+    Checks the structure of a settings dictionary.
+
+    Args:
+        data (dict): Settings as read from disk.
+
+    Raises:
+        SettingsError: Describing the first problem found.
+    """
+    if not isinstance(data, dict):
+        raise SettingsError("Settings must be a JSON object.")
+    if data.get("schema_version") != SCHEMA_VERSION:
+        raise SettingsError(f"Unsupported settings schema version {data.get('schema_version')!r}.")
+    interval = data.get("update_interval")
+    if not _is_number(interval) or interval <= 0:
+        raise SettingsError(f"update_interval must be a positive number, got {interval!r}.")
+    normal_ranges = data.get("normal_ranges")
+    if not isinstance(normal_ranges, dict):
+        raise SettingsError("normal_ranges must be an object.")
+    for parameter, range_values in normal_ranges.items():
+        if (
+            not isinstance(range_values, list)
+            or len(range_values) != 2
+            or not all(_is_number(value) for value in range_values)
+        ):
+            raise SettingsError(f"normal_ranges.{parameter} must be [lower, upper].")
+        if range_values[0] > range_values[1]:
+            raise SettingsError(f"normal_ranges.{parameter} lower bound exceeds upper bound.")
+    for section in (
+        "metrics",
+        "backpressure",
+        "snapshot",
+        "trends",
+        "stream_intervals",
+        "imputation",
+        "waveform",
+        "rollups",
+        "dashboard",
+        "memory",
+        "notifications",
+        "alarms",
+        "history",
+        "baselines",
+        "patients",
+    ):
+        if section in data and not isinstance(data[section], dict):
+            raise SettingsError(f"{section} must be an object.")
+    imputation = data.get("imputation", {})
+    if imputation.get("policy", "flag") not in ("flag", "ignore", "detect"):
+        raise SettingsError('imputation.policy must be "flag", "ignore" or "detect".')
+    alarms = data.get("alarms", {})
+    for key in ("margin", "critical", "entry_delay", "exit_delay"):
+        value = alarms.get(key, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise SettingsError(f"alarms.{key} must be a non-negative number.")
+    rules = data.get("rules", [])
+    if not isinstance(rules, list) or not all(
+        isinstance(rule, dict) and isinstance(rule.get("when"), str) for rule in rules
+    ):
+        raise SettingsError('rules must be a list of objects with a "when" condition.')
+
+
+def migrate_settings(data):
+    """
+    Upgrades settings written by older versions to the current schema.
+
+    Args:
+        data (dict): Settings as read from disk.
+
+    Returns:
+        dict: Settings at SCHEMA_VERSION.
+    """
+    if isinstance(data, dict) and "schema_version" not in data:
+        # Version 1 files had no version field but the same layout
+        data = dict(data, schema_version=SCHEMA_VERSION)
+    return data
+
+
+def merge_defaults(data, defaults):
+    """
+    Fills in keys missing from data with their default values (recursively).
+
+    Args:
+        data (dict): Settings read from disk.
+        defaults (dict): Default settings.
+
+    Returns:
+        dict: A new merged dictionary.
+    """
+    merged = copy.deepcopy(defaults)
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict) and key != "normal_ranges":
+            merged[key] = merge_defaults(value, merged[key])
+        else:
+            merged[key] = value
+    return merged
+
+
+# --- Reading and Writing ---
+
+
+def read_settings(path, defaults):
+    """
+    Reads, migrates and validates a settings file.
+
+    Args:
+        path (str): The settings file.
+        defaults (dict): Default settings used for missing keys.
+
+    Returns:
+        dict: The validated settings.
+
+    Raises:
+        SettingsError: If the file is unreadable, not JSON or invalid.
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except OSError as e:
+        raise SettingsError(f"Could not read {path}: {e}") from e
+    except json.JSONDecodeError as e:
+        raise SettingsError(f"{path} is not valid JSON (line {e.lineno}): {e.msg}") from e
+    data = merge_defaults(migrate_settings(data), defaults)
+    validate_settings(data)
+    return data
+
+
+def write_settings_atomic(path, data):
+    """
+    Writes settings to a temporary file and renames it over the target.
+
+    A crash at any point leaves either the old or the new file, never a
+    partially written one.
+
+    Args:
+        path (str): The settings file.
+        data (dict): The settings to write.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".settings-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class DebouncedSettingsWriter:
+    """
+    Writes settings on a background thread, coalescing bursts of changes.
+
+    Each save() records a copy of the settings; the file is written once no
+    new save() has arrived for `delay` seconds.
+    """
+
+    def __init__(self, path, delay=0.5, on_error=None):
+        """
+        Args:
+            path (str): The settings file.
+            delay (float): Quiet period before writing, in seconds.
+            on_error (callable): Called with the exception if a write fails.
+        """
+        self.path = path
+        self.delay = delay
+        self.on_error = on_error
+        self.writes = 0
+        self._pending = None
+        self._latest = None
+        self._sequence = 0
+        self._written_sequence = 0
+        self._write_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="settings-writer", daemon=True)
+        self._thread.start()
+
+    def save(self, data):
+        """
+        Schedules the settings to be written.
+
+        Args:
+            data (dict): The settings (copied immediately, so the caller may keep mutating it).
+        """
+        data = copy.deepcopy(data)
+        data["schema_version"] = SCHEMA_VERSION
+        with self._condition:
+            self._sequence += 1
+            self._pending = self._latest = (self._sequence, data)
+            self._condition.notify()
+
+    def flush(self):
+        """
+        Writes any pending settings immediately, or waits for the write the
+        background thread has already started.
+
+        Returns:
+            bool: True if the latest saved settings are on disk.
+        """
+        with self._condition:
+            latest, self._pending = self._latest, None
+        if latest is None:
+            return True
+        return self._write(*latest)
+
+    def close(self):
+        """
+        Flushes pending settings and stops the writer thread.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # Wait for a save followed by a quiet period; every new save restarts it
+                pending = None
+                while not self._stopped:
+                    if self._pending is None:
+                        self._condition.wait()
+                        continue
+                    pending = self._pending
+                    self._condition.wait(self.delay)
+                    if self._pending is pending:
+                        break
+                if self._stopped:
+                    return
+                self._pending = None
+            self._write(*pending)
+
+    def _write(self, sequence, data):
+        with self._write_lock:
+            # A flush() may already have written newer settings
+            if sequence <= self._written_sequence:
+                return True
+            try:
+                write_settings_atomic(self.path, data)
+                self._written_sequence = sequence
+                self.writes += 1
+                logging.info("Settings saved to file.")
+                return True
+            except Exception as e:
+                logging.error(f"Could not save settings: {e}", exc_info=True)
+                if self.on_error is not None:
+                    self.on_error(e)
+                return False
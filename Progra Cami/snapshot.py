@@ -0,0 +1,327 @@
+import array
+import datetime
+import os
+import struct
+import sys
+import time
+import zlib
+
+# File layout (all arrays are stored column by column, one block per field):
+#   header      magic, version, byte order, flags, saved_at, patients, strings, parameters
+#   strings     lengths (uint32[]) followed by the UTF-8 blob
+#   parameters  string index per monitored parameter (uint32[])
+#   patients    id, history/risk/alert counts, current anomaly mask and
+#               the mask of those alerting at critical level (version 3+)
+#   history     one uint64 per record, 3 status bits per parameter
+#   risks       string index per current health risk
+#   alerts      timestamps (float64[]), levels (uint8[]), message string index,
+#               patient string index (version 4+, NO_PATIENT if none)
+# followed by a CRC32 of everything before it.
+MAGIC = b"ECSN"
+VERSION = 4
+SUPPORTED_VERSIONS = (2, 3, 4)  # version 2 has no critical masks, 2-3 no alert patients
+NO_PATIENT = 0xFFFFFFFF
+HEADER = struct.Struct("<4sHBBdIII")
+FLAG_COMPRESSED = 1
+
+STATUS_CODES = {"normal": 1, "abnormal": 2, "unknown": 3, "imputed": 4}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+ALERT_LEVELS = ("info", "warning", "critical")
+STATUS_BITS = 3
+MAX_PARAMETERS = 21  # 3 bits per parameter in a uint64 history record
+
+
+class SnapshotError(Exception):
+    """
+    Raised when a snapshot file is missing, truncated or corrupted.
+    """
+
+
+class _StringTable:
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def add(self, value):
+        position = self.index.get(value)
+        if position is None:
+            position = len(self.values)
+            self.index[value] = position
+            self.values.append(value)
+        return position
+
+
+def _array_bytes(typecode, values):
+    data = array.array(typecode, values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+class _Reader:
+    def __init__(self, buffer, offset):
+        self.view = memoryview(buffer)
+        self.offset = offset
+
+    def take(self, size):
+        if self.offset + size > len(self.view):
+            raise SnapshotError("Snapshot is truncated.")
+        chunk = self.view[self.offset : self.offset + size]
+        self.offset += size
+        return chunk
+
+    def array(self, typecode, count):
+        data = array.array(typecode)
+        data.frombytes(self.take(data.itemsize * count))
+        if sys.byteorder != "little":
+            data.byteswap()
+        return data
+
+
+def encode_snapshot(patients, compress=True):
+    """
+    Encodes the monitoring state of many patients into a compact binary blob.
+
+    Args:
+        patients (dict): Patient id to a state dict with the keys
+            historical_anomalies (list of dicts), current_anomalies (set),
+            critical_anomalies (set, optional; the current anomalies alerting
+            at critical level), current_health_risks (set) and alerts
+            (list of dicts).
+        compress (bool): Whether to zlib-compress the payload.
+
+    Returns:
+        bytes: The encoded snapshot.
+    """
+    strings = _StringTable()
+    parameters = {}
+
+    def parameter_slot(name):
+        slot = parameters.get(name)
+        if slot is None:
+            if len(parameters) >= MAX_PARAMETERS:
+                raise SnapshotError(f"More than {MAX_PARAMETERS} monitored parameters.")
+            slot = parameters[name] = len(parameters)
+        return slot
+
+    patient_ids, anomaly_masks, critical_masks = [], [], []
+    history_counts, history_codes = [], []
+    risk_counts, risk_indexes = [], []
+    alert_counts, alert_times, alert_levels, alert_messages, alert_patients = [], [], bytearray(), [], []
+
+    for patient_id, state in patients.items():
+        patient_ids.append(strings.add(str(patient_id)))
+
+        history = state.get("historical_anomalies", [])
+        history_counts.append(len(history))
+        for record in history:
+            code = 0
+            for parameter, status in record.items():
+                code |= STATUS_CODES.get(status, 3) << (STATUS_BITS * parameter_slot(parameter))
+            history_codes.append(code)
+
+        mask = 0
+        for parameter in state.get("current_anomalies", ()):
+            mask |= 1 << parameter_slot(parameter)
+        anomaly_masks.append(mask)
+        mask = 0
+        for parameter in state.get("critical_anomalies", ()):
+            mask |= 1 << parameter_slot(parameter)
+        critical_masks.append(mask)
+
+        risks = state.get("current_health_risks", ())
+        risk_counts.append(len(risks))
+        risk_indexes.extend(strings.add(risk) for risk in sorted(risks))
+
+        patient_alerts = state.get("alerts", [])
+        alert_counts.append(len(patient_alerts))
+        for alert in patient_alerts:
+            alert_times.append(alert["timestamp"].timestamp())
+            level = alert.get("level", "info")
+            alert_levels.append(ALERT_LEVELS.index(level) if level in ALERT_LEVELS else 0)
+            alert_messages.append(strings.add(alert["message"]))
+            patient = alert.get("patient")
+            alert_patients.append(NO_PATIENT if patient is None else strings.add(str(patient)))
+
+    parameter_names = sorted(parameters, key=parameters.get)
+    parameter_indexes = [strings.add(name) for name in parameter_names]
+    encoded_strings = [value.encode("utf-8") for value in strings.values]
+
+    payload = b"".join(
+        [
+            _array_bytes("I", [len(value) for value in encoded_strings]),
+            b"".join(encoded_strings),
+            _array_bytes("I", parameter_indexes),
+            _array_bytes("I", patient_ids),
+            _array_bytes("I", history_counts),
+            _array_bytes("I", risk_counts),
+            _array_bytes("I", alert_counts),
+            _array_bytes("I", anomaly_masks),
+            _array_bytes("I", critical_masks),
+            _array_bytes("Q", history_codes),
+            _array_bytes("I", risk_indexes),
+            _array_bytes("d", alert_times),
+            bytes(alert_levels),
+            _array_bytes("I", alert_messages),
+            _array_bytes("I", alert_patients),
+        ]
+    )
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, 1)
+        flags |= FLAG_COMPRESSED
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        0,
+        flags,
+        time.time(),
+        len(patient_ids),
+        len(encoded_strings),
+        len(parameter_indexes),
+    )
+    body = header + payload
+    return body + struct.pack("<I", zlib.crc32(body))
+
+
+def decode_snapshot(data):
+    """
+    Decodes a blob produced by encode_snapshot().
+
+    Args:
+        data (bytes): The encoded snapshot.
+
+    Returns:
+        tuple: (saved_at, patients) where saved_at is a datetime and patients
+        maps patient id to its state dict.
+    """
+    if len(data) < HEADER.size + 4:
+        raise SnapshotError("Snapshot is truncated.")
+    view = memoryview(data)
+    (crc,) = struct.unpack_from("<I", view, len(view) - 4)
+    if zlib.crc32(view[:-4]) != crc:
+        raise SnapshotError("Snapshot checksum mismatch.")
+    magic, version, _, flags, saved_at, n_patients, n_strings, n_parameters = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise SnapshotError("Not a monitoring state snapshot.")
+    if version not in SUPPORTED_VERSIONS:
+        raise SnapshotError(f"Unsupported snapshot version {version}.")
+
+    payload = view[HEADER.size : -4]
+    if flags & FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+    reader = _Reader(payload, 0)
+
+    lengths = reader.array("I", n_strings)
+    blob = bytes(reader.take(sum(lengths)))
+    strings = []
+    position = 0
+    for length in lengths:
+        strings.append(blob[position : position + length].decode("utf-8"))
+        position += length
+
+    parameters = [strings[index] for index in reader.array("I", n_parameters)]
+    patient_ids = reader.array("I", n_patients)
+    history_counts = reader.array("I", n_patients)
+    risk_counts = reader.array("I", n_patients)
+    alert_counts = reader.array("I", n_patients)
+    anomaly_masks = reader.array("I", n_patients)
+    critical_masks = reader.array("I", n_patients) if version >= 3 else [0] * n_patients
+    history_codes = reader.array("Q", sum(history_counts))
+    risk_indexes = reader.array("I", sum(risk_counts))
+    total_alerts = sum(alert_counts)
+    alert_times = reader.array("d", total_alerts)
+    alert_levels = reader.take(total_alerts)
+    alert_messages = reader.array("I", total_alerts)
+    alert_patients = reader.array("I", total_alerts) if version >= 4 else None
+
+    # Decode each distinct history record only once
+    record_cache = {}
+
+    def history_record(code):
+        record = record_cache.get(code)
+        if record is None:
+            record = {}
+            for slot, parameter in enumerate(parameters):
+                status = (code >> (STATUS_BITS * slot)) & 7
+                if status:
+                    record[parameter] = STATUS_NAMES[status]
+            record_cache[code] = record
+        return dict(record)
+
+    fromtimestamp = datetime.datetime.fromtimestamp
+    patients = {}
+    history_pos = risk_pos = alert_pos = 0
+    for i in range(n_patients):
+        history_end = history_pos + history_counts[i]
+        risk_end = risk_pos + risk_counts[i]
+        alert_end = alert_pos + alert_counts[i]
+        mask = anomaly_masks[i]
+        critical_mask = critical_masks[i]
+        patients[strings[patient_ids[i]]] = {
+            "historical_anomalies": [
+                history_record(code) for code in history_codes[history_pos:history_end]
+            ],
+            "current_anomalies": {
+                parameter for slot, parameter in enumerate(parameters) if mask >> slot & 1
+            },
+            "critical_anomalies": {
+                parameter for slot, parameter in enumerate(parameters) if critical_mask >> slot & 1
+            },
+            "current_health_risks": {strings[index] for index in risk_indexes[risk_pos:risk_end]},
+            "alerts": [
+                {
+                    "message": strings[alert_messages[j]],
+                    "level": ALERT_LEVELS[alert_levels[j]],
+                    "timestamp": fromtimestamp(alert_times[j]),
+                }
+                for j in range(alert_pos, alert_end)
+            ],
+        }
+        if alert_patients is not None:
+            for j, alert in enumerate(patients[strings[patient_ids[i]]]["alerts"], alert_pos):
+                if alert_patients[j] != NO_PATIENT:
+                    alert["patient"] = strings[alert_patients[j]]
+        history_pos, risk_pos, alert_pos = history_end, risk_end, alert_end
+
+    return datetime.datetime.fromtimestamp(saved_at), patients
+
+
+def save_snapshot(path, patients, compress=True):
+    """
+    Atomically writes a snapshot of the monitoring state to disk.
+
+    Args:
+        path (str): Destination file.
+        patients (dict): Patient id to state dict (see encode_snapshot()).
+        compress (bool): Whether to zlib-compress the payload.
+
+    Returns:
+        int: Size of the snapshot in bytes.
+    """
+    data = encode_snapshot(patients, compress=compress)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def load_snapshot(path):
+    """
+    Reads a snapshot written by save_snapshot().
+
+    Args:
+        path (str): Snapshot file.
+
+    Returns:
+        tuple: (saved_at, patients), see decode_snapshot().
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        raise SnapshotError(f"Could not read snapshot: {e}") from e
+    return decode_snapshot(data)
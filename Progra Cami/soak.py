@@ -0,0 +1,274 @@
+import argparse
+import csv
+import gc
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import clocks
+import health_monitoring_app as app
+
+# Largest growth allowed between the end of the warm-up and the end of the run
+DEFAULT_BUDGETS = {
+    "rss_mb": 64.0,  # resident set size growth in MiB
+    "objects": 200000,  # growth in allocated memory blocks (roughly, live objects)
+    "threads": 2,  # growth in live threads
+    # Absolute p99 latency of one tick for the whole ward; every reading
+    # takes the app's full per-reading path (about 0.2 ms each)
+    "p99_tick_ms": 500.0,
+}
+
+
+def rss_bytes():
+    """
+    Returns the current resident set size, or None where it is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current RSS, still good enough to see growth
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class SimulatedWard:
+    """
+    Drives the monitoring pipeline for many simulated patients at once.
+
+    Each patient's readings take the same path as a live reading
+    (imputation, baselines, alarms, risk prediction, rules, alerts, history
+    and monitors), with its own PatientMonitor, baseline and alarm states.
+    """
+
+    def __init__(self, patients, abnormal_rate=0.02, missing_rate=0.01):
+        self.patients = [f"patient-{i}" for i in range(patients)]
+        self.admitted = patients
+        self.abnormal_rate = abnormal_rate
+        self.missing_rate = missing_rate
+
+    def turn_over(self, count):
+        """
+        Discharges `count` random patients and admits new ones to their beds.
+        """
+        for bed in random.sample(range(len(self.patients)), min(count, len(self.patients))):
+            app.discharge_patient(self.patients[bed])
+            self.patients[bed] = f"patient-{self.admitted}"
+            self.admitted += 1
+
+    def reading(self):
+        data = app.simulate_sensor_data()
+        if random.random() < self.abnormal_rate:
+            data["heart_rate"] = random.randint(125, 160)
+            data["spo2"] = random.randint(85, 91)
+        for key in data:
+            if random.random() < self.missing_rate:
+                data[key] = None
+        return data
+
+    def tick(self, now):
+        """
+        Processes one reading for every patient as a single batch through
+        the app's own path (app.ingest_batch()), then evicts idle monitors
+        like process_tick() does.
+
+        Args:
+            now (float): Simulated time of the readings in seconds (the
+                app's clock.monotonic()).
+        """
+        taken_at = app.clock.time()
+        app.ingest_batch([(patient, self.reading(), taken_at) for patient in self.patients])
+        app.patient_monitors.evict(now)
+
+
+def take_sample(elapsed, latencies):
+    gc.collect()
+    rss = rss_bytes()
+    return {
+        "simulated_hours": round(elapsed / 3600, 3),
+        "rss_mb": None if rss is None else round(rss / 2**20, 2),
+        # Every live allocation, including dicts of plain values that the
+        # garbage collector does not track
+        "objects": sys.getallocatedblocks(),
+        "threads": threading.active_count(),
+        "monitors": len(app.patient_monitors),
+        "p50_tick_ms": round(_percentile(latencies, 0.5) * 1000, 2) if latencies else 0.0,
+        "p99_tick_ms": round(_percentile(latencies, 0.99) * 1000, 2) if latencies else 0.0,
+        "alerts": len(app.alerts),
+        "resident_alerts": len(app.alerts.resident),
+        "alerts_log_kb": round(os.path.getsize("alerts.log") / 1024, 1) if os.path.exists("alerts.log") else 0.0,
+    }
+
+
+def check_budgets(samples, budgets, warmup):
+    """
+    Compares the samples against the budgets.
+
+    Growth is measured from the first sample after the warm-up to the
+    largest value seen afterwards, so one-off start-up allocations do not count.
+
+    Returns:
+        list: Human readable budget violations (empty when within budget).
+    """
+    baseline_index = min(len(samples) - 1, max(0, int(len(samples) * warmup)))
+    baseline = samples[baseline_index]
+    after = samples[baseline_index:]
+    violations = []
+    for key in ("rss_mb", "objects", "threads"):
+        if baseline[key] is None:
+            continue
+        growth = max(sample[key] for sample in after) - baseline[key]
+        if growth > budgets[key]:
+            violations.append(f"{key} grew by {growth:g} (budget {budgets[key]:g})")
+    worst = max(sample["p99_tick_ms"] for sample in after)
+    if worst > budgets["p99_tick_ms"]:
+        violations.append(f"p99 tick latency reached {worst:g} ms (budget {budgets['p99_tick_ms']:g} ms)")
+    return violations
+
+
+def run_soak(
+    hours=1.0,
+    patients=1000,
+    tick_seconds=5.0,
+    sample_every=300.0,
+    restart_every=600.0,
+    budgets=None,
+    warmup=0.1,
+    turnover=0.0,
+):
+    """
+    Runs the pipeline for a simulated period as fast as the machine allows.
+
+    The pipeline runs on a VirtualClock that advances by `tick_seconds` per
+    tick however long the tick really took. Besides the simulated ward, the
+    app's own sensor stream runs through the scheduler and process_tick(),
+    and is stopped and started again every `restart_every` simulated seconds
+    to catch leaked producers.
+
+    Args:
+        hours (float): Simulated duration.
+        patients (int): Number of simulated patients.
+        tick_seconds (float): Simulated time between two readings of a patient.
+        sample_every (float): Simulated seconds between two resource samples.
+        restart_every (float): Simulated seconds between sensor stream restarts
+            (0 disables them).
+        budgets (dict): Overrides for DEFAULT_BUDGETS.
+        warmup (float): Fraction of the samples ignored before measuring growth.
+        turnover (float): Fraction of the beds getting a new patient per
+            simulated hour; the discharged patients are forgotten with
+            app.discharge_patient().
+
+    Returns:
+        tuple: (samples, violations).
+    """
+    budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+    ward = SimulatedWard(patients)
+    clock = clocks.VirtualClock()
+    app.set_clock(clock)
+    app.sensor_queue = app.create_sensor_queue()
+    app.update_sensor_data(app.sensor_queue)
+
+    duration = hours * 3600
+    next_sample = 0.0
+    next_restart = restart_every
+    discharges = 0.0
+    latencies = []
+    samples = [take_sample(0.0, latencies)]
+
+    while clock.monotonic() < duration:
+        tick_start = time.perf_counter()
+        clock.run(app.sensor_scheduler, tick_seconds)
+        app.process_tick(None)
+        ward.tick(clock.monotonic())
+        latencies.append(time.perf_counter() - tick_start)
+        elapsed = clock.monotonic()
+
+        discharges += turnover * patients * tick_seconds / 3600
+        if discharges >= 1:
+            ward.turn_over(int(discharges))
+            discharges -= int(discharges)
+
+        if restart_every and elapsed >= next_restart:
+            next_restart += restart_every
+            app.stop_sensor_data()
+            app.update_sensor_data(app.sensor_queue)
+
+        if elapsed >= next_sample:
+            next_sample += sample_every
+            samples.append(take_sample(elapsed, latencies))
+            latencies = []
+            app.log_event(f"Soak sample: {samples[-1]}")
+
+    if latencies:
+        samples.append(take_sample(clock.monotonic(), latencies))
+    app.sensor_supervisor.shutdown(join_timeout=2)
+    if app.alert_dispatcher is not None:
+        app.alert_dispatcher.close()
+    return samples, check_budgets(samples, budgets, warmup)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak test the monitoring pipeline on an accelerated clock.")
+    parser.add_argument("--hours", type=float, default=1.0, help="simulated duration (e.g. 72)")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--tick-seconds", type=float, default=5.0, help="simulated seconds per tick")
+    parser.add_argument("--sample-every", type=float, default=300.0, help="simulated seconds between samples")
+    parser.add_argument("--restart-every", type=float, default=600.0, help="simulated seconds between stream restarts")
+    parser.add_argument("--workdir", help="directory for logs and samples (default: a temporary directory)")
+    parser.add_argument("--turnover", type=float, default=0.0, help="fraction of beds getting a new patient per hour")
+    parser.add_argument("--seed", type=int, default=0)
+    for key, value in DEFAULT_BUDGETS.items():
+        parser.add_argument(f"--max-{key.replace('_', '-')}", dest=key, type=type(value), default=value)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ecare-soak-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    app.initialize_logging()
+    app.settings = app.load_settings()
+    app.apply_settings()
+
+    samples, violations = run_soak(
+        hours=args.hours,
+        patients=args.patients,
+        tick_seconds=args.tick_seconds,
+        sample_every=args.sample_every,
+        restart_every=args.restart_every,
+        turnover=args.turnover,
+        budgets={key: getattr(args, key) for key in DEFAULT_BUDGETS},
+    )
+
+    with open("soak_samples.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(samples[0]))
+        writer.writeheader()
+        writer.writerows(samples)
+
+    first, last = samples[0], samples[-1]
+    print(f"Simulated {last['simulated_hours']} h for {args.patients} patients; samples in {workdir}/soak_samples.csv")
+    for key in ("rss_mb", "objects", "threads", "monitors", "alerts", "resident_alerts", "alerts_log_kb"):
+        print(f"  {key}: {first[key]} -> {last[key]}")
+    if violations:
+        for violation in violations:
+            print(f"FAIL: {violation}")
+        return 1
+    print("PASS: all budgets respected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
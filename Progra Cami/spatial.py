@@ -0,0 +1,213 @@
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between two points in kilometres.
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    """
+    Uniform latitude/longitude grid over caregivers and community members.
+
+    Every member lives in exactly one cell, so inserts, moves and removals
+    are O(1). Radius queries only visit the cells overlapping the circle's
+    bounding box; k-nearest queries visit rings of cells outward from the
+    query point and stop as soon as no unvisited ring can hold anything
+    closer than the current k-th result.
+    """
+
+    def __init__(self, cell_size=0.01):
+        """
+        Args:
+            cell_size (float): Cell edge in degrees (0.01 is about 1.1 km).
+        """
+        self.cell_size = cell_size
+        self._cells = {}  # (row, column) -> {member id: (lat, lon, kind)}
+        self._members = {}  # member id -> (lat, lon, kind, cell)
+        self._bounds = None  # (min row, max row, min column, max column) ever used
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, member_id):
+        return member_id in self._members
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def insert(self, member_id, lat, lon, kind="community"):
+        """
+        Adds a member, or moves it if it is already indexed.
+
+        Args:
+            member_id: Any hashable id.
+            lat (float): Latitude in degrees.
+            lon (float): Longitude in degrees.
+            kind (str): e.g. "caregiver" or "community", used to filter queries.
+        """
+        if member_id in self._members:
+            self.remove(member_id)
+        cell = self._cell(lat, lon)
+        self._cells.setdefault(cell, {})[member_id] = (lat, lon, kind)
+        self._members[member_id] = (lat, lon, kind, cell)
+        row, column = cell
+        if self._bounds is None:
+            self._bounds = (row, row, column, column)
+        else:
+            min_row, max_row, min_column, max_column = self._bounds
+            self._bounds = (
+                min(min_row, row),
+                max(max_row, row),
+                min(min_column, column),
+                max(max_column, column),
+            )
+
+    move = insert
+
+    def remove(self, member_id):
+        entry = self._members.pop(member_id, None)
+        if entry is None:
+            return False
+        cell = entry[3]
+        members = self._cells[cell]
+        del members[member_id]
+        if not members:
+            del self._cells[cell]
+        return True
+
+    def location(self, member_id):
+        """
+        Returns:
+            tuple or None: (lat, lon, kind) of an indexed member.
+        """
+        entry = self._members.get(member_id)
+        return None if entry is None else entry[:3]
+
+    def within(self, lat, lon, radius_km, kind=None):
+        """
+        Finds the members inside a circle.
+
+        Args:
+            lat (float): Latitude of the centre.
+            lon (float): Longitude of the centre.
+            radius_km (float): Radius in kilometres.
+            kind (str): Only return members of this kind (None = all).
+
+        Returns:
+            list: (distance_km, member_id) pairs, closest first.
+        """
+        d_lat = radius_km / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(89.9, abs(lat) + d_lat)))
+        d_lon = min(180.0, radius_km / (KM_PER_DEGREE * cos_lat))
+        first_row, first_column = self._cell(lat - d_lat, lon - d_lon)
+        last_row, last_column = self._cell(lat + d_lat, lon + d_lon)
+
+        results = []
+        cells = self._cells
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                members = cells.get((row, column))
+                if not members:
+                    continue
+                for member_id, (member_lat, member_lon, member_kind) in members.items():
+                    if kind is not None and member_kind != kind:
+                        continue
+                    distance = haversine_km(lat, lon, member_lat, member_lon)
+                    if distance <= radius_km:
+                        results.append((distance, member_id))
+        results.sort()
+        return results
+
+    def nearest(self, lat, lon, k=5, kind=None, max_radius_km=None):
+        """
+        Finds the k members closest to a point.
+
+        Args:
+            lat (float): Latitude of the point.
+            lon (float): Longitude of the point.
+            k (int): Number of members wanted.
+            kind (str): Only return members of this kind (None = all).
+            max_radius_km (float): Optional cut-off distance.
+
+        Returns:
+            list: Up to k (distance_km, member_id) pairs, closest first.
+        """
+        if k <= 0 or self._bounds is None:
+            return []
+        min_row, max_row, min_column, max_column = self._bounds
+        center_row, center_column = self._cell(lat, lon)
+        cell_km = self.cell_size * KM_PER_DEGREE
+        rings = max(
+            center_row - min_row,
+            max_row - center_row,
+            center_column - min_column,
+            max_column - center_column,
+        )
+        # Rings closer than the indexed area are empty, so start at its edge
+        first_ring = max(
+            min_row - center_row,
+            center_row - max_row,
+            min_column - center_column,
+            center_column - max_column,
+            0,
+        )
+
+        best = []  # max-heap of (-distance, member id)
+        cells = self._cells
+        for ring in range(first_ring, rings + 1):
+            # Nothing in this ring or beyond is closer than this (longitude
+            # degrees shrink towards the poles, hence the cosine)
+            lower_bound = (ring - 1) * cell_km * math.cos(math.radians(min(89.9, abs(lat) + ring * self.cell_size)))
+            if max_radius_km is not None and lower_bound > max_radius_km:
+                break
+            if len(best) == k and lower_bound > -best[0][0]:
+                break
+            for cell in self._ring_cells(center_row, center_column, ring, self._bounds):
+                members = cells.get(cell)
+                if not members:
+                    continue
+                for member_id, (member_lat, member_lon, member_kind) in members.items():
+                    if kind is not None and member_kind != kind:
+                        continue
+                    distance = haversine_km(lat, lon, member_lat, member_lon)
+                    if max_radius_km is not None and distance > max_radius_km:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, member_id))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, member_id))
+        return sorted((-negative, member_id) for negative, member_id in best)
+
+    @staticmethod
+    def _ring_cells(center_row, center_column, ring, bounds):
+        # Cells at Chebyshev distance `ring` from the centre, clipped to bounds
+        min_row, max_row, min_column, max_column = bounds
+        if ring == 0:
+            yield (center_row, center_column)
+            return
+        top, bottom = center_row - ring, center_row + ring
+        left, right = center_column - ring, center_column + ring
+        columns = range(max(left, min_column), min(right, max_column) + 1)
+        if top >= min_row:
+            for column in columns:
+                yield (top, column)
+        if bottom <= max_row:
+            for column in columns:
+                yield (bottom, column)
+        for row in range(max(top + 1, min_row), min(bottom - 1, max_row) + 1):
+            if left >= min_column:
+                yield (row, left)
+            if right <= max_column:
+                yield (row, right)
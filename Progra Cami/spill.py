@@ -0,0 +1,372 @@
+import bisect
+import collections
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+
+import snapshot
+
+
+def alert_size(alert):
+    """
+    Rough number of bytes an alert dict keeps alive.
+    """
+    return sys.getsizeof(alert) + sys.getsizeof(alert["message"]) + sys.getsizeof(alert["timestamp"])
+
+
+class SpillingLog:
+    """
+    Append-only list of alerts that keeps its memory use under a budget.
+
+    The newest alerts stay in memory. When they exceed the budget the oldest
+    ones are written to a segment file in the snapshot format and dropped
+    from memory. Indexing, slicing, iteration and time-range queries page
+    the segments back in on demand (the last few decoded segments are
+    cached), so callers can keep treating the log as a list.
+
+    Segments are written, and the manifest updated, by a background thread
+    so the alert path never waits for the disk; flush() waits for it. The
+    oldest segments are deleted past a retention period or a disk budget,
+    after which the remaining alerts are renumbered from 0, as if the list
+    had dropped its first items.
+    """
+
+    def __init__(
+        self,
+        name="alerts",
+        spill_dir=None,
+        budget_bytes=None,
+        segment_items=2000,
+        cached_segments=2,
+        retention=None,
+        max_disk_bytes=None,
+    ):
+        """
+        Args:
+            name (str): Prefix of the segment and manifest files.
+            spill_dir (str): Directory for spilled segments (None keeps
+                everything in memory).
+            budget_bytes (int): Memory allowed for resident alerts.
+            segment_items (int): Alerts written per segment file.
+            cached_segments (int): Decoded segments kept for repeated queries.
+            retention (float): Seconds of spilled alerts kept, counted back
+                from the newest spilled alert (None = forever).
+            max_disk_bytes (int): Total size of the segments kept (None = no limit).
+        """
+        self.name = name
+        self.segment_items = segment_items
+        self.resident = []
+        self.resident_bytes = 0
+        self.pruned = 0  # segments deleted by retention
+        self._segments = []  # dicts: file, first, count, start, end (timestamps), bytes
+        self._firsts = []  # first index of every segment, for bisect
+        self._next_file = 0  # number of the next segment file
+        self._cache = collections.OrderedDict()
+        self._cached_segments = cached_segments
+        self._pending = {}  # segment file -> alerts not written yet
+        self._writes = queue.Queue()
+        self._writer = None
+        self.spill_dir = None
+        self.budget_bytes = None
+        self.configure(spill_dir, budget_bytes, retention=retention, max_disk_bytes=max_disk_bytes)
+
+    # --- Configuration ---
+
+    def configure(self, spill_dir, budget_bytes, segment_items=None, retention=None, max_disk_bytes=None):
+        """
+        Sets where and when alerts spill and how long they are kept,
+        picking up segments spilled by a previous run from the directory's
+        manifest.
+        """
+        if segment_items:
+            self.segment_items = segment_items
+        self.budget_bytes = budget_bytes
+        self.retention = retention
+        self.max_disk_bytes = max_disk_bytes
+        if spill_dir != self.spill_dir:
+            # Finish the writes into the previous directory first
+            self.flush()
+            self.spill_dir = spill_dir
+            self._segments = []
+            self._next_file = 0
+            self._pending.clear()
+            self._cache.clear()
+            if spill_dir:
+                os.makedirs(spill_dir, exist_ok=True)
+                self._load_manifest()
+            self._renumber()
+        if self._prune():
+            self._submit(self._write_manifest, self.spill_dir, list(self._segments))
+        self._enforce_budget()
+
+    def _manifest_path(self):
+        return os.path.join(self.spill_dir, f"{self.name}.manifest.json")
+
+    def _load_manifest(self):
+        path = self._manifest_path()
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r") as f:
+                segments = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Ignoring unreadable spill manifest {path}: {e}")
+            return
+        for segment in segments:
+            segment_path = os.path.join(self.spill_dir, segment["file"])
+            if not os.path.exists(segment_path):
+                logging.warning(f"Spill segment {segment_path} is missing; its alerts are skipped.")
+                continue
+            if "bytes" not in segment:
+                segment["bytes"] = os.path.getsize(segment_path)
+            self._segments.append(segment)
+            number = segment["file"][len(self.name) + 1 : -len(".seg")]
+            if number.isdigit():
+                self._next_file = max(self._next_file, int(number) + 1)
+
+    def _renumber(self):
+        # Index the segments contiguously from 0, whatever was deleted or lost
+        first = 0
+        for segment in self._segments:
+            segment["first"] = first
+            first += segment["count"]
+        self._firsts = [segment["first"] for segment in self._segments]
+
+    # --- Background Writes ---
+
+    def _submit(self, function, *args):
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._run_writer, name=f"{self.name}-spill", daemon=True)
+            self._writer.start()
+        self._writes.put((function, args))
+
+    def _run_writer(self):
+        while True:
+            function, args = self._writes.get()
+            try:
+                function(*args)
+            except (OSError, snapshot.SnapshotError) as e:
+                logging.error(f"Spill write failed: {e}")
+            finally:
+                self._writes.task_done()
+
+    def flush(self):
+        """
+        Waits until every spilled segment and the manifest are on disk.
+        """
+        if self._writer is not None:
+            self._writes.join()
+
+    def _write_segment(self, directory, file_name, data):
+        # Same atomic write as snapshot.save_snapshot(), off the alert path
+        path = os.path.join(directory, file_name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        # Readers find the file from now on; a failed write keeps the
+        # alerts readable from memory instead
+        self._pending.pop(file_name, None)
+
+    def _remove_segment(self, directory, file_name):
+        try:
+            os.remove(os.path.join(directory, file_name))
+        except FileNotFoundError:
+            pass
+
+    def _write_manifest(self, directory, segments):
+        path = os.path.join(directory, f"{self.name}.manifest.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(segments, f)
+        os.replace(tmp_path, path)
+
+    # --- Spilling ---
+
+    @property
+    def spilled(self):
+        """
+        Number of alerts that live on disk.
+        """
+        if not self._segments:
+            return 0
+        last = self._segments[-1]
+        return last["first"] + last["count"]
+
+    def _enforce_budget(self):
+        if not self.spill_dir or self.budget_bytes is None:
+            return
+        while self.resident_bytes > self.budget_bytes and len(self.resident) > 1:
+            self._spill(min(self.segment_items, len(self.resident) - 1))
+
+    def _spill(self, count):
+        items = self.resident[:count]
+        first = self.spilled
+        data = snapshot.encode_snapshot({self.name: {"alerts": items}})
+        segment = {
+            "file": f"{self.name}-{self._next_file:012d}.seg",
+            "first": first,
+            "count": count,
+            "start": items[0]["timestamp"].timestamp(),
+            "end": items[-1]["timestamp"].timestamp(),
+            "bytes": len(data),
+        }
+        self._next_file += 1
+        self._segments.append(segment)
+        self._firsts.append(first)
+        self._pending[segment["file"]] = items
+        self._submit(self._write_segment, self.spill_dir, segment["file"], data)
+        del self.resident[:count]
+        self.resident_bytes -= sum(alert_size(alert) for alert in items)
+        self._prune()
+        self._submit(self._write_manifest, self.spill_dir, list(self._segments))
+
+    def _prune(self):
+        # Deletes the oldest segments past the retention period or the disk
+        # budget; returns how many were deleted
+        if not self._segments:
+            return 0
+        newest = self._segments[-1]["end"]
+        total = sum(segment["bytes"] for segment in self._segments)
+        pruned = 0
+        while self._segments:
+            segment = self._segments[0]
+            expired = self.retention is not None and segment["end"] < newest - self.retention
+            if not expired and (self.max_disk_bytes is None or total <= self.max_disk_bytes):
+                break
+            del self._segments[0]
+            total -= segment["bytes"]
+            self._cache.pop(segment["file"], None)
+            self._pending.pop(segment["file"], None)
+            self._submit(self._remove_segment, self.spill_dir, segment["file"])
+            pruned += 1
+        if pruned:
+            self._renumber()
+            self.pruned += pruned
+        return pruned
+
+    def _segment_items(self, position):
+        segment = self._segments[position]
+        items = self._pending.get(segment["file"])
+        if items is not None:
+            return items
+        items = self._cache.get(segment["file"])
+        if items is None:
+            _, patients = snapshot.load_snapshot(os.path.join(self.spill_dir, segment["file"]))
+            items = patients[self.name]["alerts"]
+            self._cache[segment["file"]] = items
+            while len(self._cache) > self._cached_segments:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(segment["file"])
+        return items
+
+    # --- List interface ---
+
+    def append(self, alert):
+        self.resident.append(alert)
+        self.resident_bytes += alert_size(alert)
+        if self.budget_bytes is not None and self.resident_bytes > self.budget_bytes:
+            self._enforce_budget()
+
+    def extend(self, alerts):
+        for alert in alerts:
+            self.append(alert)
+
+    def __len__(self):
+        return self.spilled + len(self.resident)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        for position in range(len(self._segments)):
+            yield from self._segment_items(position)
+        yield from list(self.resident)
+
+    def _get(self, index):
+        spilled = self.spilled
+        if index >= spilled:
+            return self.resident[index - spilled]
+        position = bisect.bisect_right(self._firsts, index) - 1
+        return self._segment_items(position)[index - self._segments[position]["first"]]
+
+    def __getitem__(self, index):
+        length = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            spilled = self.spilled
+            if step == 1 and start >= spilled:
+                # The common case (e.g. alerts[-5:]) never touches the disk
+                return self.resident[start - spilled : stop - spilled]
+            return [self._get(i) for i in range(start, stop, step)]
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("alert index out of range")
+        return self._get(index)
+
+    def between(self, start, end):
+        """
+        Returns the alerts raised in [start, end), reading only the segments
+        that overlap the range.
+
+        Args:
+            start (datetime.datetime): Start of the range.
+            end (datetime.datetime): End of the range.
+        """
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        result = []
+        for position, segment in enumerate(self._segments):
+            if segment["end"] >= start_ts and segment["start"] < end_ts:
+                result.extend(alert for alert in self._segment_items(position) if start <= alert["timestamp"] < end)
+        result.extend(alert for alert in self.resident if start <= alert["timestamp"] < end)
+        return result
+
+    def restore_resident(self, alerts):
+        """
+        Replaces the in-memory alerts with ones restored from a snapshot,
+        skipping any that were spilled after the snapshot was taken.
+        """
+        cutoff = self._segments[-1]["end"] if self._segments else None
+        # Alerts raised in the same instant as the last spilled one may or
+        # may not have been spilled with it
+        spilled_at_cutoff = []
+        if cutoff is not None:
+            spilled_at_cutoff = [
+                alert
+                for alert in self._segment_items(len(self._segments) - 1)
+                if alert["timestamp"].timestamp() == cutoff
+            ]
+        self.resident = []
+        for alert in alerts:
+            timestamp = alert["timestamp"].timestamp()
+            if cutoff is not None and timestamp < cutoff:
+                continue
+            if cutoff is not None and timestamp == cutoff and alert in spilled_at_cutoff:
+                spilled_at_cutoff.remove(alert)
+                continue
+            self.resident.append(alert)
+        self.resident_bytes = sum(alert_size(alert) for alert in self.resident)
+        self._enforce_budget()
+
+    def clear(self):
+        """
+        Forgets every alert, including the spilled segments.
+        """
+        if self.spill_dir:
+            for segment in self._segments:
+                self._submit(self._remove_segment, self.spill_dir, segment["file"])
+        self._segments = []
+        self._firsts = []
+        self._pending.clear()
+        self._cache.clear()
+        self.resident = []
+        self.resident_bytes = 0
+        if self.spill_dir:
+            self._submit(self._write_manifest, self.spill_dir, [])
@@ -0,0 +1,110 @@
+import alarms
+
+RANGES = {"heart_rate": [60, 100]}
+CONFIG = {"margin": 0.05, "critical": 0.2, "entry_delay": 3, "exit_delay": 30}
+
+
+def reading(tracker, value, now, patient="a"):
+    status = "normal" if 60 <= value <= 100 else "abnormal"
+    return tracker.update(patient, {"heart_rate": value}, {"heart_rate": status}, now)
+
+
+def test_alert_waits_for_the_entry_delay():
+    tracker = alarms.AlarmTracker(RANGES, CONFIG)
+    latched, raised = reading(tracker, 105, 0.0)
+    assert raised == [] and latched["heart_rate"] == "normal"
+    assert tracker.state("a", "heart_rate") == alarms.PENDING
+    latched, raised = reading(tracker, 105, 3.0)
+    assert raised == [("heart_rate", "warning", 105)]
+    assert latched["heart_rate"] == "abnormal"
+
+
+def test_short_excursion_raises_nothing():
+    tracker = alarms.AlarmTracker(RANGES, CONFIG)
+    reading(tracker, 105, 0.0)
+    reading(tracker, 90, 1.0)
+    _, raised = reading(tracker, 105, 3.5)
+    assert raised == []
+    assert tracker.state("a", "heart_rate") == alarms.PENDING
+
+
+def test_flapping_around_the_threshold_alerts_once():
+    tracker = alarms.AlarmTracker(RANGES, CONFIG)
+    reading(tracker, 105, 0.0)
+    reading(tracker, 105, 3.0)
+    raised = []
+    for second in range(4, 40):
+        # 99 is in range but outside the exit band (upper 98)
+        raised += reading(tracker, 99 if second % 2 else 101, float(second))[1]
+    assert raised == []
+    assert tracker.state("a", "heart_rate") == alarms.ALERTING
+
+
+def test_alert_clears_after_the_exit_delay():
+    tracker = alarms.AlarmTracker(RANGES, CONFIG)
+    reading(tracker, 105, 0.0)
+    reading(tracker, 105, 3.0)
+    latched, _ = reading(tracker, 80, 10.0)
+    assert tracker.state("a", "heart_rate") == alarms.CLEARING
+    assert latched["heart_rate"] == "abnormal"
+    latched, _ = reading(tracker, 80, 40.0)
+    assert tracker.state("a", "heart_rate") == alarms.NORMAL
+    assert latched["heart_rate"] == "normal"
+
+
+def test_escalation_to_critical_alerts_again():
+    tracker = alarms.AlarmTracker(RANGES, CONFIG)
+    reading(tracker, 105, 0.0)
+    reading(tracker, 105, 3.0)
+    _, raised = reading(tracker, 130, 4.0)
+    assert raised == [("heart_rate", "critical", 130)]
+    assert tracker.critical("a") == {"heart_rate"}
+    _, raised = reading(tracker, 135, 5.0)
+    assert raised == []
+
+
+def test_critical_limits():
+    tracker = alarms.AlarmTracker(RANGES, CONFIG)
+    assert tracker.critical_limits("heart_rate") == (52.0, 108.0)
+    assert tracker.critical_limits("spo2") is None
+
+
+def test_seed_does_not_alert_again():
+    tracker = alarms.AlarmTracker(RANGES, CONFIG)
+    tracker.seed("a", {"heart_rate"}, set(), 0.0)
+    _, raised = reading(tracker, 105, 1.0)
+    assert raised == []
+    assert tracker.state("a", "heart_rate") == alarms.ALERTING
+
+
+def test_seed_keeps_the_critical_level():
+    tracker = alarms.AlarmTracker(RANGES, CONFIG)
+    tracker.seed("a", {"heart_rate"}, set(), 0.0, critical={"heart_rate"})
+    assert tracker.critical("a") == {"heart_rate"}
+    _, raised = reading(tracker, 130, 1.0)
+    assert raised == []
+
+
+def test_seed_without_critical_escalates():
+    tracker = alarms.AlarmTracker(RANGES, CONFIG)
+    tracker.seed("a", {"heart_rate"}, set(), 0.0)
+    _, raised = reading(tracker, 130, 1.0)
+    assert raised == [("heart_rate", "critical", 130)]
+
+
+def test_seeded_risks_stay_latched():
+    tracker = alarms.AlarmTracker(RANGES, CONFIG)
+    tracker.seed("a", set(), {"sepsis"}, 0.0)
+    current, new = tracker.latch_risks("a", set(), 10.0)
+    assert current == {"sepsis"} and new == []
+    current, new = tracker.latch_risks("a", set(), 30.0)
+    assert current == set()
+
+
+def test_patients_are_independent():
+    tracker = alarms.AlarmTracker(RANGES, CONFIG)
+    reading(tracker, 105, 0.0, patient="a")
+    reading(tracker, 105, 3.0, patient="a")
+    assert tracker.state("b", "heart_rate") == alarms.NORMAL
+    tracker.forget("a")
+    assert tracker.state("a", "heart_rate") == alarms.NORMAL
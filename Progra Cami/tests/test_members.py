@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+import members
+
+
+def test_torn_last_line_is_dropped_and_truncated(tmp_path):
+    path = tmp_path / "members.jsonl"
+    registry = members.MemberRegistry(str(path))
+    registry.register("Ana Ruiz", "ana@example.com")
+    registry.register("Luis Gil")
+    with open(path, "ab") as f:
+        f.write(b'{"id": "member-3", "name": "Torn')
+
+    reloaded = members.MemberRegistry(str(path))
+    assert [member["name"] for member in reloaded] == ["Ana Ruiz", "Luis Gil"]
+    assert path.read_bytes().endswith(b"\n")
+
+    # The next member starts on a line of its own and survives a reload
+    reloaded.register("Marta Sanz")
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["Ana Ruiz", "Luis Gil", "Marta Sanz"]
+    assert len(members.MemberRegistry(str(path))) == 3
+
+
+def test_ids_stay_unique_after_skipped_lines(tmp_path):
+    path = tmp_path / "members.jsonl"
+    lines = [json.dumps({"id": "member-1", "name": "Ana"}), "not json", json.dumps({"id": "member-7", "name": "Luis"})]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    registry = members.MemberRegistry(str(path))
+    assert len(registry) == 2
+    assert registry.register("Marta")["id"] == "member-8"
+    added, _ = registry.bulk_import([{"name": "Pedro"}, {"name": "Rosa"}])
+    assert [member["id"] for member in added] == ["member-9", "member-10"]
+
+
+def test_duplicates_are_keyed_on_email_or_name():
+    registry = members.MemberRegistry(None)
+    registry.register("José Pérez", "jose@example.com")
+    # Same name with another email is a different person
+    registry.register("Jose Perez", "other@example.com")
+    with pytest.raises(members.DuplicateMemberError):
+        registry.register("Someone", "JOSE@example.com")
+    registry.register("Luis Gil")
+    with pytest.raises(members.DuplicateMemberError):
+        registry.register("luis  gil")
+
+
+def test_bulk_import_skips_duplicates_and_invalid_rows():
+    registry = members.MemberRegistry(None)
+    registry.register("Ana", "ana@example.com")
+    added, skipped = registry.bulk_import(
+        [
+            {"name": "Ana B", "email": "ana@example.com"},
+            {"name": "Luis"},
+            {"name": "luis"},
+            {"name": ""},
+        ]
+    )
+    assert [member["name"] for member in added] == ["Luis"]
+    assert len(skipped) == 3
+
+
+def test_search_by_prefix_ignores_accents_and_case():
+    registry = members.MemberRegistry(None)
+    for name in ["Álvaro", "alba", "Beatriz", "Alberto"]:
+        registry.register(name)
+    found, total = registry.search("al", page_size=2)
+    assert total == 3
+    assert [member["name"] for member in found] == ["alba", "Alberto"]
+    assert registry.find("ALVARO")["name"] == "Álvaro"
@@ -0,0 +1,25 @@
+import metrics
+
+
+def test_label_values_are_escaped():
+    registry = metrics.MetricsRegistry()
+    counter = registry.counter("ecare_test_total", "Test counter.", labels=("stream",))
+    counter.inc(stream='bed "7"\\a\nb')
+    assert 'ecare_test_total{stream="bed \\"7\\"\\\\a\\nb"} 1' in registry.render().splitlines()
+
+
+def test_help_text_escapes_backslashes_and_newlines_only():
+    registry = metrics.MetricsRegistry()
+    registry.gauge("ecare_test", 'Line one\nwith "quotes" and C:\\path.')
+    assert '# HELP ecare_test Line one\\nwith "quotes" and C:\\\\path.' in registry.render().splitlines()
+
+
+def test_histogram_labels_include_le():
+    registry = metrics.MetricsRegistry()
+    histogram = registry.histogram("ecare_test_seconds", "Test histogram.", labels=("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.5, stage="a")
+    lines = registry.render().splitlines()
+    assert 'ecare_test_seconds_bucket{stage="a",le="0.1"} 0' in lines
+    assert 'ecare_test_seconds_bucket{stage="a",le="1"} 1' in lines
+    assert 'ecare_test_seconds_bucket{stage="a",le="+Inf"} 1' in lines
+    assert 'ecare_test_seconds_count{stage="a"} 1' in lines
@@ -0,0 +1,55 @@
+import monitors
+
+
+def test_idle_monitors_are_saved_and_read_back(tmp_path):
+    loaded, evicted = [], []
+    registry = monitors.MonitorRegistry()
+    registry.configure(idle_timeout=60, directory=str(tmp_path), on_load=loaded.append, on_evict=evicted.append)
+    monitor = registry.get("bed/1", now=0.0)
+    monitor.history.append({"heart_rate": "abnormal"})
+    monitor.current_anomalies = {"heart_rate"}
+    monitor.critical_anomalies = {"heart_rate"}
+    monitor.current_health_risks = {"tachycardia"}
+    registry.get("bed-2", now=50.0)
+
+    assert registry.evict(60.0) == 1
+    assert "bed/1" not in registry and "bed-2" in registry
+    assert [m.patient_id for m in evicted] == ["bed/1"]
+
+    restored = registry.get("bed/1", now=70.0)
+    assert restored is not monitor
+    assert loaded == [restored]
+    assert restored.history == [{"heart_rate": "abnormal"}]
+    assert restored.current_anomalies == {"heart_rate"}
+    assert restored.critical_anomalies == {"heart_rate"}
+    assert restored.current_health_risks == {"tachycardia"}
+
+
+def test_least_recently_used_beyond_max_resident_are_evicted(tmp_path):
+    registry = monitors.MonitorRegistry()
+    registry.configure(max_resident=2, directory=str(tmp_path))
+    for i, patient in enumerate(["a", "b", "c"]):
+        registry.get(patient, now=float(i))
+    registry.get("a", now=3.0)
+    assert registry.evict(3.0) == 1
+    assert sorted(m.patient_id for m in registry) == ["a", "c"]
+    assert registry.evictions == 1
+
+
+def test_remove_deletes_the_saved_monitor(tmp_path):
+    registry = monitors.MonitorRegistry()
+    registry.configure(idle_timeout=1, directory=str(tmp_path))
+    registry.get("a", now=0.0).current_anomalies = {"spo2"}
+    registry.evict(5.0)
+    registry.remove("a")
+    assert list(tmp_path.iterdir()) == []
+    assert registry.get("a").current_anomalies == set()
+
+
+def test_without_a_directory_evicted_monitors_start_over():
+    registry = monitors.MonitorRegistry()
+    registry.configure(idle_timeout=1)
+    registry.get("a", now=0.0).current_anomalies = {"spo2"}
+    registry.evict(5.0)
+    assert registry.get("a").current_anomalies == set()
+    assert registry.loads == 0
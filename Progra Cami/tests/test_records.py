@@ -0,0 +1,92 @@
+import records
+
+
+def fill(log, seconds, patients=("a", "b")):
+    for t in range(seconds):
+        log.append(patients[t % len(patients)], float(t), {"heart_rate": 70 + t % 5, "spo2": None})
+    log.flush()
+
+
+def test_pack_round_trip():
+    data = records.pack_record(3, 12.5, {"heart_rate": 72, "body_temperature": 37.1}, abnormal={"heart_rate"})
+    assert len(data) == records.RECORD_SIZE
+    patient, timestamp, reading, abnormal = records.unpack_record(data)
+    assert (patient, timestamp) == (3, 12.5)
+    assert reading["heart_rate"] == 72 and reading["body_temperature"] == 37.1
+    assert reading["spo2"] is None
+    assert abnormal == {"heart_rate"}
+
+
+def test_read_range_and_patient(tmp_path):
+    log = records.RecordLog(str(tmp_path / "history.bin"), flush_every=7)
+    fill(log, 100)
+    rows = log.read(10, 20, patient="b")
+    assert [timestamp for _, timestamp, _, _ in rows] == [11.0, 13.0, 15.0, 17.0, 19.0]
+    assert {patient for patient, _, _, _ in rows} == {"b"}
+    assert log.read(patient="nobody") == []
+
+
+def test_torn_record_is_dropped_on_open(tmp_path):
+    path = tmp_path / "history.bin"
+    log = records.RecordLog(str(path))
+    fill(log, 10)
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+    reopened = records.RecordLog(str(path))
+    assert len(reopened) == 10
+    assert path.stat().st_size == 10 * records.RECORD_SIZE
+    assert reopened.read()[-1][0] == "b"
+
+
+def test_retention_drops_old_records(tmp_path):
+    path = tmp_path / "history.bin"
+    log = records.RecordLog(str(path), flush_every=10, retention=100)
+    fill(log, 1000)
+    rows = log.read()
+    # Expired records are kept until they span a quarter of the retention
+    assert rows[-1][1] == 999.0
+    assert 999.0 - 125 <= rows[0][1] <= 999.0 - 100
+    assert path.stat().st_size == len(rows) * records.RECORD_SIZE
+
+    reopened = records.RecordLog(str(path), retention=100)
+    assert reopened.read() == rows
+
+
+def test_without_retention_everything_is_kept(tmp_path):
+    log = records.RecordLog(str(tmp_path / "history.bin"), flush_every=10)
+    fill(log, 1000)
+    assert len(log.read()) == 1000
+
+
+def test_read_columns_matches_read(tmp_path):
+    log = records.RecordLog(str(tmp_path / "history.bin"), flush_every=7)
+    fill(log, 50)
+    patients, timestamps, columns = log.read_columns(10, 20, patient="a")
+    rows = log.read(10, 20, patient="a")
+    assert patients == [patient for patient, _, _, _ in rows]
+    assert timestamps == [timestamp for _, timestamp, _, _ in rows]
+    for parameter in records.PARAMETERS:
+        assert columns[parameter] == [reading[parameter] for _, _, reading, _ in rows]
+    assert columns["spo2"][0] is None
+    assert log.read_columns(patient="nobody") == ([], [], {parameter: [] for parameter in records.PARAMETERS})
+
+
+def test_decoded_values_keep_their_type():
+    reading = {"heart_rate": -3, "systolic_bp": 120, "body_temperature": -0.5, "spo2": 97.5}
+    _, _, decoded, _ = records.unpack_record(records.pack_record(0, 0.0, reading))
+    assert decoded["heart_rate"] == -3 and isinstance(decoded["heart_rate"], int)
+    assert decoded["body_temperature"] == -0.5
+    assert decoded["spo2"] == 97.5
+
+
+def test_timestamps_never_go_backwards(tmp_path):
+    path = tmp_path / "history.bin"
+    log = records.RecordLog(str(path))
+    for timestamp in (100.0, 101.0, 50.0, 102.0):
+        log.append("a", timestamp, {"heart_rate": 70})
+    log.flush()
+    assert [timestamp for _, timestamp, _, _ in log.read()] == [100.0, 101.0, 101.0, 102.0]
+    # Also across a restart
+    reopened = records.RecordLog(str(path))
+    reopened.append("a", 10.0, {"heart_rate": 70})
+    assert [timestamp for _, timestamp, _, _ in reopened.read(101.0)] == [101.0, 101.0, 102.0, 102.0]
@@ -0,0 +1,142 @@
+import pytest
+
+import rules
+
+
+def make_engine(source, name="tachy"):
+    return rules.RuleEngine([rules.Rule(name, source)])
+
+
+def test_parse_rule_duration_units():
+    _, duration = rules.parse_rule("heart_rate > 120 for 2m")
+    assert duration == 120.0
+    _, duration = rules.parse_rule("heart_rate > 120")
+    assert duration == 0.0
+
+
+@pytest.mark.parametrize("source", ["heart_rate >", "heart_rate > 120 and", "(spo2 < 90", "heart_rate ? 3"])
+def test_parse_rule_rejects_bad_syntax(source):
+    with pytest.raises(rules.RuleSyntaxError):
+        rules.parse_rule(source)
+
+
+def test_rule_fires_once_after_hold_time():
+    engine = make_engine("heart_rate > 120 and spo2 < 92 for 30s")
+    columns = {"heart_rate": [130], "spo2": [90]}
+    assert engine.evaluate(["a"], columns, 0.0) == []
+    assert engine.evaluate(["a"], columns, 29.0) == []
+    fired = engine.evaluate(["a"], columns, 30.0)
+    assert [(patient, rule.name) for patient, rule in fired] == [("a", "tachy")]
+    # Still true: the same episode does not fire again
+    assert engine.evaluate(["a"], columns, 60.0) == []
+    assert [rule.name for rule in engine.active("a")] == ["tachy"]
+
+
+def test_cleared_condition_restarts_the_hold_time():
+    engine = make_engine("heart_rate > 120 for 10s")
+    engine.evaluate(["a"], {"heart_rate": [130]}, 0.0)
+    engine.evaluate(["a"], {"heart_rate": [80]}, 5.0)
+    assert engine.evaluate(["a"], {"heart_rate": [130]}, 12.0) == []
+    assert len(engine.evaluate(["a"], {"heart_rate": [130]}, 22.0)) == 1
+
+
+def test_missing_values_never_match():
+    engine = make_engine("heart_rate > 120")
+    assert engine.evaluate(["a"], {"heart_rate": [None]}, 0.0) == []
+    assert engine.evaluate(["a"], {}, 0.0) == []
+
+
+def test_patients_outside_the_batch_keep_their_state():
+    engine = make_engine("heart_rate > 120 for 10s")
+    engine.evaluate(["a", "b"], {"heart_rate": [130, 130]}, 0.0)
+    # Only b reports; a's episode must neither clear nor fire
+    engine.evaluate(["b"], {"heart_rate": [80]}, 5.0)
+    fired = engine.evaluate(["a"], {"heart_rate": [130]}, 10.0)
+    assert [patient for patient, _ in fired] == ["a"]
+    assert engine.active("b") == []
+
+
+def test_fired_alerts_are_attributed_to_their_patient():
+    engine = make_engine("spo2 < 90")
+    fired = engine.evaluate(["a", "b", "c"], {"spo2": [97, 85, 96]}, 0.0)
+    assert [patient for patient, _ in fired] == ["b"]
+
+
+def test_forget_drops_the_patient_state():
+    engine = make_engine("heart_rate > 120 for 10s")
+    engine.evaluate(["a"], {"heart_rate": [130]}, 0.0)
+    engine.forget("a")
+    assert engine.evaluate(["a"], {"heart_rate": [130]}, 10.0) == []
+
+
+def test_load_rules_skips_invalid_definitions():
+    engine = rules.load_rules(
+        [
+            {"name": "ok", "when": "spo2 < 90"},
+            {"name": "broken", "when": "spo2 <"},
+        ]
+    )
+    assert [rule.name for rule in engine.rules] == ["ok"]
+
+
+def count_calls(rule):
+    calls = []
+    evaluate = rule.predicate.evaluate
+
+    def counting(columns, count, cache):
+        calls.append(count)
+        return evaluate(columns, count, cache)
+
+    rule.predicate.evaluate = counting
+    return calls
+
+
+def test_unchanged_inputs_are_not_re_evaluated():
+    engine = make_engine("heart_rate > 120 for 10s")
+    calls = count_calls(engine.rules[0])
+    engine.evaluate(["a", "b"], {"heart_rate": [130, 80]}, 0.0)
+    engine.evaluate(["a", "b"], {"heart_rate": [130, 80]}, 5.0)
+    assert len(calls) == 1
+    # The hold time still runs out without a re-evaluation
+    fired = engine.evaluate(["a", "b"], {"heart_rate": [130, 80]}, 10.0)
+    assert [patient for patient, _ in fired] == ["a"]
+    assert len(calls) == 1
+
+
+def test_only_rules_whose_inputs_changed_are_re_evaluated():
+    engine = rules.RuleEngine([rules.Rule("tachy", "heart_rate > 120"), rules.Rule("hypoxia", "spo2 < 90")])
+    tachy, hypoxia = (count_calls(rule) for rule in engine.rules)
+    engine.evaluate(["a"], {"heart_rate": [80], "spo2": [97]}, 0.0)
+    fired = engine.evaluate(["a"], {"heart_rate": [80], "spo2": [85]}, 1.0)
+    assert [rule.name for _, rule in fired] == ["hypoxia"]
+    assert (len(tachy), len(hypoxia)) == (1, 2)
+
+
+def test_a_change_for_one_patient_re_evaluates_the_batch():
+    engine = make_engine("heart_rate > 120")
+    engine.evaluate(["a", "b"], {"heart_rate": [80, 80]}, 0.0)
+    fired = engine.evaluate(["a", "b"], {"heart_rate": [80, 130]}, 1.0)
+    assert [patient for patient, _ in fired] == ["b"]
+    engine.evaluate(["a", "b"], {"heart_rate": [80, 80]}, 2.0)
+    assert engine.active("b") == []
+
+
+def test_new_patients_and_rules_are_evaluated():
+    engine = make_engine("heart_rate > 120")
+    engine.evaluate(["a"], {"heart_rate": [130]}, 0.0)
+    # Same values as a, but b was never evaluated
+    fired = engine.evaluate(["b"], {"heart_rate": [130]}, 1.0)
+    assert [patient for patient, _ in fired] == ["b"]
+    engine.add_rule(rules.Rule("very high", "heart_rate > 125"))
+    fired = engine.evaluate(["a", "b"], {"heart_rate": [130, 130]}, 2.0)
+    assert sorted((patient, rule.name) for patient, rule in fired) == [("a", "very high"), ("b", "very high")]
+
+
+def test_forget_makes_the_patient_new_again():
+    engine = make_engine("heart_rate > 120")
+    calls = count_calls(engine.rules[0])
+    engine.evaluate(["a"], {"heart_rate": [130]}, 0.0)
+    engine.forget("a")
+    fired = engine.evaluate(["a"], {"heart_rate": [130]}, 1.0)
+    assert len(calls) == 2
+    assert [patient for patient, _ in fired] == ["a"]
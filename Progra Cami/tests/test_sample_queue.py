@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+import sample_queue
+
+
+def fill(queue, values):
+    return [queue.put(value) for value in values]
+
+
+def data(batch):
+    return [item for _, item in batch]
+
+
+def test_drop_oldest_keeps_the_newest_samples():
+    queue = sample_queue.SampleQueue(maxsize=3, policy=sample_queue.DROP_OLDEST)
+    assert fill(queue, range(5)) == [True] * 5
+    assert data(queue.get_batch()) == [2, 3, 4]
+    assert (queue.enqueued, queue.dequeued, queue.dropped) == (5, 3, 2)
+    assert queue.take_overload_events() == 2
+    assert queue.take_overload_events() == 0
+
+
+def test_drop_newest_keeps_the_oldest_samples():
+    queue = sample_queue.SampleQueue(maxsize=3, policy=sample_queue.DROP_NEWEST)
+    assert fill(queue, range(5)) == [True, True, True, False, False]
+    assert data(queue.get_batch()) == [0, 1, 2]
+    assert (queue.enqueued, queue.dropped) == (3, 2)
+
+
+def test_coalesce_latest_keeps_only_the_last_sample():
+    queue = sample_queue.SampleQueue(maxsize=16, policy=sample_queue.COALESCE_LATEST)
+    assert queue.maxsize == 1
+    fill(queue, range(4))
+    assert data(queue.get_batch()) == [3]
+    assert (queue.coalesced, queue.dropped) == (3, 0)
+
+
+def test_get_batch_honours_max_items_and_stamps_samples():
+    ticks = iter(range(10))
+    queue = sample_queue.SampleQueue(maxsize=8, clock=lambda: next(ticks))
+    fill(queue, "abc")
+    assert queue.get_batch(max_items=2) == [(0, "a"), (1, "b")]
+    assert len(queue) == 1
+    queue.clear()
+    assert queue.get_batch() == []
+
+
+def test_block_times_out_and_drops_the_sample():
+    queue = sample_queue.SampleQueue(maxsize=1, policy=sample_queue.BLOCK, block_timeout=0.05)
+    assert queue.put("a")
+    assert not queue.put("b")
+    assert queue.dropped == 1
+    assert queue.blocked_seconds >= 0.05
+    assert data(queue.get_batch()) == ["a"]
+
+
+def test_block_waits_until_the_consumer_frees_a_slot():
+    queue = sample_queue.SampleQueue(maxsize=1, policy=sample_queue.BLOCK, block_timeout=5)
+    queue.put("a")
+    result = []
+    producer = threading.Thread(target=lambda: result.append(queue.put("b")))
+    producer.start()
+    # Wait until the producer is blocked on the full queue
+    while queue.take_overload_events() == 0:
+        time.sleep(0.001)
+    assert data(queue.get_batch()) == ["a"]
+    producer.join(5)
+    assert result == [True]
+    assert data(queue.get_batch()) == ["b"]
+
+
+def test_block_gives_up_when_stopped():
+    queue = sample_queue.SampleQueue(maxsize=1, policy=sample_queue.BLOCK)
+    queue.put("a")
+    stop = threading.Event()
+    stop.set()
+    assert not queue.put("b", stop_event=stop)
+    assert queue.dropped == 1
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        sample_queue.SampleQueue(policy="drop_everything")
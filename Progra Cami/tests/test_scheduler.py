@@ -0,0 +1,128 @@
+import threading
+
+import pytest
+
+import scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance_to(self, deadline):
+        self.now = max(self.now, deadline)
+
+
+def manual_scheduler():
+    clock = FakeClock()
+    return scheduler.DeadlineScheduler(clock=clock, manual=True), clock
+
+
+def test_streams_fire_in_deadline_order():
+    sched, clock = manual_scheduler()
+    fired = []
+    sched.add_stream("fast", 1.0, lambda: fired.append(("fast", clock.now)))
+    sched.add_stream("slow", 2.5, lambda: fired.append(("slow", clock.now)), start_delay=0.5)
+    sched.run_until(5.0, advance_to=clock.advance_to)
+    assert fired == [
+        ("fast", 0.0),
+        ("slow", 0.5),
+        ("fast", 1.0),
+        ("fast", 2.0),
+        ("slow", 3.0),
+        ("fast", 3.0),
+        ("fast", 4.0),
+        ("fast", 5.0),
+    ]
+    assert sched.stats()["fast"]["fired"] == 6
+
+
+def test_removed_stream_never_fires_again():
+    sched, clock = manual_scheduler()
+    fired = []
+    sched.add_stream("a", 1.0, lambda: fired.append("a"))
+    sched.run_until(1.0, advance_to=clock.advance_to)
+    assert sched.remove_stream("a") is True
+    assert sched.remove_stream("a") is False
+    sched.run_until(10.0, advance_to=clock.advance_to)
+    assert fired == ["a", "a"]
+    assert not sched.has_stream("a")
+
+
+def test_adding_a_stream_again_reschedules_it():
+    sched, clock = manual_scheduler()
+    fired = []
+    sched.add_stream("a", 1.0, lambda: fired.append(("old", clock.now)))
+    sched.add_stream("a", 2.0, lambda: fired.append(("new", clock.now)), start_delay=0.5)
+    sched.run_until(5.0, advance_to=clock.advance_to)
+    assert fired == [("new", 0.5), ("new", 2.5), ("new", 4.5)]
+    assert sched.stream_names() == ["a"]
+
+
+def test_new_interval_applies_after_the_next_firing():
+    sched, clock = manual_scheduler()
+    fired = []
+    sched.add_stream("a", 1.0, lambda: fired.append(clock.now))
+    sched.run_until(1.0, advance_to=clock.advance_to)
+    sched.set_interval("a", 3.0)
+    sched.run_until(8.0, advance_to=clock.advance_to)
+    assert fired == [0.0, 1.0, 2.0, 5.0, 8.0]
+    with pytest.raises(ValueError):
+        sched.set_interval("a", 0)
+
+
+def test_missed_deadlines_are_skipped_on_the_original_grid():
+    sched, clock = manual_scheduler()
+    fired = []
+
+    def slow_callback():
+        fired.append(clock.now)
+        if len(fired) == 2:
+            # The callback overruns three and a half periods
+            clock.now += 3.5
+
+    sched.add_stream("a", 1.0, slow_callback)
+    sched.run_until(7.0, advance_to=clock.advance_to)
+    assert fired == [0.0, 1.0, 5.0, 6.0, 7.0]
+    stats = sched.stats()["a"]
+    assert stats["skipped"] == 3
+    assert stats["max_jitter"] == 0.0
+
+
+def test_failing_stream_is_removed():
+    sched, clock = manual_scheduler()
+
+    def broken():
+        raise RuntimeError("sensor unplugged")
+
+    sched.add_stream("a", 1.0, broken)
+    sched.run_until(3.0, advance_to=clock.advance_to)
+    assert not sched.has_stream("a")
+
+
+def test_invalid_interval_is_rejected():
+    sched, _ = manual_scheduler()
+    with pytest.raises(ValueError):
+        sched.add_stream("a", 0, lambda: None)
+
+
+def test_thread_fires_streams_until_stopped():
+    sched = scheduler.DeadlineScheduler(name="test-scheduler")
+    done = threading.Event()
+    fired = []
+
+    def callback():
+        fired.append(1)
+        if len(fired) == 3:
+            done.set()
+
+    sched.add_stream("a", 0.005, callback)
+    sched.start()
+    try:
+        assert done.wait(5)
+    finally:
+        sched.stop(timeout=5)
+    assert not sched.running
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+
+import pytest
+
+import settings_store
+
+DEFAULTS = {
+    "schema_version": settings_store.SCHEMA_VERSION,
+    "update_interval": 5,
+    "normal_ranges": {"heart_rate": [60, 100]},
+    "alarms": {"margin": 2},
+}
+
+
+def write_json(path, data):
+    path.write_text(json.dumps(data))
+
+
+def test_atomic_write_replaces_the_file_and_leaves_no_temporary(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text("old")
+    settings_store.write_settings_atomic(str(path), {"update_interval": 2})
+    assert json.loads(path.read_text()) == {"update_interval": 2}
+    assert os.listdir(tmp_path) == ["settings.json"]
+
+
+def test_failed_atomic_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text("old")
+    with pytest.raises(TypeError):
+        settings_store.write_settings_atomic(str(path), {"not json": object()})
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["settings.json"]
+
+
+def test_version_1_file_is_migrated(tmp_path):
+    path = tmp_path / "settings.json"
+    write_json(path, {"update_interval": 3, "normal_ranges": {"spo2": [95, 100]}})
+    settings = settings_store.read_settings(str(path), DEFAULTS)
+    assert settings["schema_version"] == settings_store.SCHEMA_VERSION == 2
+    assert settings["update_interval"] == 3
+    # normal_ranges is replaced as a whole, other sections are merged
+    assert settings["normal_ranges"] == {"spo2": [95, 100]}
+    assert settings["alarms"] == {"margin": 2}
+
+
+def test_unknown_schema_version_is_rejected(tmp_path):
+    path = tmp_path / "settings.json"
+    write_json(path, dict(DEFAULTS, schema_version=99))
+    with pytest.raises(settings_store.SettingsError, match="schema version"):
+        settings_store.read_settings(str(path), DEFAULTS)
+
+
+@pytest.mark.parametrize(
+    "content, message",
+    [
+        ("{broken", "not valid JSON"),
+        (json.dumps(dict(DEFAULTS, update_interval=-1)), "update_interval"),
+        (json.dumps(dict(DEFAULTS, normal_ranges={"spo2": [100, 95]})), "lower bound"),
+        (json.dumps(dict(DEFAULTS, alarms={"margin": True})), "alarms.margin"),
+    ],
+)
+def test_corrupt_file_raises_settings_error(tmp_path, content, message):
+    path = tmp_path / "settings.json"
+    path.write_text(content)
+    with pytest.raises(settings_store.SettingsError, match=message):
+        settings_store.read_settings(str(path), DEFAULTS)
+
+
+def test_missing_file_raises_settings_error(tmp_path):
+    with pytest.raises(settings_store.SettingsError, match="Could not read"):
+        settings_store.read_settings(str(tmp_path / "missing.json"), DEFAULTS)
+
+
+def test_debounced_writer_coalesces_a_burst_of_saves(tmp_path):
+    path = tmp_path / "settings.json"
+    writer = settings_store.DebouncedSettingsWriter(str(path), delay=0.2)
+    try:
+        settings = {"update_interval": 1}
+        for interval in range(1, 6):
+            settings["update_interval"] = interval
+            writer.save(settings)
+        # Saved settings are copies, so later changes are not written
+        settings["update_interval"] = 99
+        assert not path.exists()
+        deadline = time.monotonic() + 5
+        while writer.writes == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.3)
+    finally:
+        writer.close()
+    assert json.loads(path.read_text())["update_interval"] == 5
+    assert json.loads(path.read_text())["schema_version"] == settings_store.SCHEMA_VERSION
+    assert writer.writes == 1
+
+
+def test_flush_writes_immediately_and_reports_success(tmp_path):
+    path = tmp_path / "settings.json"
+    writer = settings_store.DebouncedSettingsWriter(str(path), delay=60)
+    try:
+        writer.save({"update_interval": 7})
+        assert writer.flush() is True
+        assert json.loads(path.read_text())["update_interval"] == 7
+        # Nothing new to write
+        assert writer.flush() is True
+        assert writer.writes == 1
+    finally:
+        writer.close()
+
+
+def test_failed_write_calls_on_error(tmp_path):
+    errors = []
+    writer = settings_store.DebouncedSettingsWriter(
+        str(tmp_path / "missing" / "settings.json"), delay=60, on_error=errors.append
+    )
+    try:
+        writer.save({"update_interval": 7})
+        assert writer.flush() is False
+    finally:
+        writer.close()
+    assert len(errors) >= 1 and isinstance(errors[0], OSError)
+    assert writer.writes == 0
@@ -0,0 +1,88 @@
+import datetime
+
+import pytest
+
+import snapshot
+
+
+def sample_state():
+    return {
+        "bed-1": {
+            "historical_anomalies": [
+                {"heart_rate": "abnormal", "spo2": "normal"},
+                {"heart_rate": "normal", "spo2": "imputed"},
+            ],
+            "current_anomalies": {"heart_rate", "spo2"},
+            "critical_anomalies": {"spo2"},
+            "current_health_risks": {"hypoxia"},
+            "alerts": [
+                {
+                    "message": "SpO2 low",
+                    "level": "critical",
+                    "timestamp": datetime.datetime(2024, 5, 1, 12, 0, 0, 250000),
+                    "patient": "bed-1",
+                },
+                {
+                    "message": "Ward note",
+                    "level": "info",
+                    "timestamp": datetime.datetime(2024, 5, 1, 12, 1, 0),
+                },
+            ],
+        },
+        "bed-2": {
+            "historical_anomalies": [],
+            "current_anomalies": set(),
+            "current_health_risks": set(),
+            "alerts": [],
+        },
+    }
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_round_trip(compress):
+    state = sample_state()
+    _, patients = snapshot.decode_snapshot(snapshot.encode_snapshot(state, compress=compress))
+    assert set(patients) == {"bed-1", "bed-2"}
+    restored = patients["bed-1"]
+    assert restored["historical_anomalies"] == state["bed-1"]["historical_anomalies"]
+    assert restored["current_anomalies"] == {"heart_rate", "spo2"}
+    assert restored["critical_anomalies"] == {"spo2"}
+    assert restored["current_health_risks"] == {"hypoxia"}
+    assert restored["alerts"] == state["bed-1"]["alerts"]
+    assert "patient" not in restored["alerts"][1]
+    assert patients["bed-2"]["critical_anomalies"] == set()
+    assert patients["bed-2"]["alerts"] == []
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / "state.snap"
+    size = snapshot.save_snapshot(str(path), sample_state())
+    assert size == path.stat().st_size
+    saved_at, patients = snapshot.load_snapshot(str(path))
+    assert isinstance(saved_at, datetime.datetime)
+    assert patients["bed-1"]["critical_anomalies"] == {"spo2"}
+
+
+def test_corruption_is_detected():
+    data = bytearray(snapshot.encode_snapshot(sample_state()))
+    data[len(data) // 2] ^= 0xFF
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.decode_snapshot(bytes(data))
+
+
+def test_truncated_and_foreign_data_are_rejected():
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.decode_snapshot(b"ECSN")
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.decode_snapshot(bytes(64))
+
+
+def test_missing_file_raises_snapshot_error(tmp_path):
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.load_snapshot(str(tmp_path / "missing.snap"))
+
+
+def test_too_many_parameters():
+    history = [{f"p{i}": "normal" for i in range(snapshot.MAX_PARAMETERS + 1)}]
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.encode_snapshot({"a": {"historical_anomalies": history}})
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+import spatial
+
+
+def random_index(count=500, seed=7):
+    rng = random.Random(seed)
+    index = spatial.SpatialIndex(cell_size=0.01)
+    points = {}
+    for i in range(count):
+        lat, lon = 19.4 + rng.uniform(-0.2, 0.2), -99.1 + rng.uniform(-0.2, 0.2)
+        kind = "caregiver" if i % 4 == 0 else "community"
+        index.insert(i, lat, lon, kind)
+        points[i] = (lat, lon, kind)
+    return index, points
+
+
+def brute_force(points, lat, lon, kind=None):
+    return sorted(
+        (spatial.haversine_km(lat, lon, p_lat, p_lon), member_id)
+        for member_id, (p_lat, p_lon, p_kind) in points.items()
+        if kind is None or p_kind == kind
+    )
+
+
+def test_haversine_known_distance():
+    # One degree of latitude along a meridian
+    assert spatial.haversine_km(0, 0, 1, 0) == pytest.approx(111.195, abs=0.01)
+    assert spatial.haversine_km(10, 20, 10, 20) == 0
+
+
+@pytest.mark.parametrize("kind", [None, "caregiver"])
+def test_within_matches_brute_force(kind):
+    index, points = random_index()
+    expected = [pair for pair in brute_force(points, 19.41, -99.12, kind) if pair[0] <= 3.0]
+    assert index.within(19.41, -99.12, 3.0, kind=kind) == expected
+
+
+@pytest.mark.parametrize("kind", [None, "caregiver"])
+def test_nearest_matches_brute_force(kind):
+    index, points = random_index()
+    for lat, lon in [(19.4, -99.1), (19.59, -98.91), (20.5, -99.1)]:
+        assert index.nearest(lat, lon, k=5, kind=kind) == brute_force(points, lat, lon, kind)[:5]
+
+
+def test_nearest_respects_the_radius():
+    index, points = random_index()
+    expected = [pair for pair in brute_force(points, 19.4, -99.1) if pair[0] <= 0.5][:50]
+    assert index.nearest(19.4, -99.1, k=50, max_radius_km=0.5) == expected
+    assert index.nearest(30.0, -99.1, k=3, max_radius_km=10) == []
+
+
+def test_move_and_remove():
+    index = spatial.SpatialIndex()
+    index.insert("a", 19.40, -99.10)
+    index.insert("a", 19.50, -99.20, "caregiver")
+    assert len(index) == 1
+    assert index.location("a") == (19.50, -99.20, "caregiver")
+    assert index.within(19.40, -99.10, 1.0) == []
+    assert index.remove("a")
+    assert not index.remove("a")
+    assert "a" not in index
+    assert index.nearest(19.5, -99.2) == []
@@ -0,0 +1,149 @@
+import datetime
+
+import spill
+
+START = datetime.datetime(2024, 5, 1, 8, 0, 0)
+
+
+def make_alerts(count, first=0):
+    return [
+        {
+            "message": f"alert {i}",
+            "level": "warning",
+            "timestamp": START + datetime.timedelta(seconds=i),
+            "patient": f"bed-{i % 3}",
+        }
+        for i in range(first, first + count)
+    ]
+
+
+def spilling_log(directory, **kwargs):
+    budget = 10 * spill.alert_size(make_alerts(1)[0])
+    return spill.SpillingLog("alerts", str(directory), budget, segment_items=5, **kwargs)
+
+
+def segment_files(directory):
+    return sorted(path.name for path in directory.iterdir() if path.suffix == ".seg")
+
+
+def test_spilled_alerts_read_back_unchanged(tmp_path):
+    alerts = make_alerts(40)
+    log = spilling_log(tmp_path)
+    log.extend(alerts)
+    assert log.spilled > 0
+    assert len(log.resident) < len(alerts)
+    assert len(log) == 40
+    assert list(log) == alerts
+    assert log[3] == alerts[3]
+    assert log[-1] == alerts[-1]
+    assert log[10:14] == alerts[10:14]
+    assert log[::7] == alerts[::7]
+
+
+def test_between_reads_only_the_range(tmp_path):
+    log = spilling_log(tmp_path)
+    log.extend(make_alerts(40))
+    found = log.between(START + datetime.timedelta(seconds=12), START + datetime.timedelta(seconds=15))
+    assert [alert["message"] for alert in found] == ["alert 12", "alert 13", "alert 14"]
+
+
+def test_segments_survive_a_restart(tmp_path):
+    alerts = make_alerts(40)
+    log = spilling_log(tmp_path)
+    log.extend(alerts)
+    resident = list(log.resident)
+    log.flush()
+
+    reopened = spilling_log(tmp_path)
+    assert reopened.spilled == log.spilled
+    reopened.restore_resident(alerts)  # e.g. from an older snapshot
+    assert reopened.resident == resident
+    assert list(reopened) == alerts
+
+
+def test_without_a_directory_nothing_spills():
+    log = spill.SpillingLog("alerts", None, 1)
+    log.extend(make_alerts(20))
+    assert log.spilled == 0
+    assert len(log.resident) == 20
+
+
+def test_clear_removes_the_segments(tmp_path):
+    log = spilling_log(tmp_path)
+    log.extend(make_alerts(40))
+    log.clear()
+    log.flush()
+    assert len(log) == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["alerts.manifest.json"]
+    assert len(spilling_log(tmp_path)) == 0
+
+
+def test_spilled_alerts_are_readable_before_they_are_written(tmp_path):
+    alerts = make_alerts(40)
+    log = spilling_log(tmp_path)
+    log.extend(alerts)
+    # Whether or not the writer thread got to them yet
+    assert list(log) == alerts
+    log.flush()
+    assert len(segment_files(tmp_path)) == len(log._segments)
+    assert list(log) == alerts
+
+
+def test_retention_deletes_old_segments_and_renumbers(tmp_path):
+    alerts = make_alerts(100)
+    log = spilling_log(tmp_path, retention=30)
+    log.extend(alerts)
+    log.flush()
+    assert log.pruned > 0
+    kept = list(log)
+    assert kept == alerts[len(alerts) - len(kept) :]
+    # Everything spilled is within the retention of the newest spilled alert
+    newest = log._segments[-1]["end"]
+    assert all(segment["end"] >= newest - 30 for segment in log._segments)
+    assert log[0] == kept[0]
+    assert len(segment_files(tmp_path)) == len(log._segments)
+
+    reopened = spilling_log(tmp_path, retention=30)
+    assert reopened.spilled == log.spilled
+    assert reopened[0] == kept[0]
+
+
+def test_disk_budget_deletes_old_segments(tmp_path):
+    log = spilling_log(tmp_path)
+    log.extend(make_alerts(100))
+    log.flush()
+    size = sum(segment["bytes"] for segment in log._segments)
+    log.configure(str(tmp_path), log.budget_bytes, max_disk_bytes=size // 2)
+    log.flush()
+    assert 0 < sum(segment["bytes"] for segment in log._segments) <= size // 2
+    assert sum((tmp_path / name).stat().st_size for name in segment_files(tmp_path)) <= size // 2
+
+
+def test_missing_segment_leaves_no_gap(tmp_path):
+    alerts = make_alerts(40)
+    log = spilling_log(tmp_path)
+    log.extend(alerts)
+    log.flush()
+    lost = log._segments[1]
+    (tmp_path / lost["file"]).unlink()
+
+    reopened = spilling_log(tmp_path)
+    assert reopened.spilled == log.spilled - lost["count"]
+    expected = alerts[: lost["first"]] + alerts[lost["first"] + lost["count"] : log.spilled]
+    assert [reopened[i] for i in range(reopened.spilled)] == expected
+
+
+def test_restore_keeps_unspilled_alerts_of_the_cutoff_instant(tmp_path):
+    alerts = make_alerts(12)
+    # The first alert left in memory shares the last spilled one's timestamp
+    for alert in alerts[5:7]:
+        alert["timestamp"] = alerts[4]["timestamp"]
+    log = spill.SpillingLog("alerts", str(tmp_path), None, segment_items=5)
+    log.extend(alerts)
+    log._spill(5)
+    log.flush()
+
+    reopened = spill.SpillingLog("alerts", str(tmp_path), None, segment_items=5)
+    reopened.restore_resident(alerts)
+    assert reopened.resident == alerts[5:]
+    assert list(reopened) == alerts
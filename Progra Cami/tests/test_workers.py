@@ -0,0 +1,38 @@
+import threading
+
+import scheduler
+import workers
+
+
+def test_stopped_worker_does_not_produce():
+    produced = []
+    worker = workers.SensorWorker("bed-1", 1.0, produced.append)
+    worker.stop_token.set()
+    worker.run_once()
+    assert produced == []
+    assert not worker.live
+
+
+def test_stop_waits_for_the_sample_in_flight():
+    started, release = threading.Event(), threading.Event()
+    finished = []
+
+    def produce(stop_token):
+        started.set()
+        release.wait(5)
+        finished.append(stop_token.is_set())
+
+    supervisor = workers.WorkerSupervisor(scheduler.DeadlineScheduler(name="test-workers"))
+    worker = supervisor.start("bed-1", 60.0, produce)
+    try:
+        assert started.wait(5)
+        # Still finishing its sample, so not stopped yet
+        assert supervisor.stop("bed-1", join_timeout=0.05) is False
+        assert worker.live
+        release.set()
+        assert supervisor.stop("bed-1", join_timeout=5) is True
+        assert finished == [True]
+        assert supervisor.live_count() == 0
+    finally:
+        release.set()
+        supervisor.shutdown(join_timeout=5)
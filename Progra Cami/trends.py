@@ -0,0 +1,207 @@
+import collections
+import math
+
+# --- Downsampling Functions ---
+
+
+def _triangle_area(a, b, c):
+    return abs((a[0] - c[0]) * (b[1] - a[1]) - (a[0] - b[0]) * (c[1] - a[1])) / 2
+
+
+def _average(points):
+    count = len(points)
+    return (sum(p[0] for p in points) / count, sum(p[1] for p in points) / count)
+
+
+def _select_point(previous, bucket, next_average):
+    # Picks the point of the bucket forming the largest triangle with the
+    # previously selected point and the average of the next bucket
+    best = bucket[0]
+    best_area = -1.0
+    for point in bucket:
+        area = _triangle_area(previous, point, next_average)
+        if area > best_area:
+            best, best_area = point, area
+    return best
+
+
+def lttb(points, threshold):
+    """
+    Downsamples a series with the largest-triangle-three-buckets algorithm.
+
+    Args:
+        points (list): (x, y) tuples sorted by x.
+        threshold (int): Number of points to keep (at least 3).
+
+    Returns:
+        list: The selected (x, y) points, always including the first and last.
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (count - 2) / (threshold - 2)
+    previous = points[0]
+    for i in range(threshold - 2):
+        start = int(math.floor(i * bucket_size)) + 1
+        end = int(math.floor((i + 1) * bucket_size)) + 1
+        next_start = end
+        next_end = min(int(math.floor((i + 2) * bucket_size)) + 1, count)
+        next_bucket = points[next_start:next_end] or [points[-1]]
+        previous = _select_point(previous, points[start:end], _average(next_bucket))
+        sampled.append(previous)
+    sampled.append(points[-1])
+    return sampled
+
+
+# --- Trend Chart ---
+
+
+class TrendChart:
+    """
+    Live sparkline for one vital drawn on an sg.Graph.
+
+    The visible time window is split into a fixed number of buckets and each
+    bucket is reduced to one point with LTTB (one bucket behind, once the
+    following bucket's average is known). Finished segments are drawn once;
+    each tick only the provisional tail is redrawn, and when the window
+    scrolls the existing figures are moved instead of replotted.
+    """
+
+    def __init__(self, graph, window_seconds=3600, points=120, y_range=(0, 1), normal_range=None):
+        """
+        Args:
+            graph: The sg.Graph element. Its graph_bottom_left/graph_top_right
+                must be (0, y_range[0]) and (points, y_range[1]).
+            window_seconds (float): Time span shown by the chart.
+            points (int): Number of points the window is reduced to.
+            y_range (tuple): Lower and upper bound of the y axis.
+            normal_range (list): Optional [lower, upper] band drawn as reference lines.
+        """
+        self.graph = graph
+        self.points = points
+        self.bucket_seconds = window_seconds / points
+        self.y_range = y_range
+        self.line_color = "blue"
+        self._window_start = None  # absolute bucket index at x == 0
+        self._current_bucket = None
+        self._pending = []  # raw points of the open bucket
+        self._awaiting = []  # raw points of the last closed, not yet reduced bucket
+        self._selected = collections.deque(maxlen=points + 2)
+        self._segments = collections.deque()  # (end bucket, figure id)
+        self._tail_figures = []
+        if normal_range:
+            self._draw_reference_lines(normal_range)
+
+    def _bucket_of(self, t):
+        return int(t // self.bucket_seconds)
+
+    def _x(self, t):
+        return t / self.bucket_seconds - self._window_start
+
+    def _y(self, value):
+        low, high = self.y_range
+        return min(max(value, low), high)
+
+    def _draw_reference_lines(self, normal_range):
+        # Wide enough that scrolling with graph.move() never uncovers their ends
+        span = self.points * 1000
+        for bound in normal_range:
+            self.graph.draw_line((-span, self._y(bound)), (span, self._y(bound)), color="light gray")
+
+    def add(self, t, value):
+        """
+        Adds a reading to the chart.
+
+        Args:
+            t (float): Timestamp in seconds (any monotonic base).
+            value (float): The reading.
+        """
+        if value is None:
+            return
+        bucket = self._bucket_of(t)
+        if self._current_bucket is None:
+            self._current_bucket = bucket
+            self._window_start = bucket - self.points + 1
+        elif bucket != self._current_bucket:
+            self._close_bucket()
+            self._current_bucket = bucket
+        self._pending.append((t, float(value)))
+
+    def load_history(self, history):
+        """
+        Seeds the chart with past readings (e.g. hours of history).
+
+        Args:
+            history (list): (t, value) tuples sorted by time.
+        """
+        window_seconds = self.points * self.bucket_seconds
+        if history:
+            cutoff = history[-1][0] - window_seconds
+            history = [point for point in history if point[0] >= cutoff]
+        for t, value in lttb(history, self.points * 2):
+            self.add(t, value)
+        self.draw()
+
+    def _close_bucket(self):
+        if self._awaiting:
+            previous = self._selected[-1] if self._selected else self._awaiting[0]
+            point = _select_point(previous, self._awaiting, _average(self._pending))
+            self._select(point)
+        self._awaiting = self._pending
+        self._pending = []
+
+    def _select(self, point):
+        if self._selected:
+            previous = self._selected[-1]
+            figure = self.graph.draw_line(
+                (self._x(previous[0]), self._y(previous[1])),
+                (self._x(point[0]), self._y(point[1])),
+                color=self.line_color,
+                width=2,
+            )
+            self._segments.append((self._bucket_of(point[0]), figure))
+        self._selected.append(point)
+
+    def draw(self):
+        """
+        Brings the graph up to date with as few canvas operations as possible.
+        """
+        if self._current_bucket is None:
+            return
+
+        # Scroll the existing figures when the window has moved on
+        window_start = self._current_bucket - self.points + 1
+        shift = window_start - self._window_start
+        if shift > 0:
+            self.graph.move(-shift, 0)
+            self._window_start = window_start
+            while self._segments and self._segments[0][0] < window_start:
+                self.graph.delete_figure(self._segments.popleft()[1])
+
+        # Redraw the provisional tail: last selected point -> awaiting -> pending
+        for figure in self._tail_figures:
+            self.graph.delete_figure(figure)
+        self._tail_figures = []
+        tail = []
+        if self._selected:
+            tail.append(self._selected[-1])
+        if self._awaiting:
+            tail.append(self._awaiting[-1])
+        if self._pending:
+            tail.append(self._pending[-1])
+        for start, end in zip(tail, tail[1:]):
+            self._tail_figures.append(
+                self.graph.draw_line(
+                    (self._x(start[0]), self._y(start[1])),
+                    (self._x(end[0]), self._y(end[1])),
+                    color=self.line_color,
+                    width=2,
+                )
+            )
+        if len(tail) == 1:
+            point = tail[0]
+            self._tail_figures.append(
+                self.graph.draw_point((self._x(point[0]), self._y(point[1])), 2, color=self.line_color)
+            )
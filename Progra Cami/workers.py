@@ -0,0 +1,176 @@
+import logging
+import threading
+
+
+class SensorWorker:
+    """
+    One sensor producer, identified by its stream name.
+
+    Each worker owns its stop token, so stopping one producer can never be
+    undone by another one being started (the old shared stop_event could be
+    cleared by a quick Stop/Start before the previous thread noticed it).
+    """
+
+    def __init__(self, stream, interval, produce):
+        """
+        Args:
+            stream (str): Stream name (e.g. a patient id).
+            interval (float): Sampling period in seconds.
+            produce (callable): Called as produce(stop_token) at every deadline.
+        """
+        self.stream = stream
+        self.interval = interval
+        self.produce = produce
+        self.stop_token = threading.Event()
+        self.generation = 0
+        self.failed = None
+        self._idle = threading.Event()
+        self._idle.set()
+
+    @property
+    def live(self):
+        """
+        True while the worker is scheduled or still finishing a sample.
+        """
+        return not self.stop_token.is_set() or not self._idle.is_set()
+
+    def run_once(self):
+        # Called on the scheduler thread. Mark the worker busy before checking
+        # the token: a stop() that sets the token in between then either waits
+        # for this sample or the check below sees the token and skips it.
+        stop_token = self.stop_token
+        self._idle.clear()
+        try:
+            if stop_token.is_set():
+                return
+            self.produce(stop_token)
+        except Exception as e:
+            self.failed = e
+            stop_token.set()
+            logging.error(f"Sensor worker '{self.stream}' failed: {e}", exc_info=True)
+        finally:
+            self._idle.set()
+
+    def join(self, timeout=None):
+        """
+        Waits for an in-flight sample to finish.
+
+        Returns:
+            bool: True if the worker is idle.
+        """
+        return self._idle.wait(timeout)
+
+
+class WorkerSupervisor:
+    """
+    Guarantees at most one live producer per stream.
+
+    Workers run on the shared scheduler thread instead of spawning a thread
+    each, and a stopped worker is reused when its stream is started again.
+    """
+
+    def __init__(self, sensor_scheduler):
+        """
+        Args:
+            sensor_scheduler (scheduler.DeadlineScheduler): Scheduler that drives the workers.
+        """
+        self.scheduler = sensor_scheduler
+        self._workers = {}
+        self._lock = threading.Lock()
+
+    def start(self, stream, interval, produce, join_timeout=5.0):
+        """
+        Starts the producer for a stream, replacing or reusing any previous one.
+
+        Args:
+            stream (str): Stream name.
+            interval (float): Sampling period in seconds.
+            produce (callable): Called as produce(stop_token) at every deadline.
+            join_timeout (float): Longest wait for a previous producer to finish.
+
+        Returns:
+            SensorWorker: The live worker for the stream.
+        """
+        with self._lock:
+            worker = self._workers.get(stream)
+            if worker is not None and worker.live:
+                self._stop_worker(worker, join_timeout)
+            if worker is None:
+                worker = SensorWorker(stream, interval, produce)
+                self._workers[stream] = worker
+            else:
+                # Reuse the stopped worker with a fresh stop token
+                worker.interval = interval
+                worker.produce = produce
+                worker.failed = None
+                worker.stop_token = threading.Event()
+            worker.generation += 1
+            self.scheduler.add_stream(stream, interval, worker.run_once)
+            self.scheduler.start()
+            return worker
+
+    def stop(self, stream, join_timeout=5.0):
+        """
+        Stops the producer for a stream and waits for it to finish.
+
+        Args:
+            stream (str): Stream name.
+            join_timeout (float): Longest wait for an in-flight sample.
+
+        Returns:
+            bool: True if the producer is no longer live.
+        """
+        with self._lock:
+            worker = self._workers.get(stream)
+            if worker is None:
+                return True
+            return self._stop_worker(worker, join_timeout)
+
+    def stop_all(self, join_timeout=5.0):
+        """
+        Stops every producer.
+
+        Returns:
+            bool: True if none of them is still live.
+        """
+        with self._lock:
+            workers = list(self._workers.values())
+            # Signal all of them first so they wind down in parallel
+            for worker in workers:
+                worker.stop_token.set()
+                self.scheduler.remove_stream(worker.stream)
+            return all([self._stop_worker(worker, join_timeout) for worker in workers])
+
+    def _stop_worker(self, worker, join_timeout):
+        worker.stop_token.set()
+        self.scheduler.remove_stream(worker.stream)
+        if not worker.join(join_timeout):
+            logging.warning(f"Sensor worker '{worker.stream}' did not stop within {join_timeout}s.")
+            return False
+        return True
+
+    def set_interval(self, stream, interval):
+        with self._lock:
+            worker = self._workers.get(stream)
+            if worker is None or not worker.live:
+                return
+            worker.interval = interval
+            self.scheduler.set_interval(stream, interval)
+
+    def live_streams(self):
+        with self._lock:
+            return [stream for stream, worker in self._workers.items() if worker.live]
+
+    def live_count(self):
+        """
+        Returns:
+            int: Number of producers currently scheduled or finishing a sample.
+        """
+        return len(self.live_streams())
+
+    def shutdown(self, join_timeout=5.0):
+        """
+        Stops every producer and the scheduler thread.
+        """
+        self.stop_all(join_timeout)
+        self.scheduler.stop(join_timeout)